@@ -1,16 +1,41 @@
 import os
+import time
+import uuid
 import logging
 import random
-from flask import Flask, render_template, request, jsonify, session
-from engine.game_state import GameState, GameMove
+from flask import Flask, render_template, request, jsonify, session, g
+from engine.game_state import GameState, find_move
 from engine.movegen import get_all_possible_moves
-from engine.search import get_best_move
-from engine.database_lookup import is_in_database, get_best_move_from_database
+from engine.ai import BACKENDS, get_ai_move as engine_get_ai_move
+from engine.ponder import PONDER_ENABLED, start_pondering, stop_pondering
+
+# Logging profiles: "production" keeps the engine quiet and only samples a
+# small fraction of requests, "development" logs every move and request.
+LOG_PROFILES = {
+    'production': {'level': 'WARNING', 'request_sample_rate': 0.01},
+    'development': {'level': 'DEBUG', 'request_sample_rate': 1.0},
+}
+
+LOG_PROFILE = os.environ.get("LOG_PROFILE", "production")
+_profile = LOG_PROFILES.get(LOG_PROFILE, LOG_PROFILES['production'])
+LOG_LEVEL = os.environ.get("LOG_LEVEL", _profile['level']).upper()
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get("REQUEST_LOG_SAMPLE_RATE", _profile['request_sample_rate']))
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.WARNING))
 logger = logging.getLogger(__name__)
 
+# Sampled per-request summary lines are always emitted at INFO, whatever the
+# level of the rest of the application
+request_logger = logging.getLogger(__name__ + ".requests")
+request_logger.setLevel(logging.INFO)
+
+# Profile every search when set. Requests carrying the X-Search-Profile
+# header are only profiled when SEARCH_PROFILE_HEADER allows it, so clients
+# can't make the server profile (and with SEARCH_PROFILE_DIR, write files)
+SEARCH_PROFILE = os.environ.get("SEARCH_PROFILE", "") == "1"
+SEARCH_PROFILE_HEADER = os.environ.get("SEARCH_PROFILE_HEADER", "") == "1"
+
 # Create the Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "chopsticks-secret-key")
@@ -22,6 +47,25 @@ from engine import evaluator, movegen, search, database_lookup, game_state
 database_lookup.load_or_generate_database()
 
 
+@app.before_request
+def start_request_timer():
+    """Start timing the request if it was picked for the summary log"""
+    if random.random() < REQUEST_LOG_SAMPLE_RATE:
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def log_request_summary(response):
+    """Emit a one-line summary for sampled requests"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        request_logger.info("%s %s %d %.2fms ai=%s",
+                            request.method, request.path, response.status_code,
+                            (time.perf_counter() - start) * 1000,
+                            g.get('ai_source', '-'))
+    return response
+
+
 @app.route('/')
 def index():
     """Render the main game page"""
@@ -40,8 +84,15 @@ def new_game():
     data = request.get_json(silent=True) or {}
     difficulty = data.get('difficulty', 'master')
     first_player = data.get('first_player', 'human')
+    backend = data.get('backend')
+    if backend is not None and backend not in BACKENDS:
+        return jsonify({'error': f'Unknown backend: {backend}'}), 400
     
-    logger.debug(f"New game with settings: difficulty={difficulty}, first_player={first_player}")
+    logger.debug("New game with settings: difficulty=%s, first_player=%s, backend=%s",
+                 difficulty, first_player, backend)
+
+    # The previous game's replies won't be played
+    stop_pondering(session.get('game_id'))
     
     # Create initial game state
     game = GameState()
@@ -55,6 +106,8 @@ def new_game():
     session['game_state'] = game.serialize()
     session['difficulty'] = difficulty
     session['first_player'] = first_player
+    session['backend'] = backend
+    session['game_id'] = uuid.uuid4().hex
     
     return jsonify({
         'game_state': game.serialize(),
@@ -74,6 +127,9 @@ def new_game():
 @app.route('/api/make_move', methods=['POST'])
 def make_move():
     """Apply a human move and get AI's response"""
+    # The CPU is needed for this request now
+    stop_pondering(session.get('game_id'))
+
     if 'game_state' not in session:
         return jsonify({'error': 'No active game'}), 400
     
@@ -89,7 +145,8 @@ def make_move():
         ai_move, evaluation, perfect = get_ai_move(game, difficulty)
         game.apply_move(ai_move)
         session['game_state'] = game.serialize()
-        return jsonify({
+        ponder_on(game, difficulty)
+        return jsonify(with_search_profile({
             'game_state': game.serialize(),
             'ai_move': ai_move.serialize(),
             'evaluation': evaluation,
@@ -97,9 +154,9 @@ def make_move():
             'possible_moves': [move.serialize() for move in get_all_possible_moves(game)],
             'is_game_over': game.is_terminal,
             'winner': game.get_winner()
-        })
+        }))
     
-    logger.debug(f"Move data received: {move_data}")
+    logger.debug("Move data received: %s", move_data)
     
     # Create the move object from move_data
     if move_data:
@@ -109,11 +166,11 @@ def make_move():
             details = move_data.get('details')
             
             if all([move_type, player is not None, details]):
-                human_move = GameMove(move_type, player, details)
+                human_move = find_move(move_type, player, details)
             else:
                 human_move = None
         except Exception as e:
-            logger.error(f"Error creating move: {e}")
+            logger.error("Error creating move: %s", e)
             human_move = None
     else:
         human_move = None
@@ -122,7 +179,7 @@ def make_move():
         return jsonify({'error': 'Invalid move data'}), 400
     
     # Apply human move
-    logger.debug(f"Applying human move: {human_move.get_notation()}")
+    logger.debug("Applying human move: %s", human_move)
     success, error = game.apply_move(human_move)
     if not success:
         return jsonify({'error': f'Invalid move: {error}'}), 400
@@ -140,10 +197,10 @@ def make_move():
     ai_move, evaluation, perfect = get_ai_move(game, difficulty)
     
     if ai_move:
-        logger.debug(f"AI move: {ai_move.get_notation()}, Eval: {evaluation}, Perfect: {perfect}")
+        logger.debug("AI move: %s, Eval: %s, Perfect: %s", ai_move, evaluation, perfect)
         success, error = game.apply_move(ai_move)
         if not success:
-            logger.error(f"AI move application failed: {error}")
+            logger.error("AI move application failed: %s", error)
             return jsonify({'error': f'AI move failed: {error}'}), 500
     else:
         logger.error("No AI move found")
@@ -151,8 +208,9 @@ def make_move():
     
     # Update session with new game state
     session['game_state'] = game.serialize()
+    ponder_on(game, difficulty)
     
-    return jsonify({
+    return jsonify(with_search_profile({
         'game_state': game.serialize(),
         'ai_move': ai_move.serialize(),
         'evaluation': evaluation,
@@ -160,38 +218,44 @@ def make_move():
         'possible_moves': [move.serialize() for move in get_all_possible_moves(game)],
         'is_game_over': game.is_terminal,
         'winner': game.get_winner()
-    })
+    }))
+
+
+def ponder_on(game, difficulty):
+    """Think about the human's replies in the background, if pondering is enabled"""
+    if PONDER_ENABLED and not game.is_terminal:
+        start_pondering(session.get('game_id'), game.clone(), difficulty, session.get('backend'))
+
+
+def search_profile_requested():
+    """Check whether the search for this request should be profiled"""
+    return SEARCH_PROFILE or (SEARCH_PROFILE_HEADER and request.headers.get('X-Search-Profile') == '1')
+
+
+def with_search_profile(response_data):
+    """Attach the search profile, forced win length and solver stats to a response if recorded"""
+    if 'search_profile' in g:
+        response_data['search_profile'] = g.search_profile
+    if 'forced_win_in' in g:
+        response_data['forced_win_in'] = g.forced_win_in
+    if 'solver' in g:
+        response_data['solver'] = g.solver
+    return response_data
 
 
 def get_ai_move(game, difficulty):
-    """Get the best move for the AI based on difficulty level"""
-    perfect = False
-    
-    # Check if the position is in the database
-    if is_in_database(game):
-        move, evaluation = get_best_move_from_database(game)
-        perfect = True
-        logger.debug(f"Using perfect move from database: {move.get_notation()}")
-        return move, evaluation, perfect
-    
-    # Otherwise use search with appropriate depth based on difficulty
-    depth = 2  # Default for 'novice'
-    if difficulty == 'intermediate':
-        depth = 4
-    elif difficulty == 'master':
-        depth = 6
-    
-    # For novice, occasionally make random moves
-    if difficulty == 'novice' and random.random() < 0.3:
-        moves = get_all_possible_moves(game)
-        move = random.choice(moves)
-        evaluation = 0
-        return move, evaluation, perfect
-    
-    # Use minimax/alpha-beta search for the move
-    move, evaluation = get_best_move(game, depth)
-    logger.debug(f"Using search with depth {depth}: {move.get_notation()} (eval: {evaluation})")
-    
+    """Get the AI's move and record how it was chosen for this request"""
+    info = {}
+    move, evaluation, perfect = engine_get_ai_move(game, difficulty, profile=search_profile_requested(), info=info,
+                                                   backend=session.get('backend'), game_id=session.get('game_id'))
+    g.ai_source = 'cache' if info.get('cached') else info.get('source')
+    if 'profile' in info:
+        g.search_profile = info['profile']
+    if 'forced_win' in info:
+        # Number of AI moves until the win, counting this one
+        g.forced_win_in = (info['forced_win'] + 1) // 2
+    if 'solver' in info:
+        g.solver = info['solver']
     return move, evaluation, perfect
 
 
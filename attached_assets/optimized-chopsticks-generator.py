@@ -2,7 +2,13 @@ import csv
 from collections import deque
 import time
 import os
+import sys
 import hashlib
+import argparse
+
+# The rules come from the engine; the script runs from attached_assets/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.rules import STANDARD_RULES as RULES
 
 # --- Configuration ---
 MAX_MOVES = 10  # Maximum number of moves (not plies) to explore
@@ -46,15 +52,11 @@ class GameState:
         
     def is_terminal(self):
         """Checks if the current state is terminal (a player has lost)."""
-        return self.p1_hands == (0, 0) or self.p2_hands == (0, 0)
+        return self.get_winner() is not None
         
     def get_winner(self):
         """Returns the winner if the state is terminal, None otherwise."""
-        if self.p1_hands == (0, 0):
-            return "P2"
-        elif self.p2_hands == (0, 0):
-            return "P1"
-        return None
+        return RULES.hands_winner(self.p1_hands, self.p2_hands)
         
     def get_state_str(self):
         """Returns the string representation of the state."""
@@ -128,30 +130,14 @@ class GamePath:
             player_hands = current_state.get_player_hands()
             opponent_hands = current_state.get_opponent_hands()
             
-            # Validate the tap
-            if validate:
-                if player_hands[att_hand] == 0:
-                    error_code = "ERR_OVERFLOW"
-                elif opponent_hands[def_hand] == 0:
-                    # Not specified in prompt, but tapping a dead hand seems invalid
-                    error_code = "ERR_OVERFLOW"
-            
-            # Apply the tap if valid
-            if not error_code:
-                fingers_to_add = player_hands[att_hand]
-                new_defender_fingers = (opponent_hands[def_hand] + fingers_to_add) % 5
-                
-                # Update the hands in the next state
-                if move.player == 0:
-                    next_state.p2_hands = tuple(
-                        new_defender_fingers if i == def_hand else opponent_hands[i]
-                        for i in range(2)
-                    )
-                else:
-                    next_state.p1_hands = tuple(
-                        new_defender_fingers if i == def_hand else opponent_hands[i]
-                        for i in range(2)
-                    )
+            # Both hands must be alive
+            new_hands = RULES.tap(player_hands, opponent_hands, att_hand, def_hand)
+            if new_hands is None:
+                error_code = "ERR_OVERFLOW"
+            elif move.player == 0:
+                next_state.p2_hands = new_hands
+            else:
+                next_state.p1_hands = new_hands
         
         elif move.move_type == "split":
             old_l, old_r, new_l, new_r = move.details
@@ -159,24 +145,10 @@ class GamePath:
             
             # Validate the split
             if validate:
-                # Check if the split conserves fingers
-                if old_l != player_hands[0] or old_r != player_hands[1]:
-                    error_code = "ERR_INVALID_SPLIT"
-                elif sum(player_hands) < 2:
-                    error_code = "ERR_INVALID_SPLIT"
-                elif sum(player_hands) != new_l + new_r:
-                    error_code = "ERR_INVALID_SPLIT"
-                elif not (0 <= new_l <= 4 and 0 <= new_r <= 4):
-                    error_code = "ERR_INVALID_SPLIT"
-                # Check for reversal (X|Y → Y|X where X != Y)
-                elif new_l == player_hands[1] and new_r == player_hands[0] and player_hands[0] != player_hands[1]:
-                    error_code = "ERR_REVERSAL"
-                # Check for invalid 1|0 or 0|1 split
-                elif player_hands == (1, 0) or player_hands == (0, 1):
-                    error_code = "ERR_INVALID_SPLIT"
-                # Check for no change
-                elif (new_l, new_r) == player_hands:
+                if (old_l, old_r) != player_hands:
                     error_code = "ERR_INVALID_SPLIT"
+                else:
+                    error_code = RULES.split_error(player_hands, (new_l, new_r))
             
             # Apply the split if valid
             if not error_code:
@@ -239,52 +211,16 @@ class GamePath:
 # --- Game Logic ---
 def get_possible_taps(state):
     """Returns all possible tap moves from the current state."""
-    taps = []
     player = state.current_player
-    player_hands = state.get_player_hands()
-    opponent_hands = state.get_opponent_hands()
-    
-    for att_hand in range(2):
-        if player_hands[att_hand] > 0:  # Can only tap with alive hand
-            for def_hand in range(2):
-                if opponent_hands[def_hand] > 0:  # Can only tap alive hand
-                    taps.append(GameMove("tap", player, (att_hand, def_hand)))
-    return taps
+    return [GameMove("tap", player, (att_hand, def_hand))
+            for att_hand, def_hand, _ in RULES.taps(state.get_player_hands(), state.get_opponent_hands())]
 
 def get_possible_splits(state):
     """Returns all possible split moves from the current state."""
-    splits = []
     player = state.current_player
     player_hands = state.get_player_hands()
-    
-    total_fingers = sum(player_hands)
-    
-    # Cannot split if < 2 fingers or both hands dead
-    if total_fingers < 2 or player_hands == (0, 0):
-        return splits
-        
-    # Cannot split from 1|0 or 0|1
-    if player_hands == (1, 0) or player_hands == (0, 1):
-        return splits
-        
-    for new_l in range(total_fingers + 1):
-        new_r = total_fingers - new_l
-        
-        # Must be valid hand values
-        if not (0 <= new_l <= 4 and 0 <= new_r <= 4):
-            continue
-            
-        # Cannot be the same as current
-        if (new_l, new_r) == player_hands:
-            continue
-            
-        # Cannot be a reversal (X|Y → Y|X where X != Y)
-        if new_l == player_hands[1] and new_r == player_hands[0] and player_hands[0] != player_hands[1]:
-            continue
-            
-        splits.append(GameMove("split", player, (player_hands[0], player_hands[1], new_l, new_r)))
-    
-    return splits
+    return [GameMove("split", player, player_hands + new_hands)
+            for new_hands in RULES.split_targets(player_hands)]
 
 def get_all_possible_moves(state):
     """Returns all possible moves from the current state."""
@@ -432,15 +368,189 @@ def calculate_metadata(game_paths):
         "p2_win_pct": p2_win_pct
     }
 
+# --- Counting Mode ---
+def build_state_graph():
+    """
+    Finds every state reachable from the initial state, ignoring the repeat rule.
+    Returns (states, successors): states[i] is a GameState and successors[i]
+    maps the index of each state one valid move away to the number of moves
+    leading there.
+    """
+    states = [GameState()]
+    index = {states[0].get_state_tuple(): 0}
+    successors = []
+    i = 0
+    while i < len(states):
+        state = states[i]
+        targets = {}
+        if not state.is_terminal():
+            for move in get_all_possible_moves(state):
+                path = GamePath(state)
+                success, _ = path.apply_move(move)
+                if not success:
+                    continue
+                next_state = path.get_current_state()
+                key = next_state.get_state_tuple()
+                if key not in index:
+                    index[key] = len(states)
+                    states.append(next_state)
+                targets[index[key]] = targets.get(index[key], 0) + 1
+        successors.append(targets)
+        i += 1
+    return states, successors
+
+def count_games(max_moves=MAX_MOVES):
+    """
+    Counts the games explore_all_games would find without listing them.
+    
+    The games that continue from a state only depend on the state, the
+    number of plies left and the visited states that can still be reached
+    in those plies, so the counts are computed once per such triple and
+    shared by every path that reaches it. Branches that can't reach a
+    finished game in the plies left are cut.
+    Returns (counts, nodes): counts maps (length in plies, winner) to the
+    number of games, nodes is the number of distinct triples stored.
+    """
+    max_plies = max_moves * 2
+    states, successors = build_state_graph()
+    
+    # Fewest plies from each state to a finished game
+    predecessors = [[] for _ in states]
+    for i, targets in enumerate(successors):
+        for j in targets:
+            predecessors[j].append(i)
+    plies_to_end = [None] * len(states)
+    queue = deque(i for i, state in enumerate(states) if state.is_terminal())
+    for i in queue:
+        plies_to_end[i] = 0
+    while queue:
+        i = queue.popleft()
+        for j in predecessors[i]:
+            if plies_to_end[j] is None:
+                plies_to_end[j] = plies_to_end[i] + 1
+                queue.append(j)
+    
+    # Fewest plies from each state to every other state
+    distances = []
+    for i in range(len(states)):
+        distance = {i: 0}
+        queue = deque([i])
+        while queue:
+            j = queue.popleft()
+            for k in successors[j]:
+                if k not in distance:
+                    distance[k] = distance[j] + 1
+                    queue.append(k)
+        distances.append(distance)
+    
+    within_cache = {}
+    def within(i, plies):
+        """Bitmask of the states reachable from state i in at most plies plies."""
+        key = (i, plies)
+        if key not in within_cache:
+            within_cache[key] = sum(1 << j for j, distance in distances[i].items() if distance <= plies)
+        return within_cache[key]
+    
+    reach_cache = {}
+    def reach(i, plies):
+        """Bitmask of the states that can be entered from state i within plies plies."""
+        key = (i, plies)
+        if key not in reach_cache:
+            mask = 0
+            if plies > 0:
+                for j in successors[i]:
+                    mask |= within(j, plies - 1)
+            reach_cache[key] = mask
+        return reach_cache[key]
+    
+    memo = {}
+    def count_from(i, visited, plies_left):
+        # Remaining plies until the end of each game -> {winner: count}
+        if plies_left <= 0:
+            return {}
+        if states[i].is_terminal():
+            return {0: {states[i].get_winner(): 1}}
+        # A finished game has to be entered before the ply limit
+        if plies_to_end[i] is None or plies_to_end[i] >= plies_left:
+            return {}
+        
+        # Visited states that can't be entered again before the limit don't matter
+        visited &= reach(i, plies_left - 1)
+        key = (i, visited, plies_left)
+        if key in memo:
+            return memo[key]
+        
+        counts = {}
+        for j, moves in successors[i].items():
+            if visited >> j & 1:
+                continue
+            for plies, winners in count_from(j, visited | (1 << j), plies_left - 1).items():
+                entry = counts.setdefault(plies + 1, {})
+                for winner, count in winners.items():
+                    entry[winner] = entry.get(winner, 0) + count * moves
+        
+        memo[key] = counts
+        return counts
+    
+    counts = count_from(0, 1, max_plies)
+    by_length = {(plies, winner): count
+                 for plies, winners in counts.items() for winner, count in winners.items()}
+    return by_length, len(memo)
+
+def calculate_metadata_from_counts(counts):
+    """Calculates the same metadata as calculate_metadata from count_games' counts."""
+    total_games = sum(counts.values())
+    p1_wins = sum(count for (_, winner), count in counts.items() if winner == "P1")
+    p2_wins = sum(count for (_, winner), count in counts.items() if winner == "P2")
+    total_wins = p1_wins + p2_wins
+    
+    return {
+        "total_games": total_games,
+        "avg_length": sum(plies * count for (plies, _), count in counts.items()) / total_games if total_games else 0,
+        "p1_wins": p1_wins,
+        "p2_wins": p2_wins,
+        "p1_win_pct": (p1_wins / total_wins * 100) if total_wins > 0 else 0,
+        "p2_win_pct": (p2_wins / total_wins * 100) if total_wins > 0 else 0
+    }
+
+def print_metadata(metadata):
+    """Prints the dataset metadata summary."""
+    print("\n--- Dataset Metadata ---")
+    print(f"Total unique games: {metadata['total_games']:,}")
+    print(f"Average game length (moves): {metadata['avg_length']:.2f}")
+    print(f"Player 1 wins: {metadata['p1_wins']:,} ({metadata['p1_win_pct']:.2f}%)")
+    print(f"Player 2 wins: {metadata['p2_wins']:,} ({metadata['p2_win_pct']:.2f}%)")
+
 # --- Main Function ---
 def main():
-    print("Starting Complete Chopsticks Game Explorer")
-    print(f"Finding all unique games ending in ≤{MAX_MOVES} moves")
+    parser = argparse.ArgumentParser(description="Generate every Chopsticks game up to a length")
+    parser.add_argument("--max-moves", type=int, default=MAX_MOVES)
+    parser.add_argument("--count", action="store_true",
+                        help="only count the games by length and winner; no TSV is written")
+    args = parser.parse_args()
     
     start_time = time.time()
     
+    if args.count:
+        print(f"Counting all unique games ending in ≤{args.max_moves} moves")
+        counts, nodes = count_games(args.max_moves)
+        
+        print("\n--- Games by Length ---")
+        for plies in sorted({plies for plies, _ in counts}):
+            p1_wins = counts.get((plies, "P1"), 0)
+            p2_wins = counts.get((plies, "P2"), 0)
+            print(f"{plies:3d} plies: {p1_wins + p2_wins:,} games (P1 {p1_wins:,}, P2 {p2_wins:,})")
+        
+        print_metadata(calculate_metadata_from_counts(counts))
+        print(f"Distinct (state, plies left, visited set) entries stored: {nodes:,}")
+        print(f"Total elapsed time: {time.time() - start_time:.2f} seconds")
+        return
+    
+    print("Starting Complete Chopsticks Game Explorer")
+    print(f"Finding all unique games ending in ≤{args.max_moves} moves")
+    
     # Explore all games
-    all_games = explore_all_games(MAX_MOVES)
+    all_games = explore_all_games(args.max_moves)
     
     # Write to TSV
     print(f"Writing {len(all_games):,} games to {OUTPUT_FILENAME}")
@@ -452,11 +562,7 @@ def main():
     end_time = time.time()
     elapsed = end_time - start_time
     
-    print("\n--- Dataset Metadata ---")
-    print(f"Total unique games: {metadata['total_games']:,}")
-    print(f"Average game length (moves): {metadata['avg_length']:.2f}")
-    print(f"Player 1 wins: {metadata['p1_wins']:,} ({metadata['p1_win_pct']:.2f}%)")
-    print(f"Player 2 wins: {metadata['p2_wins']:,} ({metadata['p2_win_pct']:.2f}%)")
+    print_metadata(metadata)
     print(f"Total elapsed time: {elapsed:.2f} seconds")
 
 if __name__ == "__main__":
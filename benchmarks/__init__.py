@@ -0,0 +1 @@
+# Benchmarks for the Chopsticks engine and web application
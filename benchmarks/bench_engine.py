@@ -0,0 +1,149 @@
+"""
+Engine micro-benchmarks: move generation, move application, evaluation,
+fixed-depth search and database loading.
+"""
+import random
+from itertools import product
+
+from benchmarks.harness import benchmark, measure
+from engine import database_lookup
+from engine.game_state import GameState
+from engine.movegen import get_all_possible_moves
+from engine.evaluator import evaluate_position
+from engine.search import get_best_move
+from engine.perft import perft
+
+# Positions the search benchmarks start from
+SEARCH_POSITIONS = [
+    GameState((1, 1), (1, 1), 0),
+    GameState((2, 3), (1, 2), 0),
+    GameState((1, 0), (3, 2), 1),
+]
+
+SEARCH_DEPTHS = (2, 4, 6, 8)
+
+
+def all_positions():
+    """Every non-terminal position with either player to move."""
+    hands = list(product(range(5), repeat=2))
+    positions = []
+    for p1_hands, p2_hands, player in product(hands, hands, (0, 1)):
+        if p1_hands == (0, 0) or p2_hands == (0, 0):
+            continue
+        positions.append(GameState(p1_hands, p2_hands, player))
+    return positions
+
+
+def _per_position(result, count):
+    """Express a result measured over count positions per single call."""
+    result['positions'] = count
+    result['mean_s'] /= count
+    result['min_s'] /= count
+    result['max_s'] /= count
+    result['ops_per_s'] *= count
+    return result
+
+
+@benchmark("movegen.get_all_possible_moves")
+def bench_movegen(quick=False):
+    positions = all_positions()
+
+    def run():
+        for state in positions:
+            get_all_possible_moves(state)
+
+    return _per_position(measure(run, repeat=3 if quick else 7), len(positions))
+
+
+@benchmark("game_state.clone")
+def bench_clone(quick=False):
+    positions = all_positions()
+
+    def run():
+        for state in positions:
+            state.clone()
+
+    return _per_position(measure(run, repeat=3 if quick else 7), len(positions))
+
+
+@benchmark("game_state.apply_move")
+def bench_apply_move(quick=False):
+    # apply_move mutates the state, so each application works on a fresh clone
+    pairs = [(state, move) for state in all_positions() for move in get_all_possible_moves(state)]
+
+    def run():
+        for state, move in pairs:
+            state.clone().apply_move(move)
+
+    result = _per_position(measure(run, repeat=3 if quick else 7), len(pairs))
+    result['note'] = "includes one clone() per move"
+    return result
+
+
+@benchmark("evaluator.evaluate_position")
+def bench_evaluate(quick=False):
+    positions = all_positions()
+
+    def run():
+        for state in positions:
+            evaluate_position(state)
+
+    return _per_position(measure(run, repeat=3 if quick else 7), len(positions))
+
+
+@benchmark("batch_evaluator.evaluate_batch")
+def bench_evaluate_batch(quick=False):
+    import numpy as np
+    from engine.batch_evaluator import evaluate_batch
+    packed = np.array([state.pack() for state in all_positions()] * 100)
+
+    return _per_position(measure(lambda: evaluate_batch(packed), repeat=3 if quick else 7), len(packed))
+
+
+def _search_benchmark(depth):
+    def bench(quick=False):
+        def run():
+            random.seed(0)
+            for state in SEARCH_POSITIONS:
+                get_best_move(state.clone(), depth)
+
+        repeat = 3 if quick or depth >= 8 else 5
+        result = _per_position(measure(run, repeat=repeat, min_time=0.05 if quick else 0.2),
+                               len(SEARCH_POSITIONS))
+        result['depth'] = depth
+        return result
+    return bench
+
+
+for _depth in SEARCH_DEPTHS:
+    benchmark(f"search.get_best_move[depth={_depth}]", group="search")(_search_benchmark(_depth))
+
+
+@benchmark("perft[depth=5]", group="search")
+def bench_perft(quick=False):
+    initial = GameState()
+    result = measure(lambda: perft(initial, 5), repeat=3 if quick else 5)
+    result['leaves'] = perft(initial, 5)
+    result['leaves_per_s'] = result['leaves'] / result['mean_s']
+    return result
+
+
+@benchmark("mcts.mcts_search[iterations=2000]", group="search")
+def bench_mcts(quick=False):
+    from engine.mcts import mcts_search
+
+    def run():
+        random.seed(0)
+        for state in SEARCH_POSITIONS:
+            mcts_search(state, iterations=2000)
+
+    result = _per_position(measure(run, repeat=3 if quick else 5, min_time=0.05), len(SEARCH_POSITIONS))
+    result['iterations_per_s'] = 2000 / result['mean_s']
+    return result
+
+
+@benchmark("database_lookup.load_or_generate_database", group="startup")
+def bench_database_load(quick=False):
+    result = measure(database_lookup.load_or_generate_database, repeat=3 if quick else 5, min_time=0.05)
+    result['positions'] = database_lookup.state_count
+    return result
@@ -0,0 +1,60 @@
+"""
+HTTP benchmarks using Flask's test client.
+"""
+import random
+import logging
+
+from benchmarks.harness import benchmark, clear_engine_caches, measure
+from benchmarks.logging_overhead import play_requests
+
+
+def _client():
+    import app as app_module
+    # Keep the benchmark output clean and the numbers comparable
+    logging.getLogger().setLevel(logging.WARNING)
+    app_module.REQUEST_LOG_SAMPLE_RATE = 0.0
+    return app_module.app.test_client()
+
+
+def _make_move_benchmark(difficulty, warm):
+    def bench(quick=False):
+        client = _client()
+        num_requests = 20 if quick else 100
+
+        # play_requests returns the time spent inside make_move only. Every
+        # repeat replays the same games: cold runs start from empty caches,
+        # warm runs after one unmeasured pass has filled them
+        clear_engine_caches()
+        if warm:
+            play_requests(client, num_requests, difficulty, seed=1234)
+        timings = []
+        for _ in range(1 if quick else 3):
+            if not warm:
+                clear_engine_caches()
+            timings.append(play_requests(client, num_requests, difficulty, seed=1234) / num_requests)
+        timings.sort()
+        mean = sum(timings) / len(timings)
+        return {
+            'mean_s': mean,
+            'min_s': timings[0],
+            'max_s': timings[-1],
+            'ops_per_s': 1 / mean if mean else 0,
+            'number': num_requests,
+            'repeat': len(timings),
+            'difficulty': difficulty,
+            'caches': 'warm' if warm else 'cold',
+        }
+    return bench
+
+
+for _difficulty in ('novice', 'intermediate', 'master'):
+    benchmark(f"http.make_move[{_difficulty}]", group="http")(_make_move_benchmark(_difficulty, warm=False))
+    benchmark(f"http.make_move_warm[{_difficulty}]", group="http")(_make_move_benchmark(_difficulty, warm=True))
+
+
+@benchmark("http.new_game", group="http")
+def bench_new_game(quick=False):
+    client = _client()
+    random.seed(0)
+    return measure(lambda: client.post('/api/new_game', json={'difficulty': 'master'}),
+                   repeat=3 if quick else 5)
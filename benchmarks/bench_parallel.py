@@ -0,0 +1,56 @@
+"""
+Serial vs root-split parallel search at master-level and deeper depths.
+"""
+import os
+import time
+import random
+
+from benchmarks.harness import benchmark
+from engine.game_state import GameState
+from engine.search import get_best_move
+from engine.parallel_search import get_best_move_parallel, get_executor
+
+PARALLEL_DEPTHS = (8, 10, 12)
+
+PARALLEL_POSITIONS = [
+    GameState((1, 1), (1, 1), 0),
+    GameState((2, 3), (1, 2), 0),
+]
+
+
+def _time_search(search, depth, repeat):
+    timings = []
+    for _ in range(repeat):
+        random.seed(0)
+        start = time.perf_counter()
+        for state in PARALLEL_POSITIONS:
+            search(state.clone(), depth)
+        timings.append((time.perf_counter() - start) / len(PARALLEL_POSITIONS))
+    return min(timings)
+
+
+def _parallel_benchmark(depth):
+    def bench(quick=False):
+        workers = os.cpu_count() or 1
+        # Start the pool outside the measurement
+        get_executor(workers)
+        repeat = 1 if quick else 3
+        serial = _time_search(get_best_move, depth, repeat)
+        parallel = _time_search(lambda state, d: get_best_move_parallel(state, d, workers), depth, repeat)
+        return {
+            'mean_s': parallel,
+            'min_s': parallel,
+            'max_s': parallel,
+            'ops_per_s': 1 / parallel if parallel else 0,
+            'number': len(PARALLEL_POSITIONS),
+            'repeat': repeat,
+            'depth': depth,
+            'workers': workers,
+            'serial_s': serial,
+            'speedup': serial / parallel if parallel else 0,
+        }
+    return bench
+
+
+for _depth in PARALLEL_DEPTHS:
+    benchmark(f"parallel_search.get_best_move_parallel[depth={_depth}]", group="parallel")(_parallel_benchmark(_depth))
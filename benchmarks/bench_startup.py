@@ -0,0 +1,159 @@
+"""
+Server startup time and worker memory, with and without PRELOAD.
+
+Each benchmark starts gunicorn (with gunicorn.conf.py) on a free port,
+times how long it takes to answer its first request, plays a few games so
+the workers have done real work, and then reads the memory of the master
+and its workers from /proc/<pid>/smaps_rollup (Linux only). RSS counts
+pages shared with the master; USS (private pages) is what each extra
+worker really costs and PSS shares the shared pages out between processes.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+import urllib.error
+import urllib.request
+from http.cookiejar import CookieJar
+
+from benchmarks.harness import benchmark
+from benchmarks.logging_overhead import play_requests
+
+STARTUP_WORKERS = (1, 2, 4)
+
+STARTUP_TIMEOUT = 60
+
+
+class _Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def get_json(self):
+        return json.loads(self.body)
+
+
+class _HttpClient:
+    """The part of Flask's test client play_requests uses, over real HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def post(self, path, json=None):
+        request = urllib.request.Request(self.base_url + path, data=_dumps(json),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(request, timeout=STARTUP_TIMEOUT) as response:
+                return _Response(response.status, response.read())
+        except urllib.error.HTTPError as error:
+            return _Response(error.code, error.read())
+
+
+def _dumps(data):
+    return json.dumps(data).encode()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid follows the parenthesised command name
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _memory(pid):
+    """{'rss', 'pss', 'uss'} of a process in KiB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def _wait_until_up(client, server):
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+        try:
+            if client.post('/api/new_game', json={'difficulty': 'novice'}).status_code == 200:
+                return
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError(f"gunicorn didn't answer within {STARTUP_TIMEOUT}s")
+
+
+def measure_startup(workers, preload, requests=60):
+    """
+    Start a server, time its first answer and read its memory after playing
+    requests moves. Returns a result dict.
+    """
+    port = _free_port()
+    env = dict(os.environ, PRELOAD="1" if preload else "0", LOG_PROFILE="production")
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+                               "--workers", str(workers), "main:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = _HttpClient(f"http://127.0.0.1:{port}")
+        _wait_until_up(client, server)
+        startup = time.perf_counter() - start
+        play_requests(client, requests, 'intermediate', seed=1234)
+
+        master = _memory(server.pid)
+        worker_memory = [_memory(pid) for pid in _children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait(timeout=STARTUP_TIMEOUT)
+
+    per_worker = {key: sum(memory[key] for memory in worker_memory) / max(len(worker_memory), 1)
+                  for key in ('rss', 'pss', 'uss')}
+    return {
+        'mean_s': startup,
+        'min_s': startup,
+        'max_s': startup,
+        'ops_per_s': 1 / startup if startup else 0,
+        'number': 1,
+        'repeat': 1,
+        'workers': workers,
+        'preload': preload,
+        'master_rss_kib': master['rss'],
+        'worker_rss_kib': per_worker['rss'],
+        'worker_uss_kib': per_worker['uss'],
+        'total_pss_kib': master['pss'] + sum(memory['pss'] for memory in worker_memory),
+    }
+
+
+def _startup_benchmark(workers, preload):
+    def bench(quick=False):
+        return measure_startup(workers, preload, requests=20 if quick else 60)
+    return bench
+
+
+for _preload in (False, True):
+    for _workers in STARTUP_WORKERS:
+        benchmark(f"startup.gunicorn[preload={int(_preload)},workers={_workers}]", group="startup")(
+            _startup_benchmark(_workers, _preload))
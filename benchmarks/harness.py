@@ -0,0 +1,127 @@
+"""
+Small benchmark harness: registration, timing and result comparison.
+"""
+import gc
+import re
+import sys
+import time
+import platform
+import subprocess
+
+# Registered benchmarks: name -> (function, group)
+BENCHMARKS = {}
+
+
+def benchmark(name, group="engine"):
+    """Register a benchmark function. The function returns a result dict."""
+    def decorator(fn):
+        BENCHMARKS[name] = (fn, group)
+        return fn
+    return decorator
+
+
+def measure(fn, repeat=5, min_time=0.2, number=None):
+    """
+    Time fn() the way timeit does: pick a loop count that runs for at least
+    min_time seconds, then repeat that loop and keep the per-call times.
+    """
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_time:
+                break
+            number *= 2
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    return {
+        'mean_s': mean,
+        'min_s': timings[0],
+        'max_s': timings[-1],
+        'ops_per_s': 1 / mean if mean else 0,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def clear_engine_caches():
+    """
+    Drop every result the engine keeps between requests (responses, proofs,
+    root move values and solved positions), so the next run starts cold.
+    MCTS trees are kept per game, and every replayed game is a new one.
+    """
+    from engine import pns, solver
+    from engine.policy import value_cache
+    from engine.response_cache import response_cache
+    response_cache.clear()
+    value_cache.clear()
+    pns.clear_cache()
+    solver.clear_memo()
+
+
+def run_benchmarks(pattern=None, quick=False):
+    """Run every registered benchmark whose name matches pattern."""
+    results = {}
+    for name, (fn, group) in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        print(f"running {name} ...", file=sys.stderr)
+        result = fn(quick=quick)
+        result['group'] = group
+        results[name] = result
+    return results
+
+
+def environment_info():
+    """Describe the machine and commit the results were taken on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare_results(old, new, threshold=0.10):
+    """
+    Compare two result files by mean time per operation.
+    Returns a list of (name, old_mean, new_mean, ratio, status) rows.
+    """
+    rows = []
+    old_benchmarks = old.get('benchmarks', {})
+    for name, result in new.get('benchmarks', {}).items():
+        if name not in old_benchmarks:
+            rows.append((name, None, result['mean_s'], None, 'new'))
+            continue
+        old_mean = old_benchmarks[name]['mean_s']
+        ratio = result['mean_s'] / old_mean if old_mean else float('inf')
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1 - threshold:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((name, old_mean, result['mean_s'], ratio, status))
+    return rows
@@ -0,0 +1,91 @@
+"""
+Measure the per-request cost of each logging profile.
+
+Plays the same scripted games through the Flask test client once per
+profile and reports the average time spent per /api/make_move request.
+Run from the repository root:
+
+    python -m benchmarks.logging_overhead --requests 200
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from benchmarks.harness import clear_engine_caches
+
+
+def play_requests(client, num_requests, difficulty, seed):
+    """Play scripted games until num_requests moves were made, returns total seconds."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    elapsed = 0.0
+    made = 0
+    while made < num_requests:
+        data = client.post('/api/new_game', json={'difficulty': difficulty}).get_json()
+        while made < num_requests and not data.get('is_game_over') and data.get('possible_moves'):
+            move = rng.choice(data['possible_moves'])
+            start = time.perf_counter()
+            response = client.post('/api/make_move', json={'move': move})
+            elapsed += time.perf_counter() - start
+            made += 1
+            if response.status_code != 200:
+                break
+            data = response.get_json()
+    return elapsed
+
+
+def run(num_requests=200, difficulty='intermediate', seed=1234):
+    """Benchmark every logging profile and return the results as a dict."""
+    import app as app_module
+
+    # Send log output nowhere so the terminal doesn't skew the measurement
+    devnull = open(os.devnull, 'w')
+    root = logging.getLogger()
+    for handler in root.handlers:
+        handler.setStream(devnull)
+
+    client = app_module.app.test_client()
+    results = {}
+    for name, profile in app_module.LOG_PROFILES.items():
+        root.setLevel(profile['level'])
+        app_module.REQUEST_LOG_SAMPLE_RATE = profile['request_sample_rate']
+        # Every profile replays the same games from cold caches
+        clear_engine_caches()
+        elapsed = play_requests(client, num_requests, difficulty, seed)
+        results[name] = {
+            'requests': num_requests,
+            'total_s': elapsed,
+            'per_request_ms': elapsed / num_requests * 1000,
+        }
+
+    base = results['production']['per_request_ms']
+    for name, result in results.items():
+        result['overhead_pct'] = (result['per_request_ms'] - base) / base * 100 if base else 0
+    devnull.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help="make_move requests per profile")
+    parser.add_argument('--difficulty', default='intermediate', choices=['novice', 'intermediate', 'master'])
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.requests, args.difficulty, args.seed)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{'profile':<12} {'per request':>12} {'overhead':>10}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['per_request_ms']:>10.3f}ms {result['overhead_pct']:>9.1f}%")
+
+
+if __name__ == '__main__':
+    main()
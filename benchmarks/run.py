@@ -0,0 +1,72 @@
+"""
+Run the benchmark suite and write the results as JSON.
+
+    python -m benchmarks.run -o results.json
+    python -m benchmarks.run -k search --quick
+    python -m benchmarks.run -o new.json --compare old.json
+
+Comparing exits with status 1 when a benchmark got slower than the
+threshold, so it can gate a CI job.
+"""
+import sys
+import json
+import argparse
+
+from benchmarks.harness import run_benchmarks, environment_info, compare_results
+# Importing the modules registers their benchmarks
+from benchmarks import bench_engine, bench_http, bench_parallel, bench_startup  # noqa: F401
+
+
+def print_results(results):
+    print(f"{'benchmark':<60} {'mean':>12} {'ops/s':>14}")
+    for name, result in results.items():
+        line = f"{name:<60} {result['mean_s'] * 1000:>10.4f}ms {result['ops_per_s']:>14.1f}"
+        if 'speedup' in result:
+            line += f"  speedup {result['speedup']:.2f}x on {result['workers']} workers"
+        if 'worker_uss_kib' in result:
+            line += (f"  worker RSS {result['worker_rss_kib'] / 1024:.1f}MiB, "
+                     f"USS {result['worker_uss_kib'] / 1024:.1f}MiB, total PSS {result['total_pss_kib'] / 1024:.1f}MiB")
+        print(line)
+
+
+def print_comparison(rows):
+    print(f"{'benchmark':<60} {'old':>12} {'new':>12} {'ratio':>8}  status")
+    for name, old_mean, new_mean, ratio, status in rows:
+        old_str = f"{old_mean * 1000:.4f}ms" if old_mean is not None else "-"
+        ratio_str = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<60} {old_str:>12} {new_mean * 1000:>10.4f}ms {ratio_str:>8}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chopsticks benchmark suite")
+    parser.add_argument('-k', dest='pattern', help="only run benchmarks matching this regex")
+    parser.add_argument('-o', '--output', help="write JSON results to this file")
+    parser.add_argument('--compare', help="JSON results of a previous run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    parser.add_argument('--quick', action='store_true', help="fewer repetitions, for smoke runs")
+    args = parser.parse_args()
+
+    data = {
+        'environment': environment_info(),
+        'benchmarks': run_benchmarks(args.pattern, args.quick),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    print_results(data['benchmarks'])
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        rows = compare_results(old, data, args.threshold)
+        print()
+        print_comparison(rows)
+        if any(row[4] == 'REGRESSION' for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Move selection for the computer player.
+"""
+import os
+import math
+import logging
+from engine.search import get_best_move, get_best_move_timed
+from engine.database_lookup import is_in_database, get_best_move_from_database
+from engine.profiler import profile_move_values, profile_search
+from engine.mcts import mcts_search
+from engine.pns import prove_win
+from engine.solver import count_reachable, solve_position
+from engine.tables import visited_mask
+from engine.response_cache import proof_key, response_cache, response_key
+from engine.policy import DECIDED_EVALUATION, POLICY_DEPTH, choose_move, move_values
+from engine.book import book_move
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Proof-number search budget (nodes), the same for every difficulty level;
+# a proven forced win is the best of the move values the policy picks from
+PROOF_NODE_LIMIT = 1500
+
+# Exact solver budget (stored nodes), the same for every difficulty level;
+# when the game's history leaves few enough reachable positions the solved
+# outcomes are the move values the policy picks from
+SOLVER_NODE_LIMIT = 1000
+
+# The solver only runs when fewer unvisited positions than this are
+# reachable. Over random games a 1000-node solve answered every position
+# below 25 of them and about 1 in 20 of the rest (which all have 500 or
+# more), each failure costing about 8ms.
+SOLVER_MAX_REACHABLE = 100
+
+# Solver outcomes reported as evaluations
+SOLVER_EVALUATIONS = {1: 100, 0: 0, -1: -100}
+
+# Search backends get_ai_move accepts
+BACKENDS = ('alphabeta', 'mcts')
+
+# Search backend used when the caller doesn't pick one
+AI_BACKEND = os.environ.get("AI_BACKEND", "alphabeta")
+if AI_BACKEND not in BACKENDS:
+    raise ValueError(f"Unknown AI_BACKEND '{AI_BACKEND}', expected one of {', '.join(BACKENDS)}")
+
+# MCTS thinking time in milliseconds for each difficulty level
+MCTS_TIME_LIMITS = {
+    'novice': 20,
+    'intermediate': 80,
+    'master': 250,
+}
+
+
+def get_ai_move(game, difficulty, depth=None, time_limit_ms=None, profile=False, info=None,
+                backend=None, game_id=None, use_cache=True, stop=None):
+    """
+    Get the best move for the AI based on difficulty level.
+
+    With the alpha-beta backend every difficulty picks its move from the
+    same move values (see engine.policy): the solved outcomes when the
+    solver answers, otherwise the root move values with a proven forced win
+    on top. All levels do the same work and share the cached results. depth overrides this with a plain search
+    to that depth and time_limit_ms with an iterative deepening search
+    within that budget. With profile set the search that picks the move
+    (the move values, or the explicit search) runs under the profiler; the
+    move is chosen exactly as without it. backend picks one of BACKENDS
+    (default AI_BACKEND; anything else raises ValueError); MCTS
+    thinks for time_limit_ms or the difficulty's MCTS_TIME_LIMITS entry and
+    reuses its tree between moves of the same game_id. If an info dict is
+    given it is filled with where the move came from ('source'), the search
+    depth, the profile report, when a forced win was proven, its length
+    in plies ('forced_win') and, when the exact solver ran, its node count
+    and time ('solver').
+
+    Unless use_cache is false, every level plays from the opening book
+    while the game is in it, and move values, forced-win search
+    outcomes and MCTS responses are kept in caches (which pondering fills
+    ahead of time) and reused when the same position and history come up
+    again.
+
+    With a stop event the solver, the proof search and the move values or
+    MCTS search raise SearchCancelled once it is set (see engine.ponder);
+    no response or move values are cached then.
+
+    Returns (move, evaluation, perfect).
+    """
+    if info is None:
+        info = {}
+    perfect = False
+    backend = backend or AI_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{backend}'")
+
+    explicit = depth is not None or time_limit_ms is not None
+
+    # Play from the opening book while the game is still in it; the book
+    # covers the opening with variety, the database only with its best move
+    if use_cache and not explicit:
+        move = book_move(game)
+        if move is not None:
+            info['source'] = 'book'
+            logger.debug("Using opening book move: %s", move)
+            return move, 0, perfect
+
+    # Check if the position is in the database
+    if is_in_database(game):
+        move, evaluation = get_best_move_from_database(game)
+        perfect = True
+        info['source'] = 'database'
+        logger.debug("Using perfect move from database: %s", move)
+        return move, evaluation, perfect
+
+    if backend == 'alphabeta' and not explicit:
+        return policy_move(game, difficulty, info, use_cache, profile, stop)
+
+    # Solve the position exactly, history included, if it is small enough
+    if not explicit:
+        move, evaluation = solved_move(game, info, stop)
+        if move is not None:
+            return move, evaluation, True
+
+    if explicit or not use_cache:
+        return search_move(game, difficulty, depth, time_limit_ms, profile, info, backend, game_id, stop)
+
+    key = response_key(game, difficulty, backend)
+    cached = response_cache.get(key)
+    if cached is not None:
+        move, evaluation, perfect, cached_info = cached
+        info.update(cached_info)
+        info['cached'] = True
+        logger.debug("Using cached response: %s (eval: %s)", move, evaluation)
+        return move, evaluation, perfect
+
+    move, evaluation, perfect = search_move(game, difficulty, depth, time_limit_ms, profile, info, backend, game_id,
+                                            stop)
+    if move is not None:
+        response_cache.put(key, (move, evaluation, perfect, dict(info)))
+    return move, evaluation, perfect
+
+
+def solved_values(game, info, stop=None):
+    """
+    Solve the game with its history within SOLVER_NODE_LIMIT, if its
+    history leaves fewer than SOLVER_MAX_REACHABLE positions to play.
+    Returns the (move, evaluation) list of the solved outcomes, or None if
+    the solver didn't run or its budget ran out.
+    """
+    if count_reachable(game.pack(), visited_mask(game), SOLVER_MAX_REACHABLE) >= SOLVER_MAX_REACHABLE:
+        return None
+    solution = solve_position(game, SOLVER_NODE_LIMIT, stop)
+    info['solver'] = {'result': solution['result'], 'nodes': solution['nodes'],
+                      'seconds': round(solution['seconds'], 4)}
+    if not solution['moves']:
+        return None
+    logger.debug("Solved: %s (%d nodes)", solution['result'], solution['nodes'])
+    return [(move, SOLVER_EVALUATIONS[outcome]) for move, outcome in solution['moves']]
+
+
+def solved_move(game, info, stop=None):
+    """
+    A best move of the solved game (see solved_values).
+    Returns (move, evaluation), or (None, None) if it wasn't solved.
+    """
+    values = solved_values(game, info, stop)
+    if values is None:
+        return None, None
+    move, evaluation = max(values, key=lambda move_value: move_value[1])
+    info['source'] = 'solver'
+    logger.debug("Using solved move: %s (eval: %s)", move, evaluation)
+    return move, evaluation
+
+
+def proven_win(game, stop=None, use_cache=True):
+    """
+    Look for a forced win within PROOF_NODE_LIMIT. Unless use_cache is
+    false the outcome is cached, whatever it is, so a position searched
+    before (or pondered) doesn't spend the budget again.
+    Returns (proof, cached): the prove_win result, or None when no win was
+    proven, and whether it came from the cache.
+    """
+    key = proof_key(game, PROOF_NODE_LIMIT)
+    proof = response_cache.get(key) if use_cache else None
+    cached = proof is not None
+    if proof is None:
+        proof = prove_win(game, PROOF_NODE_LIMIT, stop)
+        if use_cache:
+            response_cache.put(key, proof)
+    if proof['result'] == 'win' and proof['move'] is not None:
+        return proof, cached
+    return None, cached
+
+
+def forced_win_move(game, info, stop=None):
+    """
+    Look for a forced win, without the cache.
+    Returns the winning move, or None.
+    """
+    proof, _ = proven_win(game, stop, use_cache=False)
+    if proof is None:
+        return None
+    info['source'] = 'proof'
+    info['forced_win'] = proof['distance']
+    logger.debug("Forced win in %d plies: %s", proof['distance'], proof['move'])
+    return proof['move']
+
+
+def policy_move(game, difficulty, info, use_cache=True, profile=False, stop=None):
+    """
+    Pick a move with the difficulty's policy over the move values every
+    level shares: the solved outcomes if the solver answers, otherwise the
+    root move values, computed under the profiler if profile is set, with a
+    proven forced win as the best move. The stop event cancels any of the
+    searches. The proof and the move values come from the caches unless
+    use_cache is false.
+    Returns (move, evaluation, perfect); perfect when the move is a solved
+    best move or the proven win.
+    """
+    values = solved_values(game, info, stop)
+    if values is not None:
+        move, evaluation = choose_move(values, difficulty)
+        info['source'] = 'solver'
+        logger.debug("Using %s policy over solved values: %s (eval: %s)", difficulty, move, evaluation)
+        return move, evaluation, evaluation == max(value for _, value in values)
+
+    proof, proof_cached = proven_win(game, stop, use_cache)
+    if profile:
+        values, cached, info['profile'] = profile_move_values(game, POLICY_DEPTH, use_cache)
+    else:
+        values, cached = move_values(game, POLICY_DEPTH, use_cache, stop)
+    if proof is not None:
+        # The proven win beats whatever the search saw within its horizon
+        values = [(move, math.inf if move is proof['move'] else min(value, DECIDED_EVALUATION))
+                  for move, value in values]
+    move, evaluation = choose_move(values, difficulty)
+    if cached and proof_cached:
+        info['cached'] = True
+    if proof is not None and move is proof['move']:
+        info['source'] = 'proof'
+        info['forced_win'] = proof['distance']
+        logger.debug("Forced win in %d plies: %s", proof['distance'], move)
+        return move, evaluation, True
+
+    info['source'] = f"policy{POLICY_DEPTH}"
+    info['depth'] = POLICY_DEPTH
+    logger.debug("Using %s policy over depth %d values: %s (eval: %s)", difficulty, POLICY_DEPTH, move, evaluation)
+    return move, evaluation, False
+
+
+def search_move(game, difficulty, depth=None, time_limit_ms=None, profile=False, info=None,
+                backend=None, game_id=None, stop=None):
+    """
+    Search for the AI's move without consulting the database or the caches.
+    Arguments as for get_ai_move. Returns (move, evaluation, perfect).
+    """
+    if info is None:
+        info = {}
+    perfect = False
+
+    # Look for a forced win before searching
+    if depth is None:
+        move = forced_win_move(game, info, stop)
+        if move is not None:
+            return move, 100, True
+
+    if (backend or AI_BACKEND) == 'mcts':
+        if time_limit_ms is None:
+            time_limit_ms = MCTS_TIME_LIMITS.get(difficulty, MCTS_TIME_LIMITS['novice'])
+        move, evaluation, stats = mcts_search(game, time_limit_ms, game_id=game_id, stop=stop)
+        info['source'] = 'mcts'
+        info['mcts'] = stats
+        return move, evaluation, perfect
+
+    if depth is None:
+        depth = POLICY_DEPTH
+
+    # Use minimax/alpha-beta search for the move
+    if time_limit_ms is not None:
+        move, evaluation, depth = get_best_move_timed(game, time_limit_ms)
+    elif profile:
+        move, evaluation, info['profile'] = profile_search(game, depth)
+    else:
+        move, evaluation = get_best_move(game, depth)
+    info['source'] = f"search{depth}"
+    info['depth'] = depth
+    logger.debug("Using search with depth %d: %s (eval: %s)", depth, move, evaluation)
+
+    return move, evaluation, perfect
@@ -0,0 +1,298 @@
+"""
+Compact binary archive of Chopsticks games.
+
+A game is stored as its starting packed position and one byte per ply: the
+index of the move in tables.MOVES[packed] (the same move code the opening
+book uses). States, notation and winners are recomputed on read by walking
+the move tables, so nothing the TSV repeats on every row is stored.
+
+File format: a header (magic, version, codec) followed by blocks. Each
+block is a block header (game count, compressed size, both u32) and the
+block's games compressed with the codec (zlib or lzma). Uncompressed, a
+game is its starting packed position (u16), its number of plies (u16) and
+then the move codes. Blocks are read one at a time, so scanning an archive
+needs the memory of one block, and a block can be read on its own from its
+file offset (see engine.game_index).
+
+    python -m engine.archive complete_chopsticks_games.tsv complete_chopsticks_games.cga
+    python -m engine.archive --export complete_chopsticks_games.cga complete_chopsticks_games.tsv
+"""
+import os
+import re
+import csv
+import sys
+import lzma
+import time
+import zlib
+import struct
+import logging
+import argparse
+from engine.game_state import GameState, pack_position, unpack_position
+from engine.tables import MOVES, TERMINAL, WINNER
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MAGIC = b"CGAR"
+ARCHIVE_VERSION = 1
+
+# Codec name -> (codec byte in the header, compress, decompress)
+CODECS = {
+    'zlib': (0, lambda data: zlib.compress(data, 9), zlib.decompress),
+    'lzma': (1, lzma.compress, lzma.decompress),
+}
+
+# Games per compressed block
+BLOCK_GAMES = 4096
+
+TSV_FIELDS = ["GameID", "Turn", "State", "Move", "NextState", "Error", "Winner"]
+
+_HEADER = struct.Struct("<4sBB")
+_BLOCK = struct.Struct("<II")
+_GAME = struct.Struct("<HH")
+
+INITIAL_POSITION = GameState().pack()
+
+# _CODES[packed] -> {notation: move code}, built on first use
+_CODES = {}
+
+
+def move_code(packed, move):
+    """Code of a move from packed: its index in MOVES[packed]."""
+    codes = _CODES.get(packed)
+    if codes is None:
+        codes = _CODES[packed] = {entry.get_notation(): code for code, (entry, _) in enumerate(MOVES[packed])}
+    notation = move if isinstance(move, str) else move.get_notation()
+    if notation not in codes:
+        raise ValueError(f"{notation} is not a move from position {packed}")
+    return codes[notation]
+
+
+def encode_game(moves, start=INITIAL_POSITION):
+    """Move codes of a game given as GameMoves or notation strings."""
+    codes = bytearray()
+    packed = start
+    for move in moves:
+        code = move_code(packed, move)
+        codes.append(code)
+        packed = MOVES[packed][code][1]
+    return bytes(codes)
+
+
+def decode_game(start, codes):
+    """The plies of a game as a list of (packed, move, next_packed)."""
+    plies = []
+    packed = start
+    for code in codes:
+        move, next_packed = MOVES[packed][code]
+        plies.append((packed, move, next_packed))
+        packed = next_packed
+    return plies
+
+
+class ArchiveWriter:
+    """Streams games into an archive file, one compressed block at a time."""
+
+    def __init__(self, path, codec='lzma', block_games=BLOCK_GAMES):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {', '.join(CODECS)}")
+        self.codec_id, self.compress, _ = CODECS[codec]
+        self.block_games = block_games
+        self.games = 0
+        self._block = bytearray()
+        self._block_count = 0
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self.codec_id))
+
+    def write_game(self, moves, start=INITIAL_POSITION):
+        """Add a game given as GameMoves or notation strings."""
+        self.write_codes(encode_game(moves, start), start)
+
+    def write_codes(self, codes, start=INITIAL_POSITION):
+        """Add a game given as move codes."""
+        self._block += _GAME.pack(start, len(codes))
+        self._block += codes
+        self._block_count += 1
+        self.games += 1
+        if self._block_count >= self.block_games:
+            self._flush()
+
+    def _flush(self):
+        if not self._block_count:
+            return
+        data = self.compress(bytes(self._block))
+        self._file.write(_BLOCK.pack(self._block_count, len(data)))
+        self._file.write(data)
+        self._block = bytearray()
+        self._block_count = 0
+
+    def close(self):
+        self._flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _open_archive(path):
+    """Open an archive and check its header. Returns (file, decompress)."""
+    f = open(path, 'rb')
+    magic, version, codec_id = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+        f.close()
+        raise ValueError(f"{path} is not a game archive (version {ARCHIVE_VERSION})")
+    decompress = next((codec[2] for codec in CODECS.values() if codec[0] == codec_id), None)
+    if decompress is None:
+        f.close()
+        raise ValueError(f"{path} has an unknown codec {codec_id}")
+    return f, decompress
+
+
+def _unpack_block(data, count):
+    games = []
+    offset = 0
+    for _ in range(count):
+        start, plies = _GAME.unpack_from(data, offset)
+        offset += _GAME.size
+        games.append((start, data[offset:offset + plies]))
+        offset += plies
+    return games
+
+
+def read_blocks(path):
+    """Yields (file offset, [(start, codes), ...]) for every block of an archive, in order."""
+    f, decompress = _open_archive(path)
+    with f:
+        while True:
+            offset = f.tell()
+            block_header = f.read(_BLOCK.size)
+            if not block_header:
+                break
+            count, size = _BLOCK.unpack(block_header)
+            yield offset, _unpack_block(decompress(f.read(size)), count)
+
+
+def read_block(path, offset):
+    """The games of the block at a file offset given by read_blocks, as [(start, codes), ...]."""
+    f, decompress = _open_archive(path)
+    with f:
+        f.seek(offset)
+        count, size = _BLOCK.unpack(f.read(_BLOCK.size))
+        return _unpack_block(decompress(f.read(size)), count)
+
+
+def read_games(path):
+    """Yields (start, codes) for every game of an archive, in order."""
+    for _, games in read_blocks(path):
+        yield from games
+
+
+def state_string(packed):
+    """The TSV notation of a packed position, e.g. "= 1-1 | 2-3"."""
+    p1_hands, p2_hands, _ = unpack_position(packed)
+    return f"= {p1_hands[0]}-{p1_hands[1]} | {p2_hands[0]}-{p2_hands[1]}"
+
+
+def game_rows(game_number, start, codes):
+    """The TSV rows of a game as dicts, exactly as the generator writes them."""
+    rows = []
+    plies = decode_game(start, codes)
+    for turn, (packed, move, next_packed) in enumerate(plies, 1):
+        winner = ""
+        if turn == len(plies) and TERMINAL[next_packed]:
+            winner = WINNER[next_packed]
+        rows.append({
+            "GameID": f"G{game_number:04d}",
+            "Turn": turn,
+            "State": state_string(packed),
+            "Move": move.get_notation(),
+            "NextState": state_string(next_packed),
+            "Error": "",
+            "Winner": winner,
+        })
+    return rows
+
+
+def row_position(row):
+    """Packed position of a TSV row's State, with the mover of its Move to move."""
+    p1_part, p2_part = row['State'].lstrip("= ").split("|")
+    p1_hands = tuple(map(int, p1_part.strip().split("-")))
+    p2_hands = tuple(map(int, p2_part.strip().split("-")))
+    player = int(re.search(r"P(\d)", row['Move']).group(1)) - 1
+    return pack_position(p1_hands, p2_hands, player)
+
+
+def read_tsv_games(path):
+    """
+    Yields the games of a generator TSV as (start, move notations). Games
+    are rows sharing a GameID, in file order.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter='\t')
+        game_id = None
+        start = None
+        moves = []
+        for row in reader:
+            if row['GameID'] != game_id:
+                if moves:
+                    yield start, moves
+                game_id = row['GameID']
+                start = row_position(row)
+                moves = []
+            if row.get('Error'):
+                raise ValueError(f"Game {game_id} has an invalid move ({row['Error']}), which can't be archived")
+            moves.append(row['Move'])
+        if moves:
+            yield start, moves
+
+
+def convert_tsv(tsv_path, archive_path, codec='lzma', block_games=BLOCK_GAMES):
+    """Convert a generator TSV into an archive. Returns the number of games."""
+    with ArchiveWriter(archive_path, codec, block_games) as writer:
+        for start, moves in read_tsv_games(tsv_path):
+            writer.write_game(moves, start)
+    return writer.games
+
+
+def export_tsv(archive_path, tsv_path):
+    """Write an archive back out as a generator TSV. Returns the number of games."""
+    games = 0
+    with open(tsv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=TSV_FIELDS, delimiter='\t')
+        writer.writeheader()
+        for start, codes in read_games(archive_path):
+            games += 1
+            writer.writerows(game_rows(games, start, codes))
+    return games
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert between the generator TSV and the game archive")
+    parser.add_argument('source', help="a .tsv to archive, or an archive to export with --export")
+    parser.add_argument('output')
+    parser.add_argument('--codec', choices=list(CODECS), default='lzma')
+    parser.add_argument('--block-games', type=int, default=BLOCK_GAMES)
+    parser.add_argument('--export', action='store_true', help="write the archive in source back out as a TSV")
+    parser.add_argument('--no-index', action='store_true', help="don't build the position index of the archive")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.export:
+        games = export_tsv(args.source, args.output)
+    else:
+        games = convert_tsv(args.source, args.output, args.codec, args.block_games)
+    source_size, output_size = os.path.getsize(args.source), os.path.getsize(args.output)
+    print(f"{games} games: {source_size} bytes -> {output_size} bytes "
+          f"({source_size / max(output_size, 1):.1f}x) in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    if not args.export and not args.no_index:
+        # Imported here: the index builds on this module
+        from engine.game_index import build_index, index_path, save_index
+        save_index(build_index(args.output), index_path(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Vectorized evaluation of many Chopsticks positions at once.
+
+Positions are given as packed indices (see game_state.pack_position) and
+scored with NumPy array operations, reproducing evaluator.evaluate_position
+exactly. POSITION_SCORES holds the heuristic score of every possible packed
+position.
+"""
+import numpy as np
+from engine.game_state import NUM_POSITIONS
+from engine.evaluator import get_eval_table, DEFAULT_WEIGHTS, FEATURES
+
+
+def unpack_batch(packed):
+    """Splits an array of packed positions into (p1_l, p1_r, p2_l, p2_r, current_player) arrays."""
+    packed = np.asarray(packed, dtype=np.int64)
+    rest, current_player = np.divmod(packed, 2)
+    rest, p2_r = np.divmod(rest, 5)
+    rest, p2_l = np.divmod(rest, 5)
+    p1_l, p1_r = np.divmod(rest, 5)
+    return p1_l, p1_r, p2_l, p2_r, current_player
+
+
+def pack_batch(p1_l, p1_r, p2_l, p2_r, current_player):
+    """Packs hand arrays into packed position indices."""
+    return (((np.asarray(p1_l) * 5 + p1_r) * 5 + p2_l) * 5 + p2_r) * 2 + current_player
+
+
+def feature_batch(packed):
+    """
+    Compute the heuristic terms for an array of packed positions.
+    Returns (features, terminal_scores): an (n, len(FEATURES)) int array with
+    columns in evaluator.FEATURES order, and an int array holding +100/-100
+    for finished games and 0 elsewhere.
+    """
+    p1_l, p1_r, p2_l, p2_r, current_player = unpack_batch(packed)
+    p1_to_move = current_player == 0
+
+    # Hands of the side to move and of its opponent
+    player_l = np.where(p1_to_move, p1_l, p2_l)
+    player_r = np.where(p1_to_move, p1_r, p2_r)
+    opponent_l = np.where(p1_to_move, p2_l, p1_l)
+    opponent_r = np.where(p1_to_move, p2_r, p1_r)
+
+    player_alive_hands = (player_l > 0).astype(np.int64) + (player_r > 0)
+    opponent_alive_hands = (opponent_l > 0).astype(np.int64) + (opponent_r > 0)
+    player_total_fingers = player_l + player_r
+    opponent_total_fingers = opponent_l + opponent_r
+
+    can_split = (player_total_fingers >= 2) & (player_alive_hands > 0)
+
+    # Mod-5 traps: every (player hand, opponent hand) pair that would kill
+    traps = np.zeros_like(player_l)
+    for player_hand in (player_l, player_r):
+        for opponent_hand in (opponent_l, opponent_r):
+            remaining_to_zero = (5 - opponent_hand) % 5
+            traps = traps + ((opponent_hand > 0) & (remaining_to_zero > 0) & (player_hand == remaining_to_zero))
+
+    columns = {
+        'finger_advantage': player_total_fingers - opponent_total_fingers,
+        'hand_advantage': player_alive_hands - opponent_alive_hands,
+        'split_potential': np.where(can_split, player_total_fingers, 0),
+        'both_hands_alive': can_split & (player_alive_hands == 2),
+        'player_vulnerability': player_alive_hands == 1,
+        'opponent_vulnerability': opponent_alive_hands == 1,
+        'mirror_lock': (player_l == opponent_l) & (player_r == opponent_r) & (player_l == player_r),
+        'trap': traps,
+    }
+    features = np.stack([np.asarray(columns[name], dtype=np.int64) for name in FEATURES], axis=-1)
+
+    # Terminal positions: P1 losing both hands is checked first, as in GameState
+    p1_dead = (p1_l == 0) & (p1_r == 0)
+    p2_dead = (p2_l == 0) & (p2_r == 0)
+    current_player_wins = np.where(p1_dead, ~p1_to_move, p1_to_move)
+    terminal_scores = np.where(p1_dead | p2_dead, np.where(current_player_wins, 100, -100), 0)
+
+    return features, terminal_scores
+
+
+def weight_vector(weights=None):
+    """Weights dict as an array in FEATURES order."""
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
+    return np.array([weights[name] for name in FEATURES], dtype=np.float64)
+
+
+def evaluate_batch(packed, weights=None):
+    """
+    Evaluate an array of packed positions from the perspective of the side to
+    move, with DEFAULT_WEIGHTS unless other weights are given.
+    Returns an int16 array of scores between -100 and +100.
+    """
+    features, terminal_scores = feature_batch(packed)
+    score = np.clip(np.rint(features @ weight_vector(weights)), -100, 100)
+    score = np.where(terminal_scores != 0, terminal_scores, score)
+    return score.astype(np.int16)
+
+
+# Heuristic score of every packed position, indexed by pack_position
+POSITION_SCORES = evaluate_batch(np.arange(NUM_POSITIONS))
+
+
+def lookup_batch(packed, table=None):
+    """
+    Scores an array of packed positions through an eval table, by default the
+    one evaluate_position currently uses.
+    """
+    if table is None:
+        table = get_eval_table()
+    return np.asarray(table, dtype=np.int16)[np.asarray(packed)]
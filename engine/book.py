@@ -0,0 +1,206 @@
+"""
+Opening book for the Chopsticks AI.
+
+Maps the early positions of a game, with their history, to a weighted list
+of good moves so the first plies are answered instantly and with some
+variety. The book is built offline from deep root move values: every move
+within BOOK_MARGIN points of the best one gets a weight that falls off with
+its gap to the best.
+
+Positions are keyed by packed position and a hash of the visited-position
+bitmask, since the no-repeat rule makes the same position with a different
+history a different position. The binary file is a header (magic, version,
+entry count) followed by one record per position: packed position (u16),
+history hash (u64), move count (u8) and, per move, its index in
+tables.MOVES[packed] (u8) and weight (u16).
+
+    python -m engine.book --plies 6 --depth 8 --output opening_book.bin
+"""
+import os
+import sys
+import math
+import time
+import random
+import struct
+import hashlib
+import logging
+import argparse
+from engine.game_state import GameState
+from engine.search import root_move_values
+from engine.tables import MOVES, hand_bit, visited_mask
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BOOK_MAGIC = b"CBOK"
+BOOK_VERSION = 1
+
+# Book file read by the AI (set OPENING_BOOK to use another one)
+BOOK_FILE = os.environ.get("OPENING_BOOK", "opening_book.bin")
+
+# Build settings: plies covered, search depth of the move values, how far
+# behind the best move a book move may be and how fast weights fall off
+BOOK_PLIES = 6
+BOOK_DEPTH = 8
+BOOK_MARGIN = 10
+BOOK_TEMPERATURE = 4
+
+_HEADER = struct.Struct("<4sBI")
+_ENTRY = struct.Struct("<HQB")
+_MOVE = struct.Struct("<BH")
+
+# (packed, history hash) -> ((move index, weight), ...), loaded on first use
+_book = None
+
+
+def history_hash(mask):
+    """64-bit hash of a visited-position bitmask."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def book_key(game_state):
+    """Book key of a position with its history."""
+    return game_state.pack(), history_hash(visited_mask(game_state))
+
+
+def book_entry(game_state, depth=BOOK_DEPTH, margin=BOOK_MARGIN, temperature=BOOK_TEMPERATURE):
+    """Weighted book moves of a position as ((move index, weight), ...)."""
+    values = {move.get_notation(): value for move, value in root_move_values(game_state, depth)}
+    if not values:
+        return ()
+    best = max(values.values())
+    entry = []
+    for index, (move, _) in enumerate(MOVES[game_state.pack()]):
+        value = values.get(move.get_notation())
+        if value is not None and best - value <= margin:
+            entry.append((index, max(1, round(1000 * math.exp((value - best) / temperature)))))
+    return tuple(entry)
+
+
+def build_book(plies=BOOK_PLIES, depth=BOOK_DEPTH, margin=BOOK_MARGIN, temperature=BOOK_TEMPERATURE):
+    """
+    Build the book for both sides from the initial position.
+    The side the book is for only follows its book moves; every reply of
+    the other side is followed, since a human may play anything.
+    Returns a dict (packed, history hash) -> ((move index, weight), ...).
+    """
+    book = {}
+    for book_side in (0, 1):
+        frontier = [GameState()]
+        for _ in range(plies):
+            next_frontier = []
+            seen = set()
+            for game_state in frontier:
+                if game_state.is_terminal:
+                    continue
+                if game_state.current_player == book_side:
+                    key = book_key(game_state)
+                    if key not in book:
+                        book[key] = book_entry(game_state, depth, margin, temperature)
+                    indices = [index for index, _ in book[key]]
+                else:
+                    indices = range(len(MOVES[game_state.pack()]))
+                for index in indices:
+                    next_state = game_state.clone()
+                    success, _ = next_state.apply_move(MOVES[game_state.pack()][index][0])
+                    key = book_key(next_state)
+                    if success and key not in seen:
+                        seen.add(key)
+                        next_frontier.append(next_state)
+            frontier = next_frontier
+            logger.info("Book side %d: %d positions at the next ply, %d entries", book_side, len(frontier), len(book))
+    return {key: entry for key, entry in book.items() if entry}
+
+
+def save_book(book, path):
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, len(book)))
+        for (packed, history), entry in sorted(book.items()):
+            f.write(_ENTRY.pack(packed, history, len(entry)))
+            for index, weight in entry:
+                f.write(_MOVE.pack(index, weight))
+
+
+def load_book(path):
+    """Read a book file written by save_book."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, count = _HEADER.unpack_from(data, 0)
+    if magic != BOOK_MAGIC or version != BOOK_VERSION:
+        raise ValueError(f"{path} is not an opening book (version {BOOK_VERSION})")
+
+    book = {}
+    offset = _HEADER.size
+    for _ in range(count):
+        packed, history, moves = _ENTRY.unpack_from(data, offset)
+        offset += _ENTRY.size
+        book[(packed, history)] = tuple(_MOVE.unpack_from(data, offset + i * _MOVE.size) for i in range(moves))
+        offset += moves * _MOVE.size
+    return book
+
+
+def set_book(book):
+    """Use book for lookups (None disables the book)."""
+    global _book
+    _book = book if book is not None else {}
+
+
+def get_book():
+    """The book used for lookups, loaded from BOOK_FILE on first use."""
+    global _book
+    if _book is None:
+        if os.path.exists(BOOK_FILE):
+            _book = load_book(BOOK_FILE)
+            logger.info("Loaded opening book with %d positions from %s", len(_book), BOOK_FILE)
+        else:
+            _book = {}
+    return _book
+
+
+def book_moves(game_state):
+    """
+    The legal book moves of game_state as a list of (move, weight), empty if
+    the position with this history is not in the book.
+    """
+    entry = get_book().get(book_key(game_state))
+    if not entry:
+        return []
+    packed = game_state.pack()
+    mask = visited_mask(game_state)
+    moves = []
+    for index, weight in entry:
+        if index < len(MOVES[packed]):
+            move, child = MOVES[packed][index]
+            if not mask & hand_bit(child):
+                moves.append((move, weight))
+    return moves
+
+
+def book_move(game_state, rng=random):
+    """A weighted random book move for game_state, or None."""
+    moves = book_moves(game_state)
+    if not moves:
+        return None
+    return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book")
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES)
+    parser.add_argument('--depth', type=int, default=BOOK_DEPTH)
+    parser.add_argument('--margin', type=int, default=BOOK_MARGIN)
+    parser.add_argument('--temperature', type=float, default=BOOK_TEMPERATURE)
+    parser.add_argument('--output', default=BOOK_FILE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    book = build_book(args.plies, args.depth, args.margin, args.temperature)
+    save_book(book, args.output)
+    print(f"{len(book)} positions, {os.path.getsize(args.output)} bytes written to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,52 @@
 """
 Database lookup for pre-computed optimal moves in Chopsticks.
+
+The database is a pickled snapshot plus a journal. merge_rows and the
+helpers built on it fold a new batch of games into the existing
+statistics and append only the records that changed to the journal, so
+self-play or played games can be ingested without a full rebuild. Loading
+replays the journal over the snapshot; once the journal grows past
+JOURNAL_MAX_BYTES it is folded back into the snapshot. A database whose
+scores don't come from outcome counts (a legacy snapshot or the minimal
+database) is rebuilt from RAW_GAMES_FILE before its first merge, so merged
+scores always match a rebuild.
+
+    python -m engine.database_lookup merge new_games.tsv
+    python -m engine.database_lookup merge new_games.cga
 """
 import os
 import csv
+import sys
+import time
+import argparse
 import subprocess
 import pickle
 import logging
-from collections import defaultdict
-from engine.game_state import GameState, GameMove
+from engine.game_state import GameState, intern_move
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Database file paths
 DATABASE_FILE = "chopsticks_database.pkl"
+DATABASE_JOURNAL = "chopsticks_database.journal"
 RAW_GAMES_FILE = "complete_chopsticks_games.tsv"
 
+# Journal size past which a merge rewrites the snapshot
+JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+
+# Snapshot format with the outcome counts; older snapshots are a bare move_database
+SNAPSHOT_FORMAT = 2
+
 # Global database
 move_database = {}
 state_count = 0
 
+# state_key -> [wins for the side to move, games] over the final moves of
+# games; None when the scores weren't computed from counts, which a merge
+# can't extend
+outcome_counts = {}
+
 def load_or_generate_database():
     """
     Load the pre-computed database or generate it if it doesn't exist.
@@ -28,8 +55,8 @@ def load_or_generate_database():
     
     if os.path.exists(DATABASE_FILE):
         logger.info(f"Loading pre-computed database from {DATABASE_FILE}")
-        with open(DATABASE_FILE, 'rb') as f:
-            move_database = pickle.load(f)
+        load_snapshot()
+        replay_journal()
         state_count = len(move_database)
         logger.info(f"Loaded {state_count} positions from database")
     else:
@@ -62,7 +89,7 @@ def process_raw_games():
     """
     Process the raw games file to create the optimized database.
     """
-    global move_database, state_count
+    global move_database, outcome_counts, state_count
     
     if not os.path.exists(RAW_GAMES_FILE):
         logger.error(f"Raw games file not found: {RAW_GAMES_FILE}")
@@ -71,10 +98,9 @@ def process_raw_games():
     
     logger.info(f"Processing raw games from {RAW_GAMES_FILE}")
     
-    # Initialize database with win probabilities
-    win_counts = defaultdict(int)
-    total_counts = defaultdict(int)
+    # Rebuild the statistics from scratch
     move_database = {}
+    outcome_counts = {}
     
     try:
         with open(RAW_GAMES_FILE, 'r', newline='') as f:
@@ -89,68 +115,20 @@ def process_raw_games():
                 # Empty file
                 create_minimal_database()
                 return
-                
+            
+            changed = set()
             for row in reader:
-                # Skip rows with errors
-                if row.get('Error'):
-                    continue
-                
-                # Parse current state
-                state_str = row.get('State')
-                next_state_str = row.get('NextState')
-                move_str = row.get('Move')
-                
-                if not all([state_str, next_state_str, move_str]):
-                    continue
-                
-                # Create GameState object
-                game_state = parse_state_string(state_str)
-                if not game_state:
-                    continue
-                
-                # Create a key for the database
-                state_key = state_to_key(game_state)
-                
-                # Parse the move
-                move = parse_move_string(move_str, game_state)
-                if not move:
-                    continue
-                
-                # Track game outcomes for this state
-                winner = row.get('Winner')
-                if winner:
-                    # This is the final move of a game
-                    # Check if current player won
-                    player_str = f"P{game_state.current_player + 1}"
-                    win_counts[state_key] += 1 if winner == player_str else 0
-                    total_counts[state_key] += 1
-                else:
-                    # For non-terminal moves, track the move made
-                    if state_key not in move_database:
-                        move_database[state_key] = {'moves': [], 'scores': []}
-                    
-                    # Add this move to the database
-                    move_database[state_key]['moves'].append(move)
-                    # For now, just use 0 as placeholder score
-                    move_database[state_key]['scores'].append(0)
-    
+                fold_row(row, changed)
+        
         # Now calculate scores based on win probabilities
         for state_key in move_database:
-            if state_key in total_counts and total_counts[state_key] > 0:
-                win_probability = win_counts[state_key] / total_counts[state_key]
-                # Convert to a score between -100 and 100
-                score = (win_probability * 200) - 100
-                
-                # Update all move scores for this state
-                for i in range(len(move_database[state_key]['scores'])):
-                    move_database[state_key]['scores'][i] = score
+            update_scores(state_key)
         
         state_count = len(move_database)
         logger.info(f"Created database with {state_count} positions")
         
         # Save database to file
-        with open(DATABASE_FILE, 'wb') as f:
-            pickle.dump(move_database, f)
+        save_snapshot()
         logger.info(f"Saved database to {DATABASE_FILE}")
         
     except Exception as e:
@@ -158,11 +136,180 @@ def process_raw_games():
         create_minimal_database()
 
 
+def fold_row(row, changed):
+    """
+    Fold one TSV-style game row (State, Move, Error, Winner) into the
+    statistics and add the keys of the states it changed to changed.
+    """
+    # Skip rows with errors
+    if row.get('Error'):
+        return
+    
+    state_str = row.get('State')
+    next_state_str = row.get('NextState')
+    move_str = row.get('Move')
+    if not all([state_str, next_state_str, move_str]):
+        return
+    
+    game_state = parse_state_string(state_str)
+    if not game_state:
+        return
+    state_key = state_to_key(game_state)
+    
+    move = parse_move_string(move_str, game_state)
+    if not move:
+        return
+    
+    # Track game outcomes for this state
+    winner = row.get('Winner')
+    if winner:
+        # This is the final move of a game
+        # Check if current player won
+        player_str = f"P{game_state.current_player + 1}"
+        counts = outcome_counts.setdefault(state_key, [0, 0])
+        counts[0] += 1 if winner == player_str else 0
+        counts[1] += 1
+    else:
+        # For non-terminal moves, track the move made
+        if state_key not in move_database:
+            move_database[state_key] = {'moves': [], 'scores': []}
+        move_database[state_key]['moves'].append(move)
+        move_database[state_key]['scores'].append(0)
+    changed.add(state_key)
+
+
+def update_scores(state_key):
+    """Set every move score of a state from its win probability, if it has one."""
+    counts = outcome_counts.get(state_key)
+    if state_key not in move_database or not counts or not counts[1]:
+        return
+    # Convert to a score between -100 and 100
+    score = (counts[0] / counts[1] * 200) - 100
+    scores = move_database[state_key]['scores']
+    for i in range(len(scores)):
+        scores[i] = score
+
+
+def merge_rows(rows):
+    """
+    Fold a batch of TSV-style game rows into the database and append the
+    changed records to the journal. A database without outcome counts is
+    rebuilt from RAW_GAMES_FILE first; RuntimeError is raised if there is
+    no such file. Returns the number of states changed.
+    """
+    global state_count
+    
+    if outcome_counts is None:
+        if not os.path.exists(RAW_GAMES_FILE):
+            raise RuntimeError(f"{DATABASE_FILE} has no outcome counts to merge into; "
+                               f"rebuild it from {RAW_GAMES_FILE} first")
+        logger.info("Rebuilding the database from %s before merging", RAW_GAMES_FILE)
+        process_raw_games()
+        if outcome_counts is None:
+            raise RuntimeError(f"Could not rebuild the database from {RAW_GAMES_FILE}")
+    
+    changed = set()
+    for row in rows:
+        fold_row(row, changed)
+    if not changed:
+        return 0
+    
+    for state_key in changed:
+        update_scores(state_key)
+    state_count = len(move_database)
+    
+    moves = {key: move_database[key] for key in changed if key in move_database}
+    outcomes = {key: outcome_counts[key] for key in changed if key in outcome_counts}
+    with open(DATABASE_JOURNAL, 'ab') as f:
+        pickle.dump((moves, outcomes), f)
+    logger.info("Merged %d changed states into the database", len(changed))
+    
+    if os.path.getsize(DATABASE_JOURNAL) > JOURNAL_MAX_BYTES:
+        save_snapshot()
+    return len(changed)
+
+
+def merge_tsv(path):
+    """Merge the games of a generator TSV. Returns the number of states changed."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return merge_rows(csv.DictReader(f, delimiter='\t'))
+
+
+def merge_archive(path):
+    """Merge the games of an engine.archive file. Returns the number of states changed."""
+    # Imported here: the archive module builds on the engine tables
+    from engine.archive import game_rows, read_games
+    return merge_rows(row for number, (start, codes) in enumerate(read_games(path), 1)
+                      for row in game_rows(number, start, codes))
+
+
+def merge_games(games):
+    """
+    Merge played games, each a sequence of GameMoves from the initial
+    position (self-play or real games). Returns the number of states changed.
+    """
+    from engine.archive import encode_game, game_rows
+    return merge_rows(row for number, moves in enumerate(games, 1)
+                      for row in game_rows(number, GameState().pack(), encode_game(moves)))
+
+
+def save_snapshot():
+    """Write the whole database to DATABASE_FILE and drop the journal."""
+    with open(DATABASE_FILE, 'wb') as f:
+        pickle.dump({'format': SNAPSHOT_FORMAT, 'moves': move_database, 'outcomes': outcome_counts}, f)
+    if os.path.exists(DATABASE_JOURNAL):
+        os.remove(DATABASE_JOURNAL)
+
+
+def load_snapshot():
+    """Read DATABASE_FILE, in either snapshot format."""
+    global move_database, outcome_counts
+    with open(DATABASE_FILE, 'rb') as f:
+        snapshot = pickle.load(f)
+    if snapshot.get('format') == SNAPSHOT_FORMAT:
+        move_database = snapshot['moves']
+        outcome_counts = snapshot['outcomes']
+    else:
+        # Only the scores were kept, not the counts they came from
+        move_database = snapshot
+        outcome_counts = None
+        # Moves pickled before interning load as separate objects
+        for entry in move_database.values():
+            entry['moves'] = [intern_move(move.move_type, move.player, move.details) for move in entry['moves']]
+
+
+def replay_journal():
+    """
+    Apply the records merged since the snapshot was written. A batch cut
+    short (the process died while merging) is dropped from the journal.
+    """
+    if not os.path.exists(DATABASE_JOURNAL):
+        return
+    if outcome_counts is None:
+        logger.warning("Ignoring %s: %s has no outcome counts to apply it to", DATABASE_JOURNAL, DATABASE_FILE)
+        return
+    batches = 0
+    with open(DATABASE_JOURNAL, 'r+b') as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            end = f.tell()
+            try:
+                moves, outcomes = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError, ValueError) as e:
+                logger.warning("Dropping the incomplete batch at byte %d of %s: %s", end, DATABASE_JOURNAL, e)
+                f.truncate(end)
+                break
+            move_database.update(moves)
+            outcome_counts.update(outcomes)
+            batches += 1
+    logger.info("Replayed %d merged batches from %s", batches, DATABASE_JOURNAL)
+
+
 def create_minimal_database():
     """
     Create a minimal database with some common positions.
     """
-    global move_database, state_count
+    global move_database, outcome_counts, state_count
     
     logger.info("Creating minimal database with common positions")
     
@@ -174,7 +321,7 @@ def create_minimal_database():
     state_key = state_to_key(initial_state)
     
     # For initial position 1-1|1-1, standard opening is P1L>P2R
-    move = GameMove("tap", 0, (0, 1))
+    move = intern_move("tap", 0, (0, 1))
     move_database[state_key] = {
         'moves': [move],
         'scores': [10]
@@ -183,9 +330,9 @@ def create_minimal_database():
     state_count = len(move_database)
     logger.info(f"Created minimal database with {state_count} positions")
     
-    # Save the minimal database
-    with open(DATABASE_FILE, 'wb') as f:
-        pickle.dump(move_database, f)
+    # Save the minimal database; its score isn't backed by any game
+    outcome_counts = None
+    save_snapshot()
 
 
 def is_in_database(game_state):
@@ -274,7 +421,7 @@ def parse_move_string(move_str, game_state):
             def_player = int(defender[1]) - 1
             def_hand = 0 if defender[2] == "L" else 1
             
-            return GameMove("tap", att_player, (att_hand, def_hand))
+            return intern_move("tap", att_player, (att_hand, def_hand))
         
         # Handle split moves (e.g., "Sp(P2:4|0 → 2|2)")
         elif "Sp" in move_str:
@@ -291,8 +438,32 @@ def parse_move_string(move_str, game_state):
             old_l, old_r = map(int, pre_split.split("|"))
             new_l, new_r = map(int, post_split.split("|"))
             
-            return GameMove("split", player, (old_l, old_r, new_l, new_r))
+            return intern_move("split", player, (old_l, old_r, new_l, new_r))
     except Exception as e:
         logger.error(f"Error parsing move string '{move_str}': {e}")
     
     return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the move database")
+    commands = parser.add_subparsers(dest='command', required=True)
+    merge = commands.add_parser('merge', help="fold new games into the database")
+    merge.add_argument('games', nargs='+', help="generator .tsv files or engine.archive files")
+    commands.add_parser('compact', help="fold the journal back into the snapshot")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    load_or_generate_database()
+    if args.command == 'compact':
+        save_snapshot()
+    else:
+        for path in args.games:
+            changed = merge_tsv(path) if path.endswith('.tsv') else merge_archive(path)
+            print(f"{path}: {changed} states changed", file=sys.stderr)
+    print(f"{state_count} positions in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,54 @@
 """
 Evaluation function for Chopsticks game positions.
+
+The evaluation only depends on the hands and the side to move, so every
+possible position is scored once into a table indexed by the packed position
+and evaluate_position is a lookup. The table is built from the hand-written
+heuristic at import (with the weights file named by EVAL_WEIGHTS if set), or
+loaded from the file named by EVAL_TABLE, and can be replaced at runtime with
+set_eval_table. With EVAL_TABLEBASE set, the positions a tablebase of the
+standard rules decides are scored from the tablebase instead.
 """
+import os
+import sys
+import json
+import logging
+from array import array
+from functools import partial
+from engine.game_state import GameState, NUM_POSITIONS, unpack_position
+from engine.rules import STANDARD_RULES, check_standard_rules
+from engine.tablebase import load_tablebase, tablebase_from_buffer
+from engine.shared_cache import shared_tablebase_buffer
 
-def evaluate_position(game_state):
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Eval table file format: magic, then NUM_POSITIONS signed 16-bit scores
+EVAL_TABLE_MAGIC = b"CEVT"
+
+
+# Terms of the heuristic and their hand-picked weights. A tuned weights file
+# (see engine.tuning) can replace these through EVAL_WEIGHTS.
+DEFAULT_WEIGHTS = {
+    'finger_advantage': 5,         # Each finger advantage is worth 5 points
+    'hand_advantage': 20,          # Each hand advantage is worth 20 points
+    'split_potential': 1,          # Split flexibility, per finger
+    'both_hands_alive': 5,         # Extra split flexibility with both hands alive
+    'player_vulnerability': -10,   # Being down to one hand is bad
+    'opponent_vulnerability': 10,  # Opponent being down to one hand is good
+    'mirror_lock': 5,              # Mirror positions can be advantageous
+    'trap': 8,                     # Per opponent hand we can eliminate
+}
+
+FEATURES = tuple(DEFAULT_WEIGHTS)
+
+
+def position_features(game_state):
     """
-    Evaluate a given game state from the perspective of the current player.
-    Returns a score between -100 (losing) and +100 (winning).
+    Compute the heuristic terms of a non-terminal position from the
+    perspective of the current player.
+    Returns a dict with one value per name in FEATURES.
     """
-    # If terminal state, return extreme value
-    if game_state.is_terminal:
-        winner = game_state.get_winner()
-        if (winner == "P1" and game_state.current_player == 0) or (winner == "P2" and game_state.current_player == 1):
-            return 100  # Current player wins
-        else:
-            return -100  # Current player loses
-    
     # Get hands for the current player and opponent
     if game_state.current_player == 0:
         player_hands = game_state.p1_hands
@@ -36,51 +70,210 @@ def evaluate_position(game_state):
     hand_advantage = player_alive_hands - opponent_alive_hands
     
     # Evaluate the potential for splitting (flexibility)
-    player_split_potential = 0
+    split_potential = 0
+    both_hands_alive = 0
     if player_total_fingers >= 2 and player_alive_hands > 0:
         # Each additional finger increases split options
-        player_split_potential = player_total_fingers
+        split_potential = player_total_fingers
         
         # Bonus for having both hands alive
         if player_alive_hands == 2:
-            player_split_potential += 5
-    
-    # Evaluate vulnerability (dead hand state)
-    player_vulnerability = 0
-    opponent_vulnerability = 0
+            both_hands_alive = 1
     
     # If one hand is dead, that's a vulnerable position
-    if player_alive_hands == 1:
-        player_vulnerability = 10
-    
-    if opponent_alive_hands == 1:
-        opponent_vulnerability = 10
-    
-    # Additional bonus for specific patterns and traps
-    trap_potential = 0
+    player_vulnerability = 1 if player_alive_hands == 1 else 0
+    opponent_vulnerability = 1 if opponent_alive_hands == 1 else 0
     
     # Look for mirror lock (can't split effectively)
-    if player_hands == opponent_hands and player_hands[0] == player_hands[1]:
-        trap_potential += 5  # Mirror positions can be advantageous
+    mirror_lock = 1 if player_hands == opponent_hands and player_hands[0] == player_hands[1] else 0
     
     # Check for mod-5 trap potential (if any hand is close to dying)
+    traps = 0
     for i in range(2):
         for j in range(2):
             if opponent_hands[j] > 0:  # Only consider alive opponent hands
                 remaining_to_zero = (5 - opponent_hands[j]) % 5
                 if remaining_to_zero > 0 and player_hands[i] == remaining_to_zero:
-                    trap_potential += 8  # Can eliminate an opponent hand
+                    traps += 1  # Can eliminate an opponent hand
+    
+    return {
+        'finger_advantage': finger_advantage,
+        'hand_advantage': hand_advantage,
+        'split_potential': split_potential,
+        'both_hands_alive': both_hands_alive,
+        'player_vulnerability': player_vulnerability,
+        'opponent_vulnerability': opponent_vulnerability,
+        'mirror_lock': mirror_lock,
+        'trap': traps,
+    }
+
+
+def heuristic_evaluate(game_state, weights=None):
+    """
+    Evaluate a given game state from the perspective of the current player
+    with the hand-written heuristic, using DEFAULT_WEIGHTS unless other
+    weights are given.
+    Returns a score between -100 (losing) and +100 (winning).
+    """
+    # If terminal state, return extreme value
+    if game_state.is_terminal:
+        winner = game_state.get_winner()
+        if (winner == "P1" and game_state.current_player == 0) or (winner == "P2" and game_state.current_player == 1):
+            return 100  # Current player wins
+        else:
+            return -100  # Current player loses
+    
+    if weights is None:
+        weights = DEFAULT_WEIGHTS
     
     # Calculate final score
-    score = 0
-    score += finger_advantage * 5     # Each finger advantage is worth 5 points
-    score += hand_advantage * 20      # Each hand advantage is worth 20 points
-    score += player_split_potential   # Split potential adds flexibility
-    score -= player_vulnerability     # Being vulnerable is bad
-    score += opponent_vulnerability   # Opponent being vulnerable is good
-    score += trap_potential           # Traps are valuable
+    features = position_features(game_state)
+    score = sum(weights[name] * features[name] for name in FEATURES)
     
     # Normalize the score to the range -100 to 100
     score = max(min(score, 100), -100)
     
-    return score
+    return round(score)
+
+
+def build_eval_table(score_fn=heuristic_evaluate):
+    """
+    Score every packed position with score_fn.
+    Returns an array of NUM_POSITIONS scores indexed by pack_position.
+    """
+    table = array('h')
+    for index in range(NUM_POSITIONS):
+        p1_hands, p2_hands, current_player = unpack_position(index)
+        table.append(score_fn(GameState(p1_hands, p2_hands, current_player)))
+    return table
+
+
+def save_eval_table(table, path):
+    """Write an eval table to a file."""
+    with open(path, 'wb') as f:
+        f.write(EVAL_TABLE_MAGIC)
+        array('h', table).tofile(f)
+
+
+def load_eval_table(path):
+    """Read an eval table written by save_eval_table."""
+    with open(path, 'rb') as f:
+        if f.read(len(EVAL_TABLE_MAGIC)) != EVAL_TABLE_MAGIC:
+            raise ValueError(f"{path} is not an eval table file")
+        table = array('h')
+        table.fromfile(f, NUM_POSITIONS)
+    return table
+
+
+def load_weights(path):
+    """
+    Read a weights file written by save_weights.
+    Returns a complete weights dict; terms missing from the file keep their default.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    unknown = set(data['weights']) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown weights in {path}: {', '.join(sorted(unknown))}")
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(data['weights'])
+    return weights
+
+
+def save_weights(weights, path, version, **metadata):
+    """Write a versioned weights file."""
+    data = {'version': version, 'weights': {name: weights[name] for name in FEATURES}}
+    data.update(metadata)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def build_weighted_table(weights):
+    """Build an eval table from the heuristic with the given weights."""
+    return build_eval_table(partial(heuristic_evaluate, weights=weights))
+
+
+def set_eval_table(table):
+    """Make evaluate_position use the given table."""
+    global eval_table
+    if len(table) != NUM_POSITIONS:
+        raise ValueError(f"Eval table has {len(table)} entries, expected {NUM_POSITIONS}")
+    eval_table = table
+
+
+def get_eval_table():
+    """Returns the table evaluate_position currently reads."""
+    return eval_table
+
+
+def apply_tablebase(table, tablebase):
+    """
+    Copy of an eval table with every position the tablebase decides scored
+    from the tablebase; drawn positions keep their heuristic score.
+    """
+    if tablebase.rules != STANDARD_RULES:
+        raise ValueError(f"Tablebase is for {tablebase.rules}, not the standard rules")
+    scored = array('h', table)
+    for index in range(NUM_POSITIONS):
+        score = tablebase.score(index)
+        if score is not None:
+            scored[index] = score
+    return scored
+
+
+def check_eval_table(table, score_fn=heuristic_evaluate):
+    """
+    Compare a table against score_fn on every position.
+    Returns a list of (index, table_score, expected_score) mismatches.
+    """
+    expected = build_eval_table(score_fn)
+    return [(index, table[index], expected[index])
+            for index in range(NUM_POSITIONS) if table[index] != expected[index]]
+
+
+def evaluate_position(game_state):
+    """
+    Evaluate a given game state from the perspective of the current player.
+    Returns a score between -100 (losing) and +100 (winning). The table
+    scores the standard game only; other variants raise ValueError.
+    """
+    check_standard_rules(game_state.rules)
+    return eval_table[game_state.pack()]
+
+
+# The table evaluate_position reads
+eval_table = build_eval_table()
+
+EVAL_WEIGHTS_FILE = os.environ.get("EVAL_WEIGHTS")
+if EVAL_WEIGHTS_FILE:
+    set_eval_table(build_weighted_table(load_weights(EVAL_WEIGHTS_FILE)))
+    logger.info("Built eval table from weights in %s", EVAL_WEIGHTS_FILE)
+
+EVAL_TABLE_FILE = os.environ.get("EVAL_TABLE")
+if EVAL_TABLE_FILE:
+    set_eval_table(load_eval_table(EVAL_TABLE_FILE))
+    logger.info("Loaded eval table from %s", EVAL_TABLE_FILE)
+
+EVAL_TABLEBASE_FILE = os.environ.get("EVAL_TABLEBASE")
+if EVAL_TABLEBASE_FILE:
+    # Read from the server's shared segment when the master has loaded it
+    _shared_tablebase = shared_tablebase_buffer()
+    if _shared_tablebase is not None:
+        set_eval_table(apply_tablebase(eval_table, tablebase_from_buffer(_shared_tablebase, EVAL_TABLEBASE_FILE)))
+    else:
+        set_eval_table(apply_tablebase(eval_table, load_tablebase(EVAL_TABLEBASE_FILE)))
+    logger.info("Scored decided positions from the tablebase in %s", EVAL_TABLEBASE_FILE)
+
+
+if __name__ == '__main__':
+    # python -m engine.evaluator [--write PATH]
+    # Checks the active table against the heuristic and optionally saves it.
+    if len(sys.argv) == 3 and sys.argv[1] == '--write':
+        save_eval_table(eval_table, sys.argv[2])
+        print(f"Wrote eval table to {sys.argv[2]}")
+    mismatches = check_eval_table(eval_table)
+    for index, got, expected in mismatches:
+        p1_hands, p2_hands, current_player = unpack_position(index)
+        print(f"{p1_hands} {p2_hands} P{current_player + 1}: table {got}, heuristic {expected}")
+    print(f"{NUM_POSITIONS - len(mismatches)}/{NUM_POSITIONS} positions match the heuristic")
+    sys.exit(1 if mismatches else 0)
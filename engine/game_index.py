@@ -0,0 +1,235 @@
+"""
+Position index over a game archive.
+
+For every packed position the index lists the games that pass through it
+and the ply at which they do, so "games through X" questions are answered
+from the index and only the archive blocks holding the matching games are
+decompressed. It also keeps each game's winner and length so queries can
+filter on them without touching the archive.
+
+Index file format: magic, version, the size of the archive it was built
+from (u64), block and game counts (u32), then as arrays: the file offset
+(u64) and first game number (u32) of every block, the winner (i8: 0 none,
+1 P1, 2 P2) and length in plies (u16) of every game, and the postings as
+CSR: NUM_POSITIONS + 1 start offsets (u32) into parallel arrays of game
+numbers (u32) and plies (u16). Games are numbered from 0 in archive order.
+
+    python -m engine.game_index build games.cga
+    python -m engine.game_index query games.cga "2-3 | 1-2" --player 1 --winner P1 --within 6
+"""
+import os
+import sys
+import time
+import struct
+import logging
+import argparse
+from array import array
+from bisect import bisect_right
+from engine.archive import decode_game, game_rows, read_block, read_blocks
+from engine.game_state import NUM_POSITIONS
+from engine.tables import TERMINAL, WINNER
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"CGIX"
+INDEX_VERSION = 1
+
+WINNERS = (None, "P1", "P2")
+
+_HEADER = struct.Struct("<4sBQII")
+
+
+def index_path(archive_path):
+    """Default index file of an archive."""
+    return archive_path + ".idx"
+
+
+class GameIndex:
+    """Games through every position of one archive."""
+
+    def __init__(self, archive_size, block_offsets, block_first_games, winners, lengths,
+                 starts, posting_games, posting_plies):
+        self.archive_size = archive_size
+        self.block_offsets = block_offsets  # array('Q')
+        self.block_first_games = block_first_games  # array('I')
+        self.winners = winners  # array('b'): index into WINNERS
+        self.lengths = lengths  # array('H')
+        self.starts = starts  # array('I'): postings of packed are [starts[packed], starts[packed + 1])
+        self.posting_games = posting_games  # array('I')
+        self.posting_plies = posting_plies  # array('H')
+
+    def __len__(self):
+        return len(self.winners)
+
+    def check(self, archive_path):
+        """Raise ValueError if the archive has changed since the index was built."""
+        if os.path.getsize(archive_path) != self.archive_size:
+            raise ValueError(f"The index is out of date for {archive_path}; rebuild it")
+
+    def games_through(self, packed, winner=None, within=None):
+        """
+        (game number, ply) for every game through packed, optionally only
+        games won by winner ("P1" or "P2") and reaching packed by ply within.
+        """
+        first, last = self.starts[packed], self.starts[packed + 1]
+        games = self.posting_games[first:last]
+        plies = self.posting_plies[first:last]
+        winner_code = WINNERS.index(winner) if winner else None
+        return [(game, ply) for game, ply in zip(games, plies)
+                if (within is None or ply <= within)
+                and (winner_code is None or self.winners[game] == winner_code)]
+
+    def block_of(self, game):
+        """Block number of a game."""
+        return bisect_right(self.block_first_games, game) - 1
+
+    def load_games(self, archive_path, games):
+        """
+        {game number: (start, codes)} for the given games, decompressing
+        only the blocks that hold them.
+        """
+        by_block = {}
+        for game in games:
+            by_block.setdefault(self.block_of(game), []).append(game)
+        loaded = {}
+        for block, block_games in sorted(by_block.items()):
+            entries = read_block(archive_path, self.block_offsets[block])
+            first = self.block_first_games[block]
+            for game in block_games:
+                loaded[game] = entries[game - first]
+        return loaded
+
+
+def build_index(archive_path):
+    """
+    Scan an archive and index every position of every game. The archive is
+    read twice: once to count the postings of every position, then to fill
+    the posting arrays in place, so nothing per posting is kept as a Python
+    object.
+    """
+    block_offsets = array('Q')
+    block_first_games = array('I')
+    winners = array('b')
+    lengths = array('H')
+    counts = [0] * NUM_POSITIONS
+
+    game = 0
+    for offset, entries in read_blocks(archive_path):
+        block_offsets.append(offset)
+        block_first_games.append(game)
+        for start, codes in entries:
+            counts[start] += 1
+            packed = start
+            for _, _, packed in decode_game(start, codes):
+                counts[packed] += 1
+            winners.append(WINNERS.index(WINNER[packed]) if TERMINAL[packed] else 0)
+            lengths.append(len(codes))
+            game += 1
+
+    starts = array('I', [0])
+    for count in counts:
+        starts.append(starts[-1] + count)
+    posting_games = array('I', bytes(4 * starts[-1]))
+    posting_plies = array('H', bytes(2 * starts[-1]))
+    # Next free posting of every position
+    fill = array('I', starts[:-1])
+
+    game = 0
+    for _, entries in read_blocks(archive_path):
+        for start, codes in entries:
+            posting = fill[start]
+            posting_games[posting] = game
+            fill[start] = posting + 1
+            for ply, (_, _, packed) in enumerate(decode_game(start, codes), 1):
+                posting = fill[packed]
+                posting_games[posting] = game
+                posting_plies[posting] = ply
+                fill[packed] = posting + 1
+            game += 1
+
+    logger.debug("Indexed %d games in %d blocks, %d postings", game, len(block_offsets), len(posting_games))
+    return GameIndex(os.path.getsize(archive_path), block_offsets, block_first_games, winners, lengths,
+                     starts, posting_games, posting_plies)
+
+
+def save_index(game_index, path):
+    """Write an index to a file."""
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, game_index.archive_size,
+                             len(game_index.block_offsets), len(game_index)))
+        for values in (game_index.block_offsets, game_index.block_first_games, game_index.winners,
+                       game_index.lengths, game_index.starts, game_index.posting_games,
+                       game_index.posting_plies):
+            values.tofile(f)
+
+
+def load_index(path):
+    """Read an index written by save_index."""
+    with open(path, 'rb') as f:
+        magic, version, archive_size, blocks, games = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a game index (version {INDEX_VERSION})")
+
+        def read(typecode, count):
+            values = array(typecode)
+            values.fromfile(f, count)
+            return values
+
+        block_offsets, block_first_games = read('Q', blocks), read('I', blocks)
+        winners, lengths = read('b', games), read('H', games)
+        starts = read('I', NUM_POSITIONS + 1)
+        posting_games, posting_plies = read('I', starts[-1]), read('H', starts[-1])
+    return GameIndex(archive_size, block_offsets, block_first_games, winners, lengths,
+                     starts, posting_games, posting_plies)
+
+
+def main():
+    # Imported here: only the CLI parses positions
+    from engine.perft import parse_position
+
+    parser = argparse.ArgumentParser(description="Build or query the position index of a game archive")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="index an archive")
+    build.add_argument('archive')
+    build.add_argument('--output', help="index file (default: the archive path + .idx)")
+    query = commands.add_parser('query', help="list the games through a position")
+    query.add_argument('archive')
+    query.add_argument('state', help='position as "P1L-P1R | P2L-P2R"')
+    query.add_argument('--player', type=int, choices=(1, 2), help="side to move (default: either)")
+    query.add_argument('--winner', choices=("P1", "P2"))
+    query.add_argument('--within', type=int, help="only games reaching the position by this ply")
+    query.add_argument('--show', type=int, default=10, help="print the moves of this many games")
+    query.add_argument('--index', help="index file (default: the archive path + .idx)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'build':
+        output = args.output or index_path(args.archive)
+        game_index = build_index(args.archive)
+        save_index(game_index, output)
+        print(f"{len(game_index)} games, {len(game_index.posting_games)} postings indexed to {output} "
+              f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        return
+
+    game_index = load_index(args.index or index_path(args.archive))
+    game_index.check(args.archive)
+    loaded = time.perf_counter()
+    players = (args.player - 1,) if args.player else (0, 1)
+    matches = []
+    for player in players:
+        packed = parse_position(args.state, player).pack()
+        matches.extend(game_index.games_through(packed, args.winner, args.within))
+    matches.sort()
+    queried = time.perf_counter()
+
+    games = game_index.load_games(args.archive, [game for game, _ in matches[:args.show]])
+    for game, ply in matches[:args.show]:
+        moves = " ".join(row['Move'] for row in game_rows(game + 1, *games[game]))
+        print(f"G{game + 1:04d} (at ply {ply}): {moves}")
+    print(f"{len(matches)} games; index loaded in {(loaded - start) * 1000:.1f}ms, "
+          f"queried in {(queried - loaded) * 1000:.2f}ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,28 +2,51 @@
 Game state representation for Chopsticks.
 """
 import logging
+from engine.rules import STANDARD_RULES
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Positions are packed into a single integer index: the four hands in base 5
+# followed by the side to move, giving 5^4 * 2 = 1250 possible indices.
+NUM_POSITIONS = 1250
+
+
+def pack_position(p1_hands, p2_hands, current_player):
+    """Packs a position into an index in range(NUM_POSITIONS)."""
+    return (((p1_hands[0] * 5 + p1_hands[1]) * 5 + p2_hands[0]) * 5 + p2_hands[1]) * 2 + current_player
+
+
+def unpack_position(index):
+    """Inverse of pack_position. Returns (p1_hands, p2_hands, current_player)."""
+    index, current_player = divmod(index, 2)
+    index, p2_r = divmod(index, 5)
+    index, p2_l = divmod(index, 5)
+    p1_l, p1_r = divmod(index, 5)
+    return (p1_l, p1_r), (p2_l, p2_r), current_player
+
+
 class GameState:
-    """Represents a single state in the Chopsticks game."""
-    def __init__(self, p1_hands=(1, 1), p2_hands=(1, 1), current_player=0, visited_states=None):
-        self.p1_hands = tuple(p1_hands)  # [Left, Right]
-        self.p2_hands = tuple(p2_hands)  # [Left, Right]
+    """
+    Represents a single state in the Chopsticks game, played by a Rules
+    object (the standard rules unless another variant is given).
+    """
+    __slots__ = ('p1_hands', 'p2_hands', 'current_player', 'visited_states', 'is_terminal', 'winner', 'rules')
+
+    def __init__(self, p1_hands=None, p2_hands=None, current_player=0, visited_states=None,
+                 rules=STANDARD_RULES):
+        self.rules = rules
+        self.p1_hands = tuple(p1_hands) if p1_hands is not None else (1,) * rules.hands  # [Left, Right]
+        self.p2_hands = tuple(p2_hands) if p2_hands is not None else (1,) * rules.hands  # [Left, Right]
         self.current_player = current_player  # 0 for P1, 1 for P2
         self.visited_states = visited_states or {self.get_state_tuple()}
-        self.is_terminal = self.p1_hands == (0, 0) or self.p2_hands == (0, 0)
         self.winner = self._calculate_winner()
-        
+        self.is_terminal = self.winner is not None
+
     def _calculate_winner(self):
         """Determines the winner if the state is terminal."""
-        if self.p1_hands == (0, 0):
-            return "P2"
-        elif self.p2_hands == (0, 0):
-            return "P1"
-        return None
-        
+        return self.rules.hands_winner(self.p1_hands, self.p2_hands)
+
     def __eq__(self, other):
         return (self.p1_hands == other.p1_hands and 
                 self.p2_hands == other.p2_hands and 
@@ -31,10 +54,19 @@ class GameState:
                 
     def __hash__(self):
         return hash((self.p1_hands, self.p2_hands, self.current_player))
+
+    def __str__(self):
+        return self.get_state_str()
         
     def get_state_tuple(self):
         """Returns a tuple representing the full game state."""
         return (self.p1_hands, self.p2_hands)
+
+    def pack(self):
+        """Returns the packed position index (hands and side to move)."""
+        if self.rules is STANDARD_RULES:
+            return pack_position(self.p1_hands, self.p2_hands, self.current_player)
+        return self.rules.pack(self.p1_hands, self.p2_hands, self.current_player)
         
     def get_winner(self):
         """Returns the winner if the state is terminal, None otherwise."""
@@ -42,7 +74,7 @@ class GameState:
         
     def get_state_str(self):
         """Returns the string representation of the state."""
-        return f"= {self.p1_hands[0]}-{self.p1_hands[1]} | {self.p2_hands[0]}-{self.p2_hands[1]}"
+        return f"= {'-'.join(map(str, self.p1_hands))} | {'-'.join(map(str, self.p2_hands))}"
         
     def clone(self):
         """Creates a deep copy of the current state."""
@@ -50,24 +82,22 @@ class GameState:
             self.p1_hands, 
             self.p2_hands, 
             self.current_player,
-            self.visited_states.copy()
+            self.visited_states.copy(),
+            self.rules
         )
         
     def apply_move(self, move, validate=True):
         """
-        Applies the given move to the current state.
+        Applies the given move to the current state by the state's rules.
         Returns (success, error_code).
         """
         if move is None:
             return False, "ERR_NO_MOVE"
         
-        print(f"Applying move: {move.get_notation()} to state: {self.get_state_str()}")
-            
-        next_state = self.clone()
-        
-        # Switch to the next player by default (may be reverted if move is invalid)
-        next_state.current_player = 1 - self.current_player
-        
+        logger.debug("Applying move: %s to state: %s", move, self)
+
+        rules = self.rules
+        p1_hands, p2_hands = self.p1_hands, self.p2_hands
         error_code = ""
         
         if move.move_type == "tap":
@@ -80,41 +110,25 @@ class GameState:
             else:  # P2 -> P1
                 player_hands = self.p2_hands
                 opponent_hands = self.p1_hands
-            
-            # Validate the tap
-            if validate:
-                if player_hands[att_hand] == 0:
-                    error_code = "ERR_OVERFLOW"
-                elif opponent_hands[def_hand] == 0:
-                    error_code = "ERR_OVERFLOW"
-            
-            # Apply the tap if valid
-            if not error_code:
-                fingers_to_add = player_hands[att_hand]
-                new_defender_fingers = (opponent_hands[def_hand] + fingers_to_add) % 5
-                
-                # Update the hands in the next state
-                if move.player == 0:  # P1 -> P2
-                    next_state.p2_hands = tuple(
-                        new_defender_fingers if i == def_hand else opponent_hands[i]
-                        for i in range(2)
-                    )
-                else:  # P2 -> P1
-                    next_state.p1_hands = tuple(
-                        new_defender_fingers if i == def_hand else opponent_hands[i]
-                        for i in range(2)
-                    )
+
+            # Both hands must be alive
+            new_hands = rules.tap(player_hands, opponent_hands, att_hand, def_hand)
+            if new_hands is None:
+                error_code = "ERR_OVERFLOW"
+            elif move.player == 0:
+                p2_hands = new_hands
+            else:
+                p1_hands = new_hands
         
         elif move.move_type == "split":
             # Handle both old format (flat list) and new format (nested arrays)
             if isinstance(move.details[0], list):
-                # New format: [[old_left, old_right], [new_left, new_right]]
+                # New format: [[old hands], [new hands]]
                 old_hands, new_hands = move.details
-                old_l, old_r = old_hands
-                new_l, new_r = new_hands
             else:
-                # Old format: [old_left, old_right, new_left, new_right]
-                old_l, old_r, new_l, new_r = move.details
+                # Old format: [old hands..., new hands...]
+                old_hands, new_hands = move.details[:rules.hands], move.details[rules.hands:]
+            old_hands, new_hands = tuple(old_hands), tuple(new_hands)
             
             # Determine player hands based on move.player
             if move.player == 0:  # P1
@@ -124,56 +138,37 @@ class GameState:
             
             # Validate the split
             if validate:
-                # Check if the split conserves fingers
-                if old_l != player_hands[0] or old_r != player_hands[1]:
-                    error_code = "ERR_INVALID_SPLIT"
-                elif sum(player_hands) < 2:
-                    error_code = "ERR_INVALID_SPLIT"
-                elif sum(player_hands) != new_l + new_r:
-                    error_code = "ERR_INVALID_SPLIT"
-                elif not (0 <= new_l <= 4 and 0 <= new_r <= 4):
-                    error_code = "ERR_INVALID_SPLIT"
-                # Check for reversal (X|Y → Y|X where X != Y)
-                elif new_l == player_hands[1] and new_r == player_hands[0] and player_hands[0] != player_hands[1]:
-                    error_code = "ERR_REVERSAL"
-                # Check for invalid 1|0 or 0|1 split
-                elif player_hands == (1, 0) or player_hands == (0, 1):
-                    error_code = "ERR_INVALID_SPLIT"
-                # Check for no change
-                elif (new_l, new_r) == player_hands:
+                if old_hands != player_hands:
                     error_code = "ERR_INVALID_SPLIT"
+                else:
+                    error_code = rules.split_error(player_hands, new_hands)
             
             # Apply the split if valid
             if not error_code:
-                # Update the hands in the next state
-                if move.player == 0:  # P1
-                    next_state.p1_hands = (new_l, new_r)
-                else:  # P2
-                    next_state.p2_hands = (new_l, new_r)
+                if move.player == 0:
+                    p1_hands = new_hands
+                else:
+                    p2_hands = new_hands
         
         # Check for state repetition
-        new_state_tuple = next_state.get_state_tuple()
+        new_state_tuple = (p1_hands, p2_hands)
         if not error_code and new_state_tuple in self.visited_states:
             error_code = "ERR_REPEAT"
         
         # If move is valid, update visited_states and check for terminal state
         if not error_code:
-            next_state.visited_states.add(new_state_tuple)
-            next_state.is_terminal = next_state.p1_hands == (0, 0) or next_state.p2_hands == (0, 0)
-            next_state.winner = next_state._calculate_winner()
-            
-            # Copy the updated state to self
-            self.p1_hands = next_state.p1_hands
-            self.p2_hands = next_state.p2_hands
-            self.current_player = next_state.current_player
-            self.visited_states = next_state.visited_states
-            self.is_terminal = next_state.is_terminal
-            self.winner = next_state.winner
+            self.visited_states = self.visited_states | {new_state_tuple}
+            self.p1_hands = p1_hands
+            self.p2_hands = p2_hands
+            # Switch to the next player
+            self.current_player = 1 - self.current_player
+            self.winner = self._calculate_winner()
+            self.is_terminal = self.winner is not None
             
             return True, ""
         else:
             # For invalid moves, keep the current state
-            logger.warning(f"Invalid move: {error_code}, {move.get_notation()}")
+            logger.debug("Invalid move: %s, %s", error_code, move)
             return False, error_code
     
     def serialize(self):
@@ -183,69 +178,148 @@ class GameState:
             'p2_hands': list(self.p2_hands),
             'current_player': self.current_player,
             'is_terminal': self.is_terminal,
-            'winner': self.winner
+            'winner': self.winner,
+            # Visited positions as hand indices (packed positions without the side to move)
+            'visited': sorted(self.rules.pack(p1_hands, p2_hands, 0) >> 1
+                              for p1_hands, p2_hands in self.visited_states)
         }
     
     @classmethod
-    def deserialize(cls, data):
-        """Create a GameState object from serialized data."""
+    def deserialize(cls, data, rules=STANDARD_RULES):
+        """Create a GameState object of a game played by rules from serialized data."""
         state = cls(
             p1_hands=tuple(data['p1_hands']),
             p2_hands=tuple(data['p2_hands']),
-            current_player=data['current_player']
+            current_player=data['current_player'],
+            rules=rules
         )
         state.is_terminal = data['is_terminal']
         state.winner = data['winner']
+        if data.get('visited'):
+            for hand_index in data['visited']:
+                p1_hands, p2_hands, _ = rules.unpack(hand_index << 1)
+                state.visited_states.add((p1_hands, p2_hands))
         return state
 
 
+def _hand_label(hand):
+    # L and R for the two hands of the standard game, H3, H4... past them
+    return "LR"[hand] if hand < 2 else f"H{hand + 1}"
+
+
 class GameMove:
-    """Represents a move in the Chopsticks game."""
+    """
+    Represents a move in the Chopsticks game.
+
+    Moves produced by the move generators are interned (see intern_move), so
+    every occurrence of a move is the same object and its notation and
+    serialized form are built once. Treat moves as immutable.
+    """
+    __slots__ = ('move_type', 'player', 'details', '_notation', '_serialized')
+
     def __init__(self, move_type, player, details):
         self.move_type = move_type  # "tap" or "split"
         self.player = player  # 0 for P1, 1 for P2
-        self.details = details  # For tap: (att_hand, def_hand), For split: (old_l, old_r, new_l, new_r)
+        self.details = details  # For tap: (att_hand, def_hand), For split: (old hands..., new hands...)
+        self._notation = None
+        self._serialized = None
+
+    def __str__(self):
+        return self.get_notation()
+
+    def __reduce__(self):
+        # Interned moves come back as the interned instance; any other move
+        # (a variant's, or one built from client input) as a plain copy, so
+        # unpickling never adds to the registry
+        if _MOVE_REGISTRY.get(_move_key(self.move_type, self.player, self.details)) is self:
+            return intern_move, (self.move_type, self.player, self.details)
+        return GameMove, (self.move_type, self.player, self.details)
+
+    def __setstate__(self, state):
+        # Moves pickled before __slots__ carry their attributes as a dict
+        for name, value in (state[1] if isinstance(state, tuple) else state).items():
+            setattr(self, name, value)
+        self._notation = None
+        self._serialized = None
         
     def get_notation(self):
         """Returns the string notation for this move."""
+        if self._notation is None:
+            self._notation = self._build_notation()
+        return self._notation
+
+    def _build_notation(self):
         if self.move_type == "tap":
             att_hand, def_hand = self.details
-            hand_chars = {0: "L", 1: "R"}
             att_player = self.player + 1  # 0->1, 1->2
             def_player = 3 - att_player   # 1->2, 2->1
             
-            return f"P{att_player}{hand_chars[att_hand]}>P{def_player}{hand_chars[def_hand]}"
+            return f"P{att_player}{_hand_label(att_hand)}>P{def_player}{_hand_label(def_hand)}"
             
         elif self.move_type == "split":
             player_num = self.player + 1  # 0->1, 1->2
             
             # Handle both old format (flat list) and new format (nested arrays)
-            if isinstance(self.details[0], list):
-                # New format: [[old_left, old_right], [new_left, new_right]]
+            if isinstance(self.details[0], (list, tuple)):
+                # New format: [[old hands], [new hands]]
                 old_hands, new_hands = self.details
-                old_l, old_r = old_hands
-                new_l, new_r = new_hands
             else:
-                # Old format: [old_left, old_right, new_left, new_right]
-                old_l, old_r, new_l, new_r = self.details
+                # Old format: [old hands..., new hands...]
+                hands = len(self.details) // 2
+                old_hands, new_hands = self.details[:hands], self.details[hands:]
                 
-            return f"Sp(P{player_num}:{old_l}|{old_r} → {new_l}|{new_r})"
+            return f"Sp(P{player_num}:{'|'.join(map(str, old_hands))} → {'|'.join(map(str, new_hands))})"
             
         return "NO_MOVE"
     
     def serialize(self):
-        """Convert the move to a JSON-serializable dictionary."""
-        return {
-            'move_type': self.move_type,
-            'player': self.player,
-            'details': self.details
-        }
+        """Convert the move to a JSON-serializable dictionary (shared, don't modify it)."""
+        if self._serialized is None:
+            self._serialized = {
+                'move_type': self.move_type,
+                'player': self.player,
+                'details': self.details
+            }
+        return self._serialized
     
     @classmethod
     def deserialize(cls, data):
-        """Create a GameMove object from serialized data."""
-        return cls(
-            move_type=data['move_type'],
-            player=data['player'],
-            details=data['details']
-        )
+        """Create a GameMove object from serialized data (the interned move if it is a known one)."""
+        return find_move(data['move_type'], data['player'], data['details'])
+
+
+# (move_type, player, details) -> the shared GameMove
+_MOVE_REGISTRY = {}
+
+
+def _move_key(move_type, player, details):
+    # Split details also come nested as [[old_l, old_r], [new_l, new_r]]
+    if details and isinstance(details[0], (list, tuple)):
+        details = tuple(fingers for hands in details for fingers in hands)
+    return move_type, player, tuple(details)
+
+
+def intern_move(move_type, player, details):
+    """
+    The shared GameMove for a move, created and registered on first use.
+    For moves from the move generators; use find_move for untrusted input.
+    """
+    move = _MOVE_REGISTRY.get((move_type, player, details))
+    if move is None:
+        key = _move_key(move_type, player, details)
+        move = _MOVE_REGISTRY.get(key)
+        if move is None:
+            move = _MOVE_REGISTRY[key] = GameMove(*key)
+    return move
+
+
+def find_move(move_type, player, details):
+    """
+    The shared GameMove if the move has been interned, otherwise a new
+    GameMove that is not registered (so bad input can't grow the registry).
+    """
+    try:
+        move = _MOVE_REGISTRY.get(_move_key(move_type, player, details))
+    except TypeError:
+        move = None
+    return move if move is not None else GameMove(move_type, player, details)
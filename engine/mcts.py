@@ -0,0 +1,194 @@
+"""
+Monte Carlo Tree Search for the Chopsticks game.
+
+UCT search with uniformly random playouts that run entirely on the packed
+move tables (engine.tables), with the visited positions of the game kept as
+a bitmask so the no-repeat rule applies inside the tree and the playouts.
+The search is anytime: it runs until its time budget (or iteration count)
+is used up and then plays the most visited move. Trees are kept per game,
+so the subtree under the position reached two plies later is reused by the
+next search of the same game. A game keeps its last few trees, so pondering
+the opponent's replies one after the other (see engine.ponder) doesn't
+throw away the tree the other replies are found in.
+"""
+import math
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from engine import tables
+from engine.tables import CHILD_START, CHILDREN, TERMINAL, TERMINAL_FLAGS, WINNER, hand_bit, visited_mask
+from engine.search import SearchCancelled
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# UCT exploration constant
+EXPLORATION = 1.4
+
+# Playouts longer than this are scored as draws
+MAX_PLAYOUT_PLIES = 200
+
+# Number of games whose trees are kept for reuse
+MAX_TREES = 256
+
+# Trees kept per game: its last searches and the replies pondered since
+TREES_PER_GAME = 16
+
+# Search trees of recent games: game_id -> root nodes, most recent last
+_trees = OrderedDict()
+# A game's trees are searched by one thread at a time (a request and the
+# ponder it cancelled may overlap for a few iterations): game_id -> lock
+_game_locks = {}
+_lock = threading.Lock()
+
+
+class Node:
+    """A position in the search tree, with its game history as a bitmask."""
+    __slots__ = ('packed', 'mask', 'parent', 'move', 'children', 'untried', 'visits', 'reward')
+
+    def __init__(self, packed, mask, parent=None, move=None):
+        self.packed = packed
+        self.mask = mask
+        self.parent = parent
+        self.move = move
+        self.children = []
+        self.untried = None if TERMINAL[packed] else tables.legal_moves(packed, mask)
+        self.visits = 0
+        # Total reward for the player who made the move into this node
+        self.reward = 0.0
+
+    def expand(self):
+        """Add a child for one untried move and return it."""
+        move, child_packed = self.untried.pop(random.randrange(len(self.untried)))
+        child = Node(child_packed, self.mask | hand_bit(child_packed), self, move)
+        self.children.append(child)
+        return child
+
+    def select_child(self):
+        """Pick the child with the highest UCT score."""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.reward / child.visits
+                   + EXPLORATION * math.sqrt(log_visits / child.visits))
+
+
+def playout(packed, mask):
+    """
+    Play random legal moves until the game ends.
+    Returns 1.0 if P1 wins, 0.0 if P2 wins and 0.5 for a draw (no legal move
+    left or the playout got too long).
+    """
+    for _ in range(MAX_PLAYOUT_PLIES):
+        if TERMINAL_FLAGS[packed]:
+            return 1.0 if WINNER[packed] == "P1" else 0.0
+        children = [child for child in CHILDREN[CHILD_START[packed]:CHILD_START[packed + 1]]
+                    if not mask & hand_bit(child)]
+        if not children:
+            return 0.5
+        packed = random.choice(children)
+        mask |= hand_bit(packed)
+    return 0.5
+
+
+def run_iteration(root):
+    """One select / expand / playout / backpropagate cycle."""
+    node = root
+    while not node.untried and node.children:
+        node = node.select_child()
+    if node.untried:
+        node = node.expand()
+
+    result = playout(node.packed, node.mask)
+
+    # Reward is kept for the player who moved into each node
+    while node is not None:
+        node.visits += 1
+        # The side to move is the last bit: 1 means P1 just moved
+        node.reward += result if node.packed & 1 else 1 - result
+        node = node.parent
+
+
+def find_subtree(root, packed, mask):
+    """Look for the node of (packed, mask) up to two plies below root."""
+    frontier = [root]
+    for _ in range(3):
+        for node in frontier:
+            if node.packed == packed and node.mask == mask:
+                return node
+        frontier = [child for node in frontier for child in node.children]
+    return None
+
+
+def mcts_search(game_state, time_limit_ms=100, iterations=None, game_id=None, stop=None):
+    """
+    Find a move with Monte Carlo Tree Search.
+    Runs for time_limit_ms milliseconds, or for a fixed number of iterations
+    if given. With a game_id the tree is kept and reused on the next call
+    for the same game. Raises SearchCancelled if the stop event is set.
+    Returns (move, evaluation, stats): the most visited move, its win rate
+    scaled to -100..+100 and a dict with iteration and tree reuse counts.
+    """
+    if game_id is None:
+        return _search(game_state, time_limit_ms, iterations, None, stop)
+    with _lock:
+        game_lock = _game_locks.setdefault(game_id, threading.Lock())
+    with game_lock:
+        return _search(game_state, time_limit_ms, iterations, game_id, stop)
+
+
+def _search(game_state, time_limit_ms, iterations, game_id, stop):
+    packed = game_state.pack()
+    mask = visited_mask(game_state)
+
+    root = None
+    reused = 0
+    trees = _trees.get(game_id, []) if game_id is not None else []
+    for tree in reversed(trees):
+        root = find_subtree(tree, packed, mask)
+        if root is not None:
+            root.parent = None
+            reused = root.visits
+            break
+    if root is None:
+        root = Node(packed, mask)
+
+    if TERMINAL[packed] or (not root.untried and not root.children):
+        return None, 0, {'iterations': 0, 'reused_visits': reused}
+
+    deadline = time.perf_counter() + time_limit_ms / 1000
+    count = 0
+    while True:
+        if iterations is not None:
+            if count >= iterations:
+                break
+        elif count % 16 == 0 and time.perf_counter() >= deadline:
+            break
+        if stop is not None and count % 16 == 0 and stop.is_set():
+            raise SearchCancelled()
+        run_iteration(root)
+        count += 1
+
+    if game_id is not None:
+        with _lock:
+            _trees[game_id] = ([tree for tree in trees if tree is not root] + [root])[-TREES_PER_GAME:]
+            _trees.move_to_end(game_id)
+            while len(_trees) > MAX_TREES:
+                _game_locks.pop(_trees.popitem(last=False)[0], None)
+
+    if not root.children:
+        return None, 0, {'iterations': count, 'reused_visits': reused}
+
+    best = max(root.children, key=lambda child: child.visits)
+    win_rate = best.reward / best.visits
+    stats = {'iterations': count, 'reused_visits': reused, 'root_visits': root.visits}
+    logger.debug("MCTS: %d iterations (%d reused), best %s with %.3f over %d visits",
+                 count, reused, best.move, win_rate, best.visits)
+    return best.move, round((2 * win_rate - 1) * 100), stats
+
+
+def forget_game(game_id):
+    """Drop the stored trees of a game."""
+    with _lock:
+        _trees.pop(game_id, None)
+        _game_locks.pop(game_id, None)
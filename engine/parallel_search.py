@@ -0,0 +1,102 @@
+"""
+Root-split parallel alpha-beta search for the Chopsticks game.
+
+The first root move is searched in the calling process to get a lower bound,
+then the remaining root moves are searched in a process pool with that bound
+as alpha. A root move only beats the bound if its value is exact, so the move
+returned is the same as get_best_move would pick for the same move order.
+Meant for offline analysis and deep searches: for the shallow searches the
+web app runs, the cost of sending work to other processes outweighs the gain.
+"""
+import os
+import random
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from engine.movegen import get_all_possible_moves
+from engine.evaluator import evaluate_position, get_eval_table, set_eval_table
+from engine import search
+from engine.search import alpha_beta, set_quiescence
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Shared worker pool, created on first use
+_executor = None
+_executor_workers = None
+
+
+def get_executor(workers=None):
+    """Returns the shared process pool, (re)creating it for a new worker count."""
+    global _executor, _executor_workers
+    workers = workers or os.cpu_count() or 1
+    if _executor is None or _executor_workers != workers:
+        shutdown_executor()
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown_executor():
+    """Stop the shared process pool."""
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = None
+    _executor_workers = None
+
+
+def _search_root_move(next_state, depth, alpha, eval_table, quiescence):
+    """Worker task: value of one root move given the bound found so far."""
+    # Search with the caller's evaluator and quiescence setting, which may
+    # differ from the ones the worker inherited when it was started
+    if get_eval_table() != eval_table:
+        set_eval_table(eval_table)
+    if search.quiescence_enabled != quiescence:
+        set_quiescence(quiescence)
+    return -alpha_beta(next_state, depth - 1, float('-inf'), -alpha)
+
+
+def get_best_move_parallel(game_state, depth=8, workers=None):
+    """
+    Find the best move using alpha-beta search with the root moves split
+    over a process pool.
+    Returns the best move and its evaluation score.
+    """
+    possible_moves = get_all_possible_moves(game_state)
+
+    if not possible_moves or game_state.is_terminal:
+        return None, evaluate_position(game_state)
+
+    # Shuffle moves to avoid bias in equal evaluations
+    random.shuffle(possible_moves)
+
+    # Keep only the moves the rules accept
+    children = []
+    for move in possible_moves:
+        next_state = game_state.clone()
+        success, error = next_state.apply_move(move)
+        if success:
+            children.append((move, next_state))
+        else:
+            logger.debug("Illegal move attempted in search: %s - %s", move, error)
+
+    if not children:
+        return None, float('-inf')
+
+    # The first move sets the bound for all the others
+    best_move, first_state = children[0]
+    best_value = -alpha_beta(first_state, depth - 1, float('-inf'), float('inf'))
+
+    if len(children) > 1:
+        executor = get_executor(workers)
+        eval_table = get_eval_table()
+        futures = [(move, executor.submit(_search_root_move, next_state, depth, best_value, eval_table,
+                                          search.quiescence_enabled))
+                   for move, next_state in children[1:]]
+        for move, future in futures:
+            value = future.result()
+            if value > best_value:
+                best_value = value
+                best_move = move
+
+    return best_move, best_value
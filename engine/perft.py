@@ -0,0 +1,94 @@
+"""
+Perft-style node counting for Chopsticks.
+
+Counts the leaf nodes of the legal move tree under the engine's exact rules:
+moves come from movegen and are played with GameState.apply_move, both by the
+state's Rules (so variants are counted by their own rules), and any move that
+recreates an already visited position (ERR_REPEAT) is not counted. Finished games are not
+expanded further; like a checkmate in chess perft, a game that ends before the
+requested depth contributes no leaves.
+
+    python -m engine.perft 6
+    python -m engine.perft 5 --state "= 2-3 | 1-2" --player 1 --divide
+"""
+import time
+import argparse
+from engine.game_state import GameState
+from engine.movegen import get_all_possible_moves
+
+
+def legal_children(game_state):
+    """Yields (move, next_state) for every move the rules accept."""
+    for move in get_all_possible_moves(game_state):
+        next_state = game_state.clone()
+        success, _ = next_state.apply_move(move)
+        if success:
+            yield move, next_state
+
+
+def perft(game_state, depth):
+    """
+    Count the leaf nodes reachable from game_state in exactly depth plies.
+    """
+    if depth == 0:
+        return 1
+    if game_state.is_terminal:
+        return 0
+
+    if depth == 1:
+        return sum(1 for _ in legal_children(game_state))
+
+    return sum(perft(next_state, depth - 1) for _, next_state in legal_children(game_state))
+
+
+def perft_divide(game_state, depth):
+    """
+    Split the perft count by root move.
+    Returns a list of (move, leaf_count) in move generation order.
+    """
+    if depth == 0 or game_state.is_terminal:
+        return []
+    return [(move, perft(next_state, depth - 1)) for move, next_state in legal_children(game_state)]
+
+
+def parse_position(state_str, player):
+    """Build a GameState from "= 1-1 | 1-1" style notation."""
+    state_str = state_str.strip().lstrip("=").strip()
+    p1_part, p2_part = state_str.split("|")
+    p1_hands = tuple(int(h) for h in p1_part.strip().split("-"))
+    p2_hands = tuple(int(h) for h in p2_part.strip().split("-"))
+    return GameState(p1_hands=p1_hands, p2_hands=p2_hands, current_player=player)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count legal leaf nodes of the Chopsticks move tree")
+    parser.add_argument('depth', type=int, help="number of plies")
+    parser.add_argument('--state', default="= 1-1 | 1-1", help='position, e.g. "= 2-3 | 1-2"')
+    parser.add_argument('--player', type=int, choices=[1, 2], default=1, help="side to move")
+    parser.add_argument('--divide', action='store_true', help="print the count below every root move")
+    parser.add_argument('--all-depths', action='store_true', help="report every depth from 1 up to depth")
+    args = parser.parse_args()
+
+    game_state = parse_position(args.state, args.player - 1)
+    print(f"Position {game_state.get_state_str()}, P{args.player} to move")
+
+    if args.divide:
+        start = time.perf_counter()
+        total = 0
+        for move, count in perft_divide(game_state, args.depth):
+            print(f"{move.get_notation():<24} {count:,}")
+            total += count
+        elapsed = time.perf_counter() - start
+        print(f"\nTotal: {total:,} leaves in {elapsed:.3f}s ({total / elapsed if elapsed else 0:,.0f} nodes/s)")
+        return
+
+    depths = range(1, args.depth + 1) if args.all_depths else [args.depth]
+    for depth in depths:
+        start = time.perf_counter()
+        count = perft(game_state, depth)
+        elapsed = time.perf_counter() - start
+        print(f"perft({depth}) = {count:,}  {elapsed:.3f}s  ({count / elapsed if elapsed else 0:,.0f} nodes/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Proof-number search for forced wins in Chopsticks.
+
+Proves or disproves that the side to move can force a win, i.e. eliminate
+both opponent hands whatever the opponent plays. Positions are searched as
+(packed position, visited bitmask) on the packed move tables, so the no-repeat
+rule is applied exactly: a position reached with a different history is a
+different node. A side left without any legal move has not been beaten, so
+such positions never count as wins.
+
+Solved nodes are cached across searches. Because the key includes the full
+history, a cached result is valid wherever the same node appears again,
+including on later moves of the same game.
+"""
+import logging
+from collections import OrderedDict
+from engine import tables
+from engine.tables import TERMINAL, hand_bit, visited_mask
+from engine.search import SearchCancelled
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+INFINITY = 10 ** 9
+
+# Solved positions kept across searches
+MAX_CACHED = 200000
+
+# (packed, mask) -> plies to a forced win for the side to move, or None if it has none
+_win_cache = OrderedDict()
+# (packed, mask) -> plies until the side to move is forced to lose, or None if it can avoid it
+_loss_cache = OrderedDict()
+
+# Cache lookups read each entry once: pondering and requests store
+# concurrently, so an entry can be evicted between a check and a read
+_MISSING = object()
+
+
+def _cache_store(cache, key, value):
+    cache[key] = value
+    if len(cache) > MAX_CACHED:
+        cache.popitem(last=False)
+
+
+class Node:
+    """A node of the proof tree. OR nodes have the attacker to move."""
+    __slots__ = ('packed', 'mask', 'is_or', 'parent', 'move', 'children', 'proof', 'disproof', 'distance')
+
+    def __init__(self, packed, mask, is_or, parent=None, move=None):
+        self.packed = packed
+        self.mask = mask
+        self.is_or = is_or
+        self.parent = parent
+        self.move = move
+        self.children = None
+        self.proof = 1
+        self.disproof = 1
+        # Plies to the win once the node is proven
+        self.distance = None
+        self.evaluate()
+
+    def evaluate(self):
+        """Set the proof numbers of a leaf from the rules and the caches."""
+        if TERMINAL[self.packed]:
+            # The player who just moved won: a win for the attacker at AND nodes
+            self.set_result(not self.is_or, 0)
+            return
+        cached = (_win_cache if self.is_or else _loss_cache).get((self.packed, self.mask), _MISSING)
+        if cached is not _MISSING:
+            self.set_result(cached is not None, cached)
+        elif not tables.legal_moves(self.packed, self.mask):
+            # No legal move left: nobody wins
+            self.set_result(False, None)
+
+    def set_result(self, proven, distance):
+        if proven:
+            self.proof, self.disproof, self.distance = 0, INFINITY, distance
+        else:
+            self.proof, self.disproof, self.distance = INFINITY, 0, None
+
+    def expand(self):
+        self.children = [Node(child, self.mask | hand_bit(child), not self.is_or, self, move)
+                         for move, child in tables.legal_moves(self.packed, self.mask)]
+        self.update()
+
+    def update(self):
+        """Recompute proof numbers from the children."""
+        children = self.children
+        if self.is_or:
+            self.proof = min(child.proof for child in children)
+            self.disproof = min(sum(child.disproof for child in children), INFINITY)
+            if self.proof == 0:
+                self.distance = 1 + min(child.distance for child in children if child.proof == 0)
+        else:
+            self.proof = min(sum(child.proof for child in children), INFINITY)
+            self.disproof = min(child.disproof for child in children)
+            if self.proof == 0:
+                self.distance = 1 + max(child.distance for child in children)
+
+        if self.proof == 0 or self.disproof == 0:
+            key = (self.packed, self.mask)
+            proven = self.proof == 0
+            if self.is_or:
+                _cache_store(_win_cache, key, self.distance if proven else None)
+            else:
+                _cache_store(_loss_cache, key, self.distance if proven else None)
+            # The subtree is no longer needed
+            self.children = [child for child in children if child.proof == 0] if self.is_or and proven else []
+
+    def most_proving_child(self):
+        if self.is_or:
+            return min(self.children, key=lambda child: child.proof)
+        return min(self.children, key=lambda child: child.disproof)
+
+
+def prove_win(game_state, max_nodes=50000, stop=None):
+    """
+    Try to prove that the side to move in game_state can force a win.
+    Raises SearchCancelled if the stop event is set.
+
+    Returns a dict with 'result' ("win", "no_win" or "unknown" when the node
+    budget ran out), the winning 'move' and the length of the proof in plies
+    ('distance', the longest line the opponent can make it last within the
+    proof found) for a win, and the number of 'nodes' created.
+    """
+    packed = game_state.pack()
+    root = Node(packed, visited_mask(game_state), True)
+    nodes = 1
+
+    while root.proof != 0 and root.disproof != 0 and nodes < max_nodes:
+        if stop is not None and stop.is_set():
+            raise SearchCancelled()
+        node = root
+        while node.children:
+            node = node.most_proving_child()
+        node.expand()
+        nodes += len(node.children)
+
+        # Update the ancestors until the numbers stop changing
+        node = node.parent
+        while node is not None:
+            old = (node.proof, node.disproof)
+            node.update()
+            if (node.proof, node.disproof) == old and node.proof != 0 and node.disproof != 0:
+                break
+            node = node.parent
+
+    if root.proof == 0:
+        if root.children:
+            best = min((child for child in root.children if child.proof == 0), key=lambda child: child.distance)
+            move = best.move
+        else:
+            # Proven straight from the cache: find the child that keeps the win
+            move = cached_winning_move(packed, root.mask)
+        result = {'result': 'win', 'move': move, 'distance': root.distance, 'nodes': nodes}
+    elif root.disproof == 0:
+        result = {'result': 'no_win', 'move': None, 'distance': None, 'nodes': nodes}
+    else:
+        result = {'result': 'unknown', 'move': None, 'distance': None, 'nodes': nodes}
+
+    logger.debug("Proof-number search: %s after %d nodes (distance %s)", result['result'], nodes, result['distance'])
+    return result
+
+
+def cached_winning_move(packed, mask):
+    """The move to a child the cache knows as lost for the opponent, with the shortest loss."""
+    best = None
+    for move, child in tables.legal_moves(packed, mask):
+        child_mask = mask | hand_bit(child)
+        if TERMINAL[child]:
+            return move
+        distance = _loss_cache.get((child, child_mask))
+        if distance is not None and (best is None or distance < best[0]):
+            best = (distance, move)
+    return best[1] if best else None
+
+
+def clear_cache():
+    """Drop every solved position."""
+    _win_cache.clear()
+    _loss_cache.clear()
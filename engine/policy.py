@@ -0,0 +1,95 @@
+"""
+Difficulty levels as move-selection policies.
+
+Every difficulty reads the same list of root move values, searched once at
+POLICY_DEPTH with a full window and cached per position and game history.
+A difficulty only decides how to pick from that list: a softmax over the
+values with the level's temperature, so a move is less likely the further
+it falls behind the best one, and a blunder rate at which any legal move is
+played. Picking costs the same for every level, and a list computed for one
+level (or by pondering) serves all of them. engine.ai hands the policy the
+solver's outcomes instead when a position is solved, and marks a proven
+forced win as the best move, so exact results go through the same policy.
+"""
+import math
+import random
+import logging
+from engine.search import root_move_values
+from engine.tables import visited_mask
+from engine.response_cache import ResponseCache
+from engine.shared_cache import shared_table
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Search depth of the shared move values
+POLICY_DEPTH = 6
+
+# Selection policy of each difficulty level. temperature is in evaluation
+# points (0 always plays a best move); blunder_rate is the probability of
+# playing a uniformly random legal move instead.
+DIFFICULTY_POLICIES = {
+    'novice': {'temperature': 12, 'blunder_rate': 0.3},
+    'intermediate': {'temperature': 4, 'blunder_rate': 0.05},
+    'master': {'temperature': 0, 'blunder_rate': 0},
+}
+
+# Evaluation reported for an infinite move value (a side left without a
+# move that doesn't repeat a position), on the scale of the solver and PNS
+DECIDED_EVALUATION = 100
+
+# Root move values by (packed position, visited mask, depth), shared by the
+# server's workers when the master created the shared caches
+value_cache = shared_table('values')
+if value_cache is None:
+    value_cache = ResponseCache()
+
+
+def move_values(game_state, depth=POLICY_DEPTH, use_cache=True, stop=None):
+    """
+    The (move, value) list of game_state, from the cache when possible. A
+    search cancelled through the stop event raises SearchCancelled and
+    caches nothing.
+    Returns (values, cached).
+    """
+    key = (game_state.pack(), visited_mask(game_state), depth)
+    if use_cache:
+        values = value_cache.get(key)
+        if values is not None:
+            return values, True
+
+    values = root_move_values(game_state, depth, stop)
+    if use_cache:
+        value_cache.put(key, values)
+    return values, False
+
+
+def choose_move(values, difficulty, rng=random):
+    """
+    Pick a (move, value) pair from values with the policy of difficulty.
+    An infinite value is returned as +/-DECIDED_EVALUATION, so the
+    evaluation stays a number JSON can carry.
+    Returns (None, 0) if there are no moves.
+    """
+    if not values:
+        return None, 0
+    policy = DIFFICULTY_POLICIES.get(difficulty, DIFFICULTY_POLICIES['novice'])
+
+    move, value = _pick(values, policy, rng)
+    if math.isinf(value):
+        value = DECIDED_EVALUATION if value > 0 else -DECIDED_EVALUATION
+    return move, value
+
+
+def _pick(values, policy, rng):
+    if rng.random() < policy['blunder_rate']:
+        return rng.choice(values)
+
+    best = max(value for _, value in values)
+    # A search with every move repeating a position returns an infinite
+    # value, which the softmax can't weigh
+    if policy['temperature'] <= 0 or math.isinf(best):
+        return rng.choice([entry for entry in values if entry[1] == best])
+
+    weights = [math.exp((value - best) / policy['temperature']) for _, value in values]
+    return rng.choices(values, weights=weights)[0]
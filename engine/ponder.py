@@ -0,0 +1,125 @@
+"""
+Pondering: thinking on the opponent's time.
+
+After the AI has answered, a background thread plays through the human's
+most likely replies and runs the AI search on each resulting position, so
+the answers are already in the response cache when the next request comes
+in. Pondering is bounded by a time budget and a number of replies. Each game
+(session) ponders on its own thread with its own stop event, which the next
+request of that game sets: the search checks it and stops within a node, so
+the request never waits for the ponder.
+"""
+import os
+import time
+import logging
+import threading
+from engine.evaluator import evaluate_position
+from engine.movegen import get_all_possible_moves
+from engine.search import SearchCancelled
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Pondering is opt-in: set PONDER=1 to enable it in the app
+PONDER_ENABLED = os.environ.get("PONDER", "") == "1"
+
+# Wall-clock budget and number of replies considered per pondering run
+PONDER_TIME_MS = int(os.environ.get("PONDER_TIME_MS", "2000"))
+PONDER_MAX_REPLIES = int(os.environ.get("PONDER_MAX_REPLIES", "8"))
+
+# Pondering threads running at the same time, cancelled ones that are still
+# winding down included; further games don't ponder until one ends
+PONDER_MAX_GAMES = int(os.environ.get("PONDER_MAX_GAMES", "4"))
+
+# Ponders that can be cancelled: game key -> (thread, stop event)
+_ponders = {}
+# Every pondering thread still alive, cancelled or not
+_threads = set()
+_lock = threading.Lock()
+
+
+def likely_replies(game):
+    """
+    Legal replies of the side to move, most promising for it first.
+    Returns a list of (move, next_state).
+    """
+    replies = []
+    for move in get_all_possible_moves(game):
+        next_state = game.clone()
+        success, _ = next_state.apply_move(move)
+        if success:
+            replies.append((move, next_state))
+    # The evaluation is from the point of view of the player to move next,
+    # so the replies the opponent likes best are the ones scored lowest
+    replies.sort(key=lambda reply: evaluate_position(reply[1]))
+    return replies
+
+
+def ponder(game, difficulty, backend, stop, time_limit_ms=PONDER_TIME_MS, max_replies=PONDER_MAX_REPLIES,
+           game_id=None):
+    """
+    Precompute the AI's answers to the likely replies from game. With a
+    game_id MCTS grows the game's trees, so a reply that wasn't pondered
+    still reuses them.
+    Stops when the stop event is set (cancelling the search in progress), the
+    time is up or max_replies were done.
+    Returns the number of positions searched.
+    """
+    # Imported here: engine.ai uses the response cache this module fills
+    from engine.ai import get_ai_move
+
+    deadline = time.perf_counter() + time_limit_ms / 1000
+    searched = 0
+    for move, next_state in likely_replies(game)[:max_replies]:
+        if stop.is_set() or time.perf_counter() > deadline:
+            break
+        if next_state.is_terminal:
+            continue
+        try:
+            get_ai_move(next_state, difficulty, backend=backend, game_id=game_id, stop=stop)
+        except SearchCancelled:
+            break
+        searched += 1
+    logger.debug("Pondered %d replies%s", searched, " (cancelled)" if stop.is_set() else "")
+    return searched
+
+
+def _run(key, game, difficulty, backend, stop):
+    try:
+        ponder(game, difficulty, backend, stop, game_id=key)
+    finally:
+        with _lock:
+            _threads.discard(threading.current_thread())
+            # A newer ponder of the same game may have replaced this one
+            if key in _ponders and _ponders[key][1] is stop:
+                del _ponders[key]
+
+
+def start_pondering(key, game, difficulty, backend=None):
+    """
+    Start pondering on game in the background for the game key (the
+    session's game id), replacing that game's running ponder. Returns False
+    if PONDER_MAX_GAMES pondering threads are still running.
+    """
+    stop_pondering(key)
+    with _lock:
+        if len(_threads) >= PONDER_MAX_GAMES:
+            return False
+        stop = threading.Event()
+        thread = threading.Thread(target=_run, args=(key, game, difficulty, backend, stop),
+                                  name=f"ponder-{key}", daemon=True)
+        _ponders[key] = (thread, stop)
+        _threads.add(thread)
+        thread.start()
+    return True
+
+
+def stop_pondering(key):
+    """
+    Cancel the ponder of the game key, if any, without waiting for it: its
+    search stops at the next node that checks the stop event.
+    """
+    with _lock:
+        ponder_entry = _ponders.pop(key, None)
+    if ponder_entry is not None:
+        ponder_entry[1].set()
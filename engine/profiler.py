@@ -0,0 +1,150 @@
+"""
+Opt-in profiler for the alpha-beta search.
+
+Runs get_best_move under cProfile and reports call counts and time per
+engine function; the raw pstats file is dumped when a directory is given
+(SEARCH_PROFILE_DIR for the server, profiles/ by default on the command
+line). Nothing here runs unless a profile is explicitly requested, so
+normal searches pay no overhead.
+
+    python -m engine.profiler --depth 8
+"""
+import os
+import time
+import cProfile
+import pstats
+import logging
+import argparse
+from engine.search import get_best_move
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Directory the server writes .pstats files to; unset, profiles are only
+# reported, never written
+PROFILE_DIR = os.environ.get("SEARCH_PROFILE_DIR")
+
+# Default directory of the command line
+CLI_PROFILE_DIR = "profiles"
+
+# Engine functions broken out in the report: label -> (module file, function name).
+# Below the root the search walks packed positions, so these are the
+# functions it spends its time in (see engine.search)
+ENGINE_FUNCTIONS = {
+    'get_best_move': ('search.py', 'get_best_move'),
+    'root_move_values': ('search.py', 'root_move_values'),
+    'alpha_beta': ('search.py', '_alpha_beta'),
+    'frontier_value': ('search.py', '_frontier_value'),
+    'quiescence': ('search.py', '_quiescence'),
+}
+
+
+def profile_call(fn, *args, dump_path=None):
+    """
+    Call fn(*args) under cProfile.
+    Returns (result, report) where report breaks the time down per engine function.
+    """
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    result = profiler.runcall(fn, *args)
+    total = time.perf_counter() - start
+
+    if dump_path:
+        directory = os.path.dirname(dump_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(dump_path)
+
+    stats = pstats.Stats(profiler)
+    functions = {}
+    for (filename, _, funcname), (prim_calls, calls, tottime, cumtime, _) in stats.stats.items():
+        for label, (module_file, name) in ENGINE_FUNCTIONS.items():
+            if funcname == name and filename.endswith(module_file):
+                functions[label] = {
+                    'calls': calls,
+                    'primitive_calls': prim_calls,
+                    'tottime_s': tottime,
+                    'cumtime_s': cumtime,
+                }
+
+    report = {
+        'total_s': total,
+        'functions': functions,
+        'dump': dump_path,
+    }
+    return result, report
+
+
+def profile_search(game_state, depth, dump_dir=PROFILE_DIR):
+    """
+    Run get_best_move(game_state, depth) under the profiler.
+    Returns (move, value, report).
+    """
+    dump_path = None
+    if dump_dir:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        dump_path = os.path.join(dump_dir, f"search-{stamp}-{os.getpid()}-d{depth}.pstats")
+
+    (move, value), report = profile_call(get_best_move, game_state, depth, dump_path=dump_path)
+    report['depth'] = depth
+    logger.info("Profiled search depth %d in %.3fs: %s", depth, report['total_s'],
+                ", ".join(f"{label}={info['calls']}/{info['cumtime_s']:.3f}s"
+                          for label, info in report['functions'].items()))
+    return move, value, report
+
+
+def profile_move_values(game_state, depth, use_cache=True, dump_dir=PROFILE_DIR):
+    """
+    Run policy.move_values(game_state, depth, use_cache) under the profiler,
+    the search the difficulty policies read.
+    Returns (values, cached, report).
+    """
+    # Imported here: the policy imports the search this module profiles
+    from engine.policy import move_values
+
+    dump_path = None
+    if dump_dir:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        dump_path = os.path.join(dump_dir, f"values-{stamp}-{os.getpid()}-d{depth}.pstats")
+
+    (values, cached), report = profile_call(move_values, game_state, depth, use_cache, dump_path=dump_path)
+    report['depth'] = depth
+    report['cached'] = cached
+    logger.info("Profiled move values depth %d in %.3fs%s", depth, report['total_s'], " (cached)" if cached else "")
+    return values, cached, report
+
+
+def format_report(report):
+    """Format a report as a text table."""
+    lines = [f"Search depth {report.get('depth')} took {report['total_s']:.3f}s (under cProfile)",
+             f"{'function':<24} {'calls':>10} {'own time':>10} {'cumulative':>11}"]
+    for label in ENGINE_FUNCTIONS:
+        info = report['functions'].get(label)
+        if info:
+            lines.append(f"{label:<24} {info['calls']:>10,} {info['tottime_s']:>9.3f}s {info['cumtime_s']:>10.3f}s")
+    if report.get('dump'):
+        lines.append(f"pstats written to {report['dump']}")
+    return "\n".join(lines)
+
+
+def main():
+    from engine.perft import parse_position
+
+    parser = argparse.ArgumentParser(description="Profile a single alpha-beta search")
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--state', default="= 1-1 | 1-1", help='position, e.g. "= 2-3 | 1-2"')
+    parser.add_argument('--player', type=int, choices=[1, 2], default=1, help="side to move")
+    parser.add_argument('--dump-dir', default=PROFILE_DIR or CLI_PROFILE_DIR, help="directory for the .pstats file")
+    parser.add_argument('--top', type=int, default=0, help="also print the top N pstats entries")
+    args = parser.parse_args()
+
+    game_state = parse_position(args.state, args.player - 1)
+    move, value, report = profile_search(game_state, args.depth, args.dump_dir)
+    print(f"Best move: {move.get_notation() if move else None} (eval {value})")
+    print(format_report(report))
+    if args.top and report['dump']:
+        pstats.Stats(report['dump']).sort_stats('cumulative').print_stats(args.top)
+
+
+if __name__ == '__main__':
+    main()
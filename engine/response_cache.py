@@ -0,0 +1,73 @@
+"""
+Cache of computed AI responses.
+
+Maps a position with its game history and the engine settings to the move
+the AI chose there, and to the outcome of the forced-win search run there
+with a given budget, so a repeated or pondered position is answered
+without searching again.
+"""
+import threading
+from collections import OrderedDict
+from engine.tables import visited_mask
+from engine.shared_cache import shared_table
+
+# Number of responses kept
+MAX_RESPONSES = 50000
+
+
+def response_key(game_state, difficulty, backend):
+    """Cache key of a position, its visited positions and the engine settings."""
+    return (game_state.pack(), visited_mask(game_state), difficulty, backend)
+
+
+def proof_key(game_state, max_nodes):
+    """Cache key of a forced-win search of a position and its visited positions within max_nodes."""
+    return (game_state.pack(), visited_mask(game_state), 'proof', max_nodes)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache, used for (move, evaluation, perfect, info) responses."""
+
+    def __init__(self, max_entries=MAX_RESPONSES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            response = self.entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Responses computed by this process, or by every worker of the server when
+# the master created the shared caches
+response_cache = shared_table('responses')
+if response_cache is None:
+    response_cache = ResponseCache()
@@ -0,0 +1,288 @@
+"""
+Rule variants of Chopsticks.
+
+A Rules object describes a variant: fingers per hand (a hand reaching that
+many fingers dies), hands per player, what happens to a hand that goes past
+the limit (rollover keeps the remainder, cutoff kills the hand) and whether
+splits are allowed. RuleTables turns a variant into packed move tables that
+the fast searches and the solvers walk instead of a hand-written engine.
+GameState plays by a Rules object and engine.movegen reads the moves from
+its tables, so a variant only needs a new Rules instance.
+
+Positions of a variant are packed like the standard game: the hands of P1
+then P2 as base-`fingers` digits, then the side to move. STANDARD_RULES packs
+exactly like engine.game_state.pack_position.
+
+    python -m engine.rules --fingers 5 --hands 2 --overflow cutoff
+"""
+import sys
+import time
+import logging
+import argparse
+from itertools import product
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+OVERFLOW_MODES = ('rollover', 'cutoff')
+
+
+class Rules:
+    """The rules of one Chopsticks variant."""
+
+    def __init__(self, fingers=5, hands=2, overflow='rollover', splits=True, split_to_dead=True):
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"Unknown overflow mode '{overflow}', expected one of {', '.join(OVERFLOW_MODES)}")
+        if fingers < 2 or hands < 1:
+            raise ValueError("A variant needs at least 2 fingers and 1 hand")
+        self.fingers = fingers  # A hand with this many fingers is dead
+        self.hands = hands  # Hands per player
+        self.overflow = overflow  # "rollover" (mod fingers) or "cutoff" (dead past the limit)
+        self.splits = splits  # Whether splits are allowed at all
+        self.split_to_dead = split_to_dead  # Whether a split may kill or revive a hand
+        # (move_type, player, details) -> GameMove of a variant's moves, see move()
+        self._moves = {}
+        # The variant's RuleTables once rule_tables has built them
+        self._tables = None
+
+    def __eq__(self, other):
+        return isinstance(other, Rules) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __reduce__(self):
+        # Pickle the settings only, not the move caches; the standard rules
+        # come back as STANDARD_RULES itself
+        if self is STANDARD_RULES:
+            return "STANDARD_RULES"
+        return Rules, self.key()
+
+    def __repr__(self):
+        return (f"Rules(fingers={self.fingers}, hands={self.hands}, overflow='{self.overflow}', "
+                f"splits={self.splits}, split_to_dead={self.split_to_dead})")
+
+    def key(self):
+        """The settings as a tuple."""
+        return (self.fingers, self.hands, self.overflow, self.splits, self.split_to_dead)
+
+    @property
+    def num_positions(self):
+        """Number of packed positions of the variant."""
+        return self.fingers ** (2 * self.hands) * 2
+
+    def initial_position(self):
+        """Packed starting position: one finger on every hand, P1 to move."""
+        return self.pack((1,) * self.hands, (1,) * self.hands, 0)
+
+    def pack(self, p1_hands, p2_hands, current_player):
+        """Packs a position into an index in range(num_positions)."""
+        index = 0
+        for fingers in tuple(p1_hands) + tuple(p2_hands):
+            index = index * self.fingers + fingers
+        return index * 2 + current_player
+
+    def unpack(self, index):
+        """Inverse of pack. Returns (p1_hands, p2_hands, current_player)."""
+        index, current_player = divmod(index, 2)
+        digits = []
+        for _ in range(2 * self.hands):
+            index, fingers = divmod(index, self.fingers)
+            digits.append(fingers)
+        digits.reverse()
+        return tuple(digits[:self.hands]), tuple(digits[self.hands:]), current_player
+
+    def add_fingers(self, defender, attacker):
+        """Fingers on a hand with defender fingers after a tap with attacker fingers."""
+        total = defender + attacker
+        if self.overflow == 'rollover':
+            return total % self.fingers
+        return total if total < self.fingers else 0
+
+    def tap(self, player_hands, opponent_hands, att_hand, def_hand):
+        """The opponent's hands after a tap, or None if either hand is dead."""
+        if player_hands[att_hand] == 0 or opponent_hands[def_hand] == 0:
+            return None
+        new_hands = list(opponent_hands)
+        new_hands[def_hand] = self.add_fingers(opponent_hands[def_hand], player_hands[att_hand])
+        return tuple(new_hands)
+
+    def taps(self, player_hands, opponent_hands):
+        """(att_hand, def_hand, new_opponent_hands) for every tap."""
+        taps = []
+        for att_hand in range(self.hands):
+            for def_hand in range(self.hands):
+                new_hands = self.tap(player_hands, opponent_hands, att_hand, def_hand)
+                if new_hands is not None:
+                    taps.append((att_hand, def_hand, new_hands))
+        return taps
+
+    def split_error(self, player_hands, new_hands):
+        """
+        Why player_hands can't be split into new_hands: "ERR_REVERSAL" for a
+        rearrangement of the current hands, "ERR_INVALID_SPLIT" for anything
+        else that isn't allowed, or "" for a legal split. The fingers are
+        redistributed, and no change counts as invalid.
+        """
+        player_hands, new_hands = tuple(player_hands), tuple(new_hands)
+        total = sum(player_hands)
+        if (not self.splits or total < 2 or len(new_hands) != self.hands or sum(new_hands) != total
+                or not all(0 <= fingers < self.fingers for fingers in new_hands)):
+            return "ERR_INVALID_SPLIT"
+        if sorted(new_hands) == sorted(player_hands):
+            return "ERR_INVALID_SPLIT" if new_hands == player_hands else "ERR_REVERSAL"
+        if not self.split_to_dead and any((old == 0) != (new == 0) for old, new in zip(player_hands, new_hands)):
+            return "ERR_INVALID_SPLIT"
+        return ""
+
+    def split_targets(self, player_hands):
+        """Hands a player can split player_hands into (see split_error)."""
+        if not self.splits or sum(player_hands) < 2:
+            return []
+        return [new_hands for new_hands in product(range(self.fingers), repeat=self.hands)
+                if not self.split_error(player_hands, new_hands)]
+
+    def move(self, move_type, player, details):
+        """
+        The shared GameMove of a move. The standard game uses the interned
+        moves (engine.game_state.intern_move); other variants keep their
+        own, so their moves never reach the registry find_move serves
+        client input from.
+        """
+        # Imported here: game_state plays by these rules
+        from engine.game_state import GameMove, intern_move
+
+        if self == STANDARD_RULES:
+            return intern_move(move_type, player, details)
+        key = (move_type, player, details)
+        move = self._moves.get(key)
+        if move is None:
+            move = self._moves[key] = GameMove(*key)
+        return move
+
+    def moves(self, index):
+        """
+        Moves from a packed position as ((move, next_packed), ...), taps
+        first, in the order engine.movegen generates them.
+        """
+        p1_hands, p2_hands, current_player = self.unpack(index)
+        if not any(p1_hands) or not any(p2_hands):
+            return ()
+        if current_player == 0:
+            player_hands, opponent_hands = p1_hands, p2_hands
+        else:
+            player_hands, opponent_hands = p2_hands, p1_hands
+
+        entries = []
+        for att_hand, def_hand, new_hands in self.taps(player_hands, opponent_hands):
+            move = self.move("tap", current_player, (att_hand, def_hand))
+            if current_player == 0:
+                entries.append((move, self.pack(p1_hands, new_hands, 1)))
+            else:
+                entries.append((move, self.pack(new_hands, p2_hands, 0)))
+        for new_hands in self.split_targets(player_hands):
+            move = self.move("split", current_player, tuple(player_hands) + tuple(new_hands))
+            if current_player == 0:
+                entries.append((move, self.pack(new_hands, p2_hands, 1)))
+            else:
+                entries.append((move, self.pack(p1_hands, new_hands, 0)))
+        return tuple(entries)
+
+    def winner(self, index):
+        """"P1" or "P2" if a player has no fingers left, otherwise None."""
+        p1_hands, p2_hands, _ = self.unpack(index)
+        return self.hands_winner(p1_hands, p2_hands)
+
+    @staticmethod
+    def hands_winner(p1_hands, p2_hands):
+        """"P1" or "P2" if a player has no fingers left, otherwise None."""
+        if not any(p1_hands):
+            return "P2"
+        if not any(p2_hands):
+            return "P1"
+        return None
+
+
+STANDARD_RULES = Rules()
+
+
+def check_standard_rules(rules):
+    """
+    Raise ValueError unless rules are the standard rules. For code that
+    indexes the standard game's tables (engine.tables, the eval table) with
+    packed positions, which are other positions in a variant.
+    """
+    if rules is not STANDARD_RULES and rules != STANDARD_RULES:
+        raise ValueError(f"Only the standard rules are supported here, not {rules!r}")
+
+
+class RuleTables:
+    """Packed move tables of a variant, built once from its rules."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.num_positions = rules.num_positions
+        # MOVES[packed] -> ((move, next_packed), ...), TERMINAL[packed] -> bool,
+        # WINNER[packed] -> "P1", "P2" or None
+        self.winner = tuple(rules.winner(index) for index in range(self.num_positions))
+        self.terminal = tuple(winner is not None for winner in self.winner)
+        self.moves = tuple(rules.moves(index) for index in range(self.num_positions))
+        # move_lists[packed] -> the moves of MOVES[packed] without the positions
+        self.move_lists = tuple(tuple(move for move, _ in entries) for entries in self.moves)
+
+    def children(self, index):
+        """Distinct packed positions reachable in one move."""
+        return {child for _, child in self.moves[index]}
+
+    def predecessors(self):
+        """predecessors[packed] -> list of positions with a move to packed."""
+        predecessors = [[] for _ in range(self.num_positions)]
+        for index in range(self.num_positions):
+            for child in self.children(index):
+                predecessors[child].append(index)
+        return predecessors
+
+
+# Rules -> RuleTables built so far, see rule_tables
+_rule_tables = {}
+
+
+def rule_tables(rules):
+    """The RuleTables of a variant, built on first use and then shared."""
+    if rules._tables is None:
+        if rules not in _rule_tables:
+            _rule_tables[rules] = RuleTables(rules)
+        rules._tables = _rule_tables[rules]
+    return rules._tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the move tables of a variant and solve it")
+    parser.add_argument('--fingers', type=int, default=5)
+    parser.add_argument('--hands', type=int, default=2)
+    parser.add_argument('--overflow', choices=OVERFLOW_MODES, default='rollover')
+    parser.add_argument('--no-splits', action='store_true')
+    parser.add_argument('--no-split-to-dead', action='store_true')
+    parser.add_argument('--output', help="write the solved tablebase to this file")
+    args = parser.parse_args()
+
+    # Imported here: the tablebase module builds on these rules
+    from engine.tablebase import describe, save_tablebase, solve
+
+    rules = Rules(args.fingers, args.hands, args.overflow, not args.no_splits, not args.no_split_to_dead)
+    start = time.perf_counter()
+    tables = RuleTables(rules)
+    built = time.perf_counter()
+    tablebase = solve(tables)
+    solved = time.perf_counter()
+
+    print(f"{rules}: {rules.num_positions} positions, "
+          f"{sum(len(moves) for moves in tables.moves)} moves", file=sys.stderr)
+    print(f"tables built in {built - start:.2f}s, solved in {solved - built:.2f}s", file=sys.stderr)
+    print(describe(tablebase, rules.initial_position()))
+    if args.output:
+        save_tablebase(tablebase, args.output)
+
+
+if __name__ == '__main__':
+    main()
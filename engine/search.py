@@ -1,21 +1,59 @@
 """
 Alpha-beta minimax search for the Chopsticks game.
+
+Leaves are not scored blindly: a quiescence stage keeps playing the taps
+that kill a hand (the last one wins the game) until the side to move has
+none left, so a kill just past the horizon is seen at the leaf.
+
+Below the root the search walks packed positions (engine.tables) with the
+visited positions as a bitmask and scores them from the eval table, without
+building GameState objects. The tables are those of the standard rules, so
+games of other variants raise ValueError.
 """
+import time
 import random
 import logging
-from engine.movegen import get_all_possible_moves
-from engine.evaluator import evaluate_position
+from engine.evaluator import evaluate_position, get_eval_table
+from engine.rules import check_standard_rules
+from engine.tables import (MOVES, CHILD_START, CHILDREN, KILL_START, KILL_CHILDREN, TERMINAL_FLAGS,
+                           visited_mask)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Number of positions visited by alpha_beta since the last reset
+node_count = 0
+
+# Extend the leaves with forcing taps (see quiescence)
+quiescence_enabled = True
+
+
+class SearchCancelled(Exception):
+    """Raised when the stop event of a search is set."""
+
+
+def set_quiescence(enabled):
+    """Turn the quiescence stage at the leaves on or off."""
+    global quiescence_enabled
+    quiescence_enabled = enabled
+
+
+def reset_node_count():
+    """Reset the node counter and return its previous value."""
+    global node_count
+    count = node_count
+    node_count = 0
+    return count
+
+
 def get_best_move(game_state, depth=4):
     """
     Find the best move using alpha-beta search.
     Returns the best move and its evaluation score.
     """
-    # Get all possible moves
-    possible_moves = get_all_possible_moves(game_state)
+    check_standard_rules(game_state.rules)
+    packed = game_state.pack()
+    possible_moves = list(MOVES[packed])
     
     # If no legal moves or the state is terminal, return None
     if not possible_moves or game_state.is_terminal:
@@ -24,23 +62,22 @@ def get_best_move(game_state, depth=4):
     # Shuffle moves to avoid bias in equal evaluations
     random.shuffle(possible_moves)
     
+    mask = visited_mask(game_state)
+    scores = get_eval_table()
     best_move = None
     best_value = float('-inf')
     alpha = float('-inf')
     beta = float('inf')
     
     # Try each move and evaluate with alpha-beta
-    for move in possible_moves:
-        # Apply the move to get the next state
-        next_state = game_state.clone()
-        success, error = next_state.apply_move(move)
-        
-        if not success:
-            logger.warning(f"Illegal move attempted in search: {move.get_notation()} - {error}")
+    for move, child in possible_moves:
+        bit = 1 << (child >> 1)
+        if mask & bit:
+            logger.debug("Move repeats a position in search: %s", move)
             continue
         
         # Get value from opponent's perspective (minimax)
-        value = -alpha_beta(next_state, depth - 1, -beta, -alpha)
+        value = -_alpha_beta(child, mask | bit, depth - 1, -beta, -alpha, scores)
         
         # Update best move if found
         if value > best_value:
@@ -51,33 +88,74 @@ def get_best_move(game_state, depth=4):
     return best_move, best_value
 
 
+def root_move_values(game_state, depth, stop=None):
+    """
+    Exact minimax value of every legal root move at the given depth.
+    Unlike get_best_move every move is searched with a full window, so the
+    values of the moves that are not best are exact too. If the stop event
+    is set during the search it raises SearchCancelled.
+    Returns a list of (move, value).
+    """
+    mask = visited_mask(game_state)
+    scores = get_eval_table()
+    values = []
+    for move, child in MOVES[game_state.pack()]:
+        bit = 1 << (child >> 1)
+        if mask & bit:
+            continue
+
+        values.append((move, -_alpha_beta(child, mask | bit, depth - 1, float('-inf'), float('inf'), scores, stop)))
+    return values
+
+
 def alpha_beta(game_state, depth, alpha, beta):
     """
     Alpha-beta pruning search algorithm.
     Returns the value of the position from the current player's perspective.
     """
+    return _alpha_beta(game_state.pack(), visited_mask(game_state), depth, alpha, beta, get_eval_table())
+
+
+def quiescence(game_state, alpha, beta):
+    """Value of game_state past the horizon (see _quiescence)."""
+    return _quiescence(game_state.pack(), visited_mask(game_state), alpha, beta, get_eval_table())
+
+
+def _alpha_beta(packed, mask, depth, alpha, beta, scores, stop=None):
+    """
+    alpha_beta on a packed position with the visited positions in mask,
+    scoring positions with the eval table scores. Raises SearchCancelled
+    when the stop event, if given, is set.
+    """
+    global node_count
+    node_count += 1
+
     # Check terminal conditions
-    if depth == 0 or game_state.is_terminal:
-        return evaluate_position(game_state)
-    
-    # Get all possible moves
-    possible_moves = get_all_possible_moves(game_state)
+    if depth == 0 or TERMINAL_FLAGS[packed]:
+        return _quiescence(packed, mask, alpha, beta, scores)
     
     # If no legal moves, evaluate current position
-    if not possible_moves:
-        return evaluate_position(game_state)
+    start, end = CHILD_START[packed], CHILD_START[packed + 1]
+    if start == end:
+        return scores[packed]
+
+    # One ply above the horizon, score the children directly
+    if depth == 1:
+        return _frontier_value(packed, mask, alpha, beta, scores)
+
+    # Checked above the frontier only: a frontier node is a few dozen lookups
+    if stop is not None and stop.is_set():
+        raise SearchCancelled()
     
     # Try each move and update alpha
-    for move in possible_moves:
-        # Apply the move to get the next state
-        next_state = game_state.clone()
-        success, error = next_state.apply_move(move)
-        
-        if not success:
+    for child in CHILDREN[start:end]:
+        # Positions already played can't be played again
+        bit = 1 << (child >> 1)
+        if mask & bit:
             continue
         
         # Evaluate from opponent's perspective (minimax)
-        value = -alpha_beta(next_state, depth - 1, -beta, -alpha)
+        value = -_alpha_beta(child, mask | bit, depth - 1, -beta, -alpha, scores, stop)
         
         # Beta cutoff (pruning)
         if value >= beta:
@@ -87,3 +165,97 @@ def alpha_beta(game_state, depth, alpha, beta):
         alpha = max(alpha, value)
     
     return alpha
+
+
+def _frontier_value(packed, mask, alpha, beta, scores):
+    """
+    Value of a node one ply above the horizon.
+    Same result as searching every child at depth 0, without the recursive
+    call per child.
+    """
+    global node_count
+    for child in CHILDREN[CHILD_START[packed]:CHILD_START[packed + 1]]:
+        bit = 1 << (child >> 1)
+        if mask & bit:
+            continue
+
+        node_count += 1
+        # Quiet children (most of them) are scored without the call
+        if quiescence_enabled and KILL_START[child] != KILL_START[child + 1]:
+            value = -_quiescence(child, mask | bit, -beta, -alpha, scores)
+        else:
+            value = -scores[child]
+
+        if value >= beta:
+            return beta
+
+        alpha = max(alpha, value)
+
+    return alpha
+
+
+def _quiescence(packed, mask, alpha, beta, scores):
+    """
+    Value of a position past the horizon.
+    The side to move may take the static evaluation or any tap that kills a
+    hand, whichever is better. Only those forcing taps are searched, and
+    each one removes a hand, so the extension ends within three plies.
+    """
+    global node_count
+    value = scores[packed]
+    if not quiescence_enabled:
+        return value
+    # Finished positions have no moves, so no kills either
+    start, end = KILL_START[packed], KILL_START[packed + 1]
+    if start == end:
+        return value
+
+    # Standing pat: the side to move doesn't have to take a kill
+    if value >= beta:
+        return beta
+    alpha = max(alpha, value)
+
+    for child in KILL_CHILDREN[start:end]:
+        bit = 1 << (child >> 1)
+        if mask & bit:
+            continue
+
+        node_count += 1
+        value = -_quiescence(child, mask | bit, -beta, -alpha, scores)
+
+        if value >= beta:
+            return beta
+
+        alpha = max(alpha, value)
+
+    return alpha
+
+
+def get_best_move_timed(game_state, time_limit_ms, max_depth=32):
+    """
+    Iterative deepening within a time budget.
+    Searches depth 1, 2, ... and stops before a depth that is not expected to
+    finish in the remaining time, estimating its cost from how much the last
+    depth grew over the one before. A depth that was started always runs to
+    completion, so the budget can be overshot by one iteration's misestimate.
+    Returns the best move, its evaluation score and the last completed depth.
+    """
+    deadline = time.perf_counter() + time_limit_ms / 1000
+    best_move, best_value, completed_depth = None, evaluate_position(game_state), 0
+    last_duration = None
+
+    for depth in range(1, max_depth + 1):
+        depth_start = time.perf_counter()
+        move, value = get_best_move(game_state, depth)
+        if move is None:
+            break
+        best_move, best_value, completed_depth = move, value, depth
+
+        now = time.perf_counter()
+        duration = now - depth_start
+        growth = duration / last_duration if last_duration else 4
+        last_duration = duration
+        if now + duration * max(growth, 2) > deadline:
+            break
+
+    return best_move, best_value, completed_depth
@@ -0,0 +1,182 @@
+"""
+Caches shared by the worker processes of one server.
+
+The gunicorn master (see gunicorn.conf.py) calls create_shared_caches
+before it forks the workers, so every worker maps the same shared memory:
+root move values or an AI response computed by one worker are a hit for
+all the others, and a tablebase is read once by the master instead of
+once per worker. Without the master hook (the Flask dev server, scripts)
+nothing is created and each process keeps its own caches.
+
+A SharedTable is a fixed-size hash table of SLOT_SIZE-byte slots in WAYS-way
+buckets. A slot holds a 64-bit digest of the key, a sequence number, the
+payload length and the pickled value. Writers take one of LOCK_STRIPES
+locks (by bucket) and make the sequence number odd while they write;
+readers take no lock and retry as a miss if the sequence number was odd or
+changed while they copied the slot. A full bucket overwrites one of its
+slots, so the table never grows.
+"""
+import os
+import pickle
+import struct
+import hashlib
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Slots per shared table; 0 keeps the caches per process
+SHARED_CACHE_SLOTS = int(os.environ.get("SHARED_CACHE_SLOTS", "16384"))
+
+SLOT_SIZE = 512
+WAYS = 4
+LOCK_STRIPES = 64
+
+# Key digest (0 marks an empty slot), sequence number, payload length
+_SLOT = struct.Struct("<QIH")
+
+# Name -> SharedTable, and the shared tablebase segment, set by create_shared_caches
+_tables = {}
+_tablebase_segment = None
+
+
+def key_digest(key):
+    """Stable 64-bit digest of a cache key (never 0), the same in every process."""
+    digest = int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), 'little')
+    return digest or 1
+
+
+class SharedTable:
+    """
+    Fixed-size cache in a shared memory segment, with the get/put interface
+    of response_cache.ResponseCache. Values must pickle into a slot.
+    """
+
+    def __init__(self, slots, slot_size=SLOT_SIZE):
+        self.slots = slots - slots % WAYS
+        self.slot_size = slot_size
+        self.segment = shared_memory.SharedMemory(create=True, size=self.slots * slot_size)
+        self.buffer = self.segment.buf
+        self.buffer[:] = bytes(len(self.buffer))
+        self.locks = [multiprocessing.Lock() for _ in range(LOCK_STRIPES)]
+        # Counters of this process
+        self.hits = 0
+        self.misses = 0
+
+    def _bucket(self, digest):
+        return digest % (self.slots // WAYS) * WAYS
+
+    def get(self, key):
+        digest = key_digest(key)
+        buffer, slot_size = self.buffer, self.slot_size
+        bucket = self._bucket(digest)
+        for way in range(WAYS):
+            offset = (bucket + way) * slot_size
+            slot_digest, sequence, length = _SLOT.unpack_from(buffer, offset)
+            if slot_digest != digest:
+                continue
+            data = bytes(buffer[offset + _SLOT.size:offset + _SLOT.size + length])
+            if sequence & 1 or _SLOT.unpack_from(buffer, offset)[:2] != (digest, sequence):
+                # A writer was busy with this slot
+                break
+            self.hits += 1
+            return pickle.loads(data)
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store value under key. Returns False if it doesn't fit in a slot."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.slot_size - _SLOT.size:
+            return False
+        digest = key_digest(key)
+        buffer, slot_size = self.buffer, self.slot_size
+        bucket = self._bucket(digest)
+        with self.locks[bucket // WAYS % LOCK_STRIPES]:
+            target = None
+            for way in range(WAYS):
+                slot_digest = _SLOT.unpack_from(buffer, (bucket + way) * slot_size)[0]
+                if slot_digest == digest or (slot_digest == 0 and target is None):
+                    target = way
+                    if slot_digest == digest:
+                        break
+            if target is None:
+                target = (digest >> 32) % WAYS
+            offset = (bucket + target) * slot_size
+            slot_digest, sequence, length = _SLOT.unpack_from(buffer, offset)
+            _SLOT.pack_into(buffer, offset, slot_digest, (sequence + 1) & 0xFFFFFFFF, length)
+            buffer[offset + _SLOT.size:offset + _SLOT.size + len(data)] = data
+            _SLOT.pack_into(buffer, offset, digest, (sequence + 2) & 0xFFFFFFFF, len(data))
+        return True
+
+    def __contains__(self, key):
+        digest = key_digest(key)
+        bucket = self._bucket(digest)
+        return any(_SLOT.unpack_from(self.buffer, (bucket + way) * self.slot_size)[0] == digest
+                   for way in range(WAYS))
+
+    def __len__(self):
+        return sum(1 for slot in range(self.slots) if _SLOT.unpack_from(self.buffer, slot * self.slot_size)[0])
+
+    def clear(self):
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            self.buffer[:] = bytes(len(self.buffer))
+        finally:
+            for lock in self.locks:
+                lock.release()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self, unlink=False):
+        self.buffer.release()
+        self.segment.close()
+        if unlink:
+            self.segment.unlink()
+
+
+def create_shared_caches(slots=SHARED_CACHE_SLOTS, tablebase_path=None):
+    """
+    Create the shared tables (root move values and AI responses) and, if a
+    tablebase file is given, a segment holding it. Call in the master
+    process before forking; does nothing if they were already created.
+    """
+    global _tablebase_segment
+    if _tables or _tablebase_segment is not None:
+        return
+    if slots > 0:
+        for name in ('values', 'responses'):
+            _tables[name] = SharedTable(slots)
+        logger.info("Created shared caches with %d slots (%d KiB each)", slots, slots * SLOT_SIZE // 1024)
+    if tablebase_path:
+        with open(tablebase_path, 'rb') as f:
+            data = f.read()
+        _tablebase_segment = shared_memory.SharedMemory(create=True, size=len(data))
+        _tablebase_segment.buf[:len(data)] = data
+        logger.info("Shared tablebase %s (%d bytes)", tablebase_path, len(data))
+
+
+def shared_table(name):
+    """The shared table called name, or None when caches are per process."""
+    return _tables.get(name)
+
+
+def shared_tablebase_buffer():
+    """The shared tablebase file contents as a memoryview, or None."""
+    return _tablebase_segment.buf if _tablebase_segment is not None else None
+
+
+def close_shared_caches(unlink=False):
+    """Detach from the shared segments; the master also unlinks them."""
+    global _tablebase_segment
+    for table in _tables.values():
+        table.close(unlink)
+    _tables.clear()
+    if _tablebase_segment is not None:
+        _tablebase_segment.close()
+        if unlink:
+            _tablebase_segment.unlink()
+        _tablebase_segment = None
@@ -0,0 +1,244 @@
+"""
+History-aware exact solver for Chopsticks.
+
+Because a move may not repeat any position of the game, the value of a
+position depends on every position visited before it. The solver searches
+(position, visited bitmask) pairs on the packed move tables and memoizes
+their exact outcome for the side to move: a win, a loss, or a draw when a
+player is left without a legal move. Mirroring either player's hands (left
+and right swapped) changes nothing in the rules, so each node is stored
+under the smallest of its four mirror images, with the visited bitmask
+mirrored the same way and kept up to date incrementally.
+
+The number of histories grows quickly with the number of free positions,
+so a solve has a budget of stored nodes and gives up past it; late in a
+game, or from positions whose neighbourhood is mostly visited, it answers
+at once.
+
+    python -m engine.solver "2-3 | 1-2" --player 1 --max-nodes 1000000
+"""
+import sys
+import time
+import logging
+import argparse
+from array import array
+from engine.game_state import NUM_POSITIONS, unpack_position, pack_position
+from engine.tables import CHILD_START, CHILDREN, MOVES, TERMINAL, TERMINAL_FLAGS, hand_bit, visited_mask
+from engine.evaluator import get_eval_table
+from engine.search import SearchCancelled
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+WIN, DRAW, LOSS = 1, 0, -1
+
+# Stored nodes a solve may add before giving up
+SOLVER_MAX_NODES = 200000
+
+# Solved nodes kept across solves; the memo is dropped when it grows past this
+MAX_STORED = 500000
+
+# (canonical packed, canonical mask) -> (lower, upper) bounds on the
+# outcome for the side to move: WIN, DRAW or LOSS
+_memo = {}
+
+
+class SolverLimit(Exception):
+    """Raised when a solve runs out of its node budget."""
+
+
+def _mirror(index, symmetry):
+    p1_hands, p2_hands, current_player = unpack_position(index)
+    if symmetry & 1:
+        p1_hands = p1_hands[::-1]
+    if symmetry & 2:
+        p2_hands = p2_hands[::-1]
+    return pack_position(p1_hands, p2_hands, current_player)
+
+
+# MIRRORS[s][packed]: packed with P1's hands swapped if s & 1 and P2's if s & 2
+MIRRORS = tuple(array('H', (_mirror(index, symmetry) for index in range(NUM_POSITIONS))) for symmetry in range(4))
+
+
+def mirrored_masks(mask):
+    """The visited bitmask under each of the four mirrorings."""
+    masks = []
+    for mirror in MIRRORS:
+        mirrored = 0
+        hand_index = 0
+        remaining = mask
+        while remaining:
+            if remaining & 1:
+                mirrored |= hand_bit(mirror[hand_index << 1])
+            remaining >>= 1
+            hand_index += 1
+        masks.append(mirrored)
+    return tuple(masks)
+
+
+def _child_masks(masks, child):
+    return (masks[0] | hand_bit(child),
+            masks[1] | hand_bit(MIRRORS[1][child]),
+            masks[2] | hand_bit(MIRRORS[2][child]),
+            masks[3] | hand_bit(MIRRORS[3][child]))
+
+
+class Solver:
+    """
+    One solve: alpha-beta negamax over outcomes with the shared memo and a
+    node budget. The memo keeps (lower, upper) bounds, so nodes cut off by
+    the window are stored too and narrowed on later visits.
+    """
+
+    def __init__(self, max_nodes=SOLVER_MAX_NODES, stop=None):
+        self.max_nodes = max_nodes
+        self.stop = stop
+        # Move ordering only: the eval table of the opponent's positions
+        self.order = get_eval_table().__getitem__
+        self.stored = 0
+        self.hits = 0
+
+    def value(self, packed, masks, alpha=LOSS, beta=WIN):
+        """
+        Outcome of packed with visited masks for the side to move. Exact
+        inside (alpha, beta); otherwise a bound on the side of the window it
+        falls on.
+        """
+        key = min((MIRRORS[0][packed], masks[0]), (MIRRORS[1][packed], masks[1]),
+                  (MIRRORS[2][packed], masks[2]), (MIRRORS[3][packed], masks[3]))
+        lower, upper = _memo.get(key, (LOSS, WIN))
+        if lower == upper or lower >= beta or upper <= alpha:
+            self.hits += 1
+            return lower if lower >= beta or lower == upper else upper
+        alpha, beta = max(alpha, lower), min(beta, upper)
+
+        children = [child for child in CHILDREN[CHILD_START[packed]:CHILD_START[packed + 1]]
+                    if not masks[0] & hand_bit(child)]
+        if not children:
+            lower = upper = value = DRAW
+        elif any(TERMINAL_FLAGS[child] for child in children):
+            lower = upper = value = WIN
+        else:
+            # Children that look worst for the opponent first
+            children = sorted(dict.fromkeys(children), key=self.order)
+            value = LOSS
+            window = alpha
+            for child in children:
+                child_value = -self.value(child, _child_masks(masks, child), -beta, -window)
+                if child_value > value:
+                    value = child_value
+                    window = max(window, value)
+                    if window >= beta:
+                        break
+            if value <= alpha:
+                upper = value
+            elif value >= beta:
+                lower = value
+            else:
+                lower = upper = value
+
+        if self.stored >= self.max_nodes:
+            raise SolverLimit()
+        if self.stop is not None and self.stop.is_set():
+            raise SearchCancelled()
+        if key not in _memo:
+            self.stored += 1
+        _memo[key] = (lower, upper)
+        return value
+
+
+def count_reachable(packed, mask, limit=None):
+    """
+    Number of unvisited hand positions reachable from packed without
+    playing a position of mask. Counting stops at limit if given, so a
+    caller that only needs to know whether a solve is cheap doesn't walk
+    the whole game.
+    """
+    seen = mask
+    # Packed positions already walked from: a hand position can be reached
+    # with either side to move, and each has its own moves
+    walked = 1 << packed
+    frontier = [packed]
+    count = 0
+    while frontier:
+        position = frontier.pop()
+        for child in CHILDREN[CHILD_START[position]:CHILD_START[position + 1]]:
+            bit = hand_bit(child)
+            if mask & bit or walked >> child & 1:
+                continue
+            walked |= 1 << child
+            if not seen & bit:
+                seen |= bit
+                count += 1
+                if limit is not None and count >= limit:
+                    return count
+            frontier.append(child)
+    return count
+
+
+def solve_position(game_state, max_nodes=SOLVER_MAX_NODES, stop=None):
+    """
+    Solve game_state with its visited positions. Raises SearchCancelled if
+    the stop event is set.
+
+    Returns a dict with 'result' ("win", "draw", "loss" for the side to
+    move, or "unknown" if the node budget ran out), 'moves' (a list of
+    (move, outcome) for every legal move, empty unless solved), the number
+    of nodes stored and memo hits, and the time taken in 'seconds'.
+    """
+    if len(_memo) > MAX_STORED:
+        _memo.clear()
+
+    start = time.perf_counter()
+    packed = game_state.pack()
+    masks = mirrored_masks(visited_mask(game_state))
+    solver = Solver(max_nodes, stop)
+    names = {WIN: "win", DRAW: "draw", LOSS: "loss"}
+
+    moves = []
+    result = "draw"
+    try:
+        if TERMINAL[packed]:
+            result = "loss"
+        else:
+            for move, child in MOVES[packed]:
+                if masks[0] & hand_bit(child):
+                    continue
+                outcome = WIN if TERMINAL[child] else -solver.value(child, _child_masks(masks, child))
+                moves.append((move, outcome))
+            if moves:
+                result = names[max(outcome for _, outcome in moves)]
+    except SolverLimit:
+        moves = []
+        result = "unknown"
+
+    seconds = time.perf_counter() - start
+    logger.debug("Solver: %s with %d nodes stored, %d memo hits in %.3fs", result, solver.stored, solver.hits, seconds)
+    return {'result': result, 'moves': moves, 'nodes': solver.stored, 'hits': solver.hits, 'seconds': seconds}
+
+
+def clear_memo():
+    """Drop every solved node."""
+    _memo.clear()
+
+
+def main():
+    # Imported here: the perft module is only needed to parse positions
+    from engine.perft import parse_position
+
+    parser = argparse.ArgumentParser(description="Solve a position exactly, history included")
+    parser.add_argument('state', nargs='?', default="1-1 | 1-1", help='position as "P1L-P1R | P2L-P2R"')
+    parser.add_argument('--player', type=int, choices=(1, 2), default=1, help="side to move")
+    parser.add_argument('--max-nodes', type=int, default=SOLVER_MAX_NODES)
+    args = parser.parse_args()
+
+    game_state = parse_position(args.state, args.player - 1)
+    result = solve_position(game_state, args.max_nodes)
+    for move, outcome in result['moves']:
+        print(f"{move.get_notation():<20} {outcome:+d}")
+    print(f"{result['result']}: {result['nodes']} nodes stored, {result['hits']} memo hits, "
+          f"{len(_memo)} in memo, {result['seconds']:.3f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Retrograde solver and tablebase files for Chopsticks variants.
+
+solve() works backwards from the finished positions of a variant's move
+tables: a position is won if some move reaches a lost position and lost if
+every move reaches a won one; whatever is left can be played forever and
+is a draw. The values ignore the no-repeat rule (they describe the bare
+positions), which makes them a strong evaluation rather than perfect play.
+engine.retrograde computes the same values on NumPy arrays for variants
+too large for this loop.
+
+Tablebase file format: magic, version, the rules (fingers, hands,
+overflow, splits, split_to_dead as bytes), the number of positions (u32),
+then one signed byte per position with the outcome for the side to move
+(1 win, -1 loss, 0 draw) and one u16 per position with the distance to
+the end in plies.
+"""
+import struct
+import logging
+from array import array
+from collections import deque
+from engine.rules import OVERFLOW_MODES, Rules
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TABLEBASE_MAGIC = b"CTBL"
+TABLEBASE_VERSION = 1
+
+WIN, DRAW, LOSS = 1, 0, -1
+
+_HEADER = struct.Struct("<4sBBBBBBI")
+
+
+class Tablebase:
+    """Outcome and distance to the end of every packed position of a variant."""
+
+    def __init__(self, rules, outcome, distance):
+        self.rules = rules
+        self.outcome = outcome  # array('b'): WIN, DRAW or LOSS for the side to move
+        self.distance = distance  # array('H'): plies to the end for decided positions
+
+    def __len__(self):
+        return len(self.outcome)
+
+    def score(self, index):
+        """
+        Score of a position for the side to move on the evaluator's scale:
+        +/-100 less the distance for decided positions, None for draws.
+        """
+        outcome = self.outcome[index]
+        if outcome == DRAW:
+            return None
+        return outcome * (100 - min(self.distance[index], 50))
+
+
+def solve(tables):
+    """
+    Retrograde analysis over RuleTables.
+    Returns a Tablebase; decided positions get the shortest win and the
+    longest loss.
+    """
+    count = tables.num_positions
+    outcome = array('b', bytes(count))
+    distance = array('H', bytes(2 * count))
+    remaining = array('H', (len(tables.children(index)) for index in range(count)))
+    predecessors = tables.predecessors()
+
+    # The side to move in a finished position has lost
+    queue = deque(index for index in range(count) if tables.terminal[index])
+    for index in queue:
+        outcome[index] = LOSS
+
+    while queue:
+        index = queue.popleft()
+        for parent in predecessors[index]:
+            if outcome[parent] != DRAW or tables.terminal[parent]:
+                continue
+            if outcome[index] == LOSS:
+                outcome[parent] = WIN
+                distance[parent] = distance[index] + 1
+                queue.append(parent)
+            else:
+                remaining[parent] -= 1
+                if remaining[parent] == 0:
+                    outcome[parent] = LOSS
+                    distance[parent] = distance[index] + 1
+                    queue.append(parent)
+
+    logger.debug("Solved %d positions: %d won, %d lost", count, outcome.count(WIN), outcome.count(LOSS))
+    return Tablebase(tables.rules, outcome, distance)
+
+
+def save_tablebase(tablebase, path):
+    """Write a tablebase to a file."""
+    rules = tablebase.rules
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(TABLEBASE_MAGIC, TABLEBASE_VERSION, rules.fingers, rules.hands,
+                             OVERFLOW_MODES.index(rules.overflow), rules.splits, rules.split_to_dead,
+                             len(tablebase)))
+        tablebase.outcome.tofile(f)
+        tablebase.distance.tofile(f)
+
+
+def _read_header(header, name):
+    magic, version, fingers, hands, overflow, splits, split_to_dead, count = _HEADER.unpack(header)
+    if magic != TABLEBASE_MAGIC or version != TABLEBASE_VERSION:
+        raise ValueError(f"{name} is not a tablebase file (version {TABLEBASE_VERSION})")
+    rules = Rules(fingers, hands, OVERFLOW_MODES[overflow], bool(splits), bool(split_to_dead))
+    if count != rules.num_positions:
+        raise ValueError(f"{name} has {count} positions, expected {rules.num_positions}")
+    return rules, count
+
+
+def load_tablebase(path):
+    """Read a tablebase written by save_tablebase."""
+    with open(path, 'rb') as f:
+        rules, count = _read_header(f.read(_HEADER.size), path)
+        outcome = array('b')
+        outcome.fromfile(f, count)
+        distance = array('H')
+        distance.fromfile(f, count)
+    return Tablebase(rules, outcome, distance)
+
+
+def tablebase_from_buffer(buffer, name="buffer"):
+    """
+    A tablebase over the contents of a tablebase file in memory (such as a
+    shared memory segment), without copying: outcome and distance are
+    memoryviews into buffer.
+    """
+    view = memoryview(buffer)
+    rules, count = _read_header(view[:_HEADER.size], name)
+    outcome = view[_HEADER.size:_HEADER.size + count].cast('b')
+    distance = view[_HEADER.size + count:_HEADER.size + 3 * count].cast('H')
+    return Tablebase(rules, outcome, distance)
+
+
+def describe(tablebase, index):
+    """One-line summary of a tablebase and the value of one position."""
+    names = {WIN: "win", DRAW: "draw", LOSS: "loss"}
+    result = names[tablebase.outcome[index]]
+    if tablebase.outcome[index] != DRAW:
+        result += f" in {tablebase.distance[index]} plies"
+    p1_hands, p2_hands, current_player = tablebase.rules.unpack(index)
+    return (f"{tablebase.outcome.count(WIN)} won, {tablebase.outcome.count(LOSS)} lost, "
+            f"{tablebase.outcome.count(DRAW)} drawn; {p1_hands} {p2_hands} P{current_player + 1} to move: {result}")
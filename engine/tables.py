@@ -0,0 +1,72 @@
+"""
+Precomputed move tables over packed positions.
+
+For every packed position the moves of the standard rules (engine.rules,
+the same moves movegen generates) are stored together with the packed
+position they lead to, so fast searches and playouts can walk the game
+without building GameState objects. The no-repeat rule only looks
+at the hands, so visited positions are tracked as a bitmask with one bit per
+hand index (packed index without the side to move, see hand_bit).
+
+The successors, killing taps and finished positions are also kept as flat
+buffers (CHILD_START, CHILDREN, KILL_START, KILL_CHILDREN, TERMINAL_FLAGS),
+which is what the alpha-beta search walks. Reading those makes new ints
+instead of taking references to shared objects, so walkers that only need
+positions don't write to the pages a preloaded server shares between its
+forked workers (see engine.preload).
+"""
+from array import array
+from itertools import accumulate
+from engine.game_state import pack_position, unpack_position
+from engine.rules import STANDARD_RULES, check_standard_rules, rule_tables
+
+
+def hand_bit(packed):
+    """Bit of a packed position in a visited-set bitmask."""
+    return 1 << (packed >> 1)
+
+
+def visited_mask(game_state):
+    """
+    Bitmask of the positions in game_state.visited_states. Raises ValueError
+    for a game of another variant, whose positions these tables don't hold.
+    """
+    check_standard_rules(game_state.rules)
+    mask = 0
+    for p1_hands, p2_hands in game_state.visited_states:
+        mask |= 1 << (pack_position(p1_hands, p2_hands, 0) >> 1)
+    return mask
+
+
+# MOVES[packed] -> ((move, next_packed), ...), TERMINAL[packed] -> bool,
+# WINNER[packed] -> "P1", "P2" or None
+_tables = rule_tables(STANDARD_RULES)
+MOVES, TERMINAL, WINNER = _tables.moves, _tables.terminal, _tables.winner
+
+# The next positions of packed, in MOVES order, are
+# CHILDREN[CHILD_START[packed]:CHILD_START[packed + 1]]; TERMINAL_FLAGS[packed]
+# is 1 for finished positions
+CHILD_START = array('H', accumulate((len(moves) for moves in MOVES), initial=0))
+CHILDREN = array('H', (child for moves in MOVES for _, child in moves))
+TERMINAL_FLAGS = bytes(TERMINAL)
+
+
+def _is_kill(move, child):
+    # The tapped hand is empty afterwards; the opponent of move.player has
+    # hands 1 - move.player of the unpacked child
+    return move.move_type == "tap" and unpack_position(child)[1 - move.player][move.details[1]] == 0
+
+
+# KILLS[packed] -> the (move, next_packed) entries of MOVES[packed] that tap
+# an opponent hand dead (the game is won when it was the last one)
+KILLS = tuple(tuple(entry for entry in moves if _is_kill(*entry)) for moves in MOVES)
+
+# The next positions of the KILLS[packed] entries, as flat buffers like
+# CHILD_START and CHILDREN
+KILL_START = array('H', accumulate((len(kills) for kills in KILLS), initial=0))
+KILL_CHILDREN = array('H', (child for kills in KILLS for _, child in kills))
+
+
+def legal_moves(packed, mask):
+    """(move, next_packed) pairs from packed that don't repeat a visited position."""
+    return [(move, child) for move, child in MOVES[packed] if not mask & hand_bit(child)]
@@ -0,0 +1,279 @@
+"""
+Engine-vs-engine tournament harness.
+
+Plays round-robin matches between engine configurations across a process
+pool, using GameState and get_ai_move directly, and reports an Elo estimate,
+the average move latency and the nodes searched per move for every
+configuration.
+
+    python -m engine.tournament --games 200 --workers 4 \
+        --engine name=master,difficulty=master \
+        --engine name=d4,depth=4 \
+        --engine name=tuned4,depth=4,weights=weights/eval_weights_v1.json \
+        --engine name=fast,time_ms=20 \
+        --engine name=d4-noq,depth=4,quiescence=0
+
+Engine options: name, difficulty (novice/intermediate/master), backend
+(alphabeta/mcts), depth, time_ms (time budget per move: iterative
+deepening for alpha-beta, thinking time for MCTS), weights (evaluator
+weights file), table (eval table file) and quiescence (0 turns off the
+extension of alpha-beta leaves with forcing taps).
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+from engine import database_lookup
+from engine.game_state import GameState
+from engine.ai import BACKENDS, get_ai_move
+from engine.search import reset_node_count, set_quiescence
+from engine.mcts import forget_game
+from engine.evaluator import (build_eval_table, build_weighted_table, load_eval_table, load_weights,
+                              set_eval_table)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Games that last longer than this are scored as draws
+MAX_PLIES = 200
+
+ENGINE_OPTIONS = ('name', 'difficulty', 'backend', 'depth', 'time_ms', 'weights', 'table', 'quiescence')
+
+# Eval tables already built in this process, by (weights, table) file names
+_tables = {}
+
+
+def parse_engine(spec):
+    """Parse "name=x,depth=4,..." into an engine configuration dict."""
+    config = {'difficulty': 'master', 'backend': 'alphabeta', 'depth': None, 'time_ms': None,
+              'weights': None, 'table': None, 'quiescence': True}
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key not in ENGINE_OPTIONS:
+            raise ValueError(f"Unknown engine option '{key}' in '{spec}'")
+        config[key] = value.strip()
+    for key in ('depth', 'time_ms'):
+        if config[key] is not None:
+            config[key] = int(config[key])
+    config['quiescence'] = bool(int(config['quiescence']))
+    if config['backend'] not in BACKENDS:
+        raise ValueError(f"Unknown backend '{config['backend']}' in '{spec}'")
+    config.setdefault('name', spec)
+    return config
+
+
+def eval_table_for(config):
+    """The eval table an engine configuration plays with."""
+    key = (config['weights'], config['table'])
+    if key not in _tables:
+        if config['table']:
+            _tables[key] = load_eval_table(config['table'])
+        elif config['weights']:
+            _tables[key] = build_weighted_table(load_weights(config['weights']))
+        else:
+            _tables[key] = build_eval_table()
+    return _tables[key]
+
+
+def play_game(engines, seed, max_plies=MAX_PLIES):
+    """
+    Play one game, engines[0] moving first.
+    Returns a dict with the score of engines[0] (1, 0.5 or 0), the number of
+    plies and the moves, seconds and nodes spent by each side.
+    """
+    random.seed(seed)
+    game = GameState()
+    moves = [0, 0]
+    seconds = [0.0, 0.0]
+    nodes = [0, 0]
+    score = 0.5
+
+    while not game.is_terminal and sum(moves) < max_plies:
+        side = game.current_player
+        config = engines[side]
+        set_eval_table(eval_table_for(config))
+        set_quiescence(config['quiescence'])
+
+        reset_node_count()
+        info = {}
+        start = time.perf_counter()
+        move, _, _ = get_ai_move(game, config['difficulty'], depth=config['depth'], time_limit_ms=config['time_ms'],
+                                 info=info, backend=config['backend'], game_id=(seed, side), use_cache=False)
+        seconds[side] += time.perf_counter() - start
+        # MCTS iterations count as nodes: each one adds a node to the tree
+        nodes[side] += reset_node_count() + info.get('mcts', {}).get('iterations', 0)
+
+        if move is None:
+            # Every move would repeat a position: the game is drawn
+            break
+        moves[side] += 1
+
+        success, error = game.apply_move(move)
+        if not success:
+            logger.error("Engine %s played an illegal move %s: %s", config['name'], move, error)
+            score = 0.0 if side == 0 else 1.0
+            break
+
+    if game.get_winner() == "P1":
+        score = 1.0
+    elif game.get_winner() == "P2":
+        score = 0.0
+    for side in (0, 1):
+        forget_game((seed, side))
+
+    return {'score': score, 'plies': sum(moves), 'moves': moves, 'seconds': seconds, 'nodes': nodes}
+
+
+def _play_task(task):
+    first, second, engines, seed, max_plies = task
+    return first, second, play_game(engines, seed, max_plies)
+
+
+def _init_worker():
+    # Workers only report through the returned results
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def schedule(configs, games_per_pair, seed, max_plies):
+    """Round-robin tasks; colors alternate between games of a pair."""
+    tasks = []
+    for i, j in combinations(range(len(configs)), 2):
+        for game_number in range(games_per_pair):
+            if game_number % 2 == 0:
+                first, second = i, j
+            else:
+                first, second = j, i
+            game_seed = seed + len(tasks)
+            tasks.append((first, second, (configs[first], configs[second]), game_seed, max_plies))
+    return tasks
+
+
+def estimate_elo(names, results):
+    """
+    Bradley-Terry maximum likelihood ratings from pairwise scores.
+    results maps (i, j) -> (score of i, games). Every pair gets one virtual
+    draw so engines that never lose still get a finite rating. Ratings are
+    centered on 0.
+    """
+    count = len(names)
+    wins = [[0.0] * count for _ in range(count)]
+    games = [[0.0] * count for _ in range(count)]
+    for (i, j), (score, played) in results.items():
+        wins[i][j] += score + 0.5
+        wins[j][i] += played - score + 0.5
+        games[i][j] += played + 1
+        games[j][i] += played + 1
+
+    strength = [1.0] * count
+    for _ in range(1000):
+        updated = []
+        for i in range(count):
+            total_wins = sum(wins[i])
+            denominator = sum(games[i][j] / (strength[i] + strength[j]) for j in range(count) if j != i)
+            updated.append(total_wins / denominator if denominator else strength[i])
+        mean_log = sum(math.log(value) for value in updated) / count
+        updated = [value / math.exp(mean_log) for value in updated]
+        converged = max(abs(a - b) for a, b in zip(updated, strength)) < 1e-9
+        strength = updated
+        if converged:
+            break
+
+    return [400 * math.log10(value) for value in strength]
+
+
+def run_tournament(configs, games_per_pair, workers=1, seed=0, max_plies=MAX_PLIES):
+    """
+    Play the tournament and summarize it per engine configuration.
+    Returns a dict with per-engine standings and the pairwise results.
+    """
+    tasks = schedule(configs, games_per_pair, seed, max_plies)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            outcomes = list(executor.map(_play_task, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    else:
+        outcomes = [_play_task(task) for task in tasks]
+
+    count = len(configs)
+    standings = [{'name': config['name'], 'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'score': 0.0,
+                  'moves': 0, 'seconds': 0.0, 'nodes': 0} for config in configs]
+    pairs = {}
+    for first, second, outcome in outcomes:
+        for side, index in ((0, first), (1, second)):
+            score = outcome['score'] if side == 0 else 1 - outcome['score']
+            entry = standings[index]
+            entry['games'] += 1
+            entry['score'] += score
+            entry['wins'] += score == 1
+            entry['draws'] += score == 0.5
+            entry['losses'] += score == 0
+            entry['moves'] += outcome['moves'][side]
+            entry['seconds'] += outcome['seconds'][side]
+            entry['nodes'] += outcome['nodes'][side]
+        low, high = min(first, second), max(first, second)
+        low_score = outcome['score'] if first == low else 1 - outcome['score']
+        total, played = pairs.get((low, high), (0.0, 0))
+        pairs[(low, high)] = (total + low_score, played + 1)
+
+    ratings = estimate_elo([config['name'] for config in configs], pairs)
+    for entry, rating in zip(standings, ratings):
+        entry['elo'] = rating
+        entry['score_pct'] = entry['score'] / entry['games'] * 100 if entry['games'] else 0
+        entry['avg_move_ms'] = entry['seconds'] / entry['moves'] * 1000 if entry['moves'] else 0
+        entry['nodes_per_move'] = entry['nodes'] / entry['moves'] if entry['moves'] else 0
+
+    return {
+        'standings': standings,
+        'pairs': {f"{configs[i]['name']} vs {configs[j]['name']}": {'score': score, 'games': played}
+                  for (i, j), (score, played) in pairs.items()},
+        'games': len(outcomes),
+    }
+
+
+def print_standings(summary):
+    print(f"{'engine':<16} {'games':>6} {'W-D-L':>14} {'score':>7} {'elo':>7} {'ms/move':>9} {'nodes/move':>11}")
+    for entry in sorted(summary['standings'], key=lambda e: -e['elo']):
+        wdl = f"{entry['wins']}-{entry['draws']}-{entry['losses']}"
+        print(f"{entry['name']:<16} {entry['games']:>6} {wdl:>14} {entry['score_pct']:>6.1f}% "
+              f"{entry['elo']:>+7.0f} {entry['avg_move_ms']:>9.3f} {entry['nodes_per_move']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine tournaments",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__)
+    parser.add_argument('--engine', action='append', required=True,
+                        help="engine configuration, e.g. name=d4,depth=4 (repeat for each engine)")
+    parser.add_argument('--games', type=int, default=100, help="games per pair of engines")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--output', help="write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    configs = [parse_engine(spec) for spec in args.engine]
+    if len(configs) < 2:
+        parser.error("need at least two engines")
+
+    if os.path.exists(database_lookup.DATABASE_FILE):
+        database_lookup.load_or_generate_database()
+
+    start = time.perf_counter()
+    summary = run_tournament(configs, args.games, args.workers, args.seed, args.max_plies)
+    elapsed = time.perf_counter() - start
+    print(f"{summary['games']} games in {elapsed:.1f}s on {args.workers} workers\n", file=sys.stderr)
+    print_standings(summary)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Texel-style tuning of the evaluator weights.
+
+Plays self-play games, records the outcome seen from every position, fits
+the heuristic weights with a logistic model over all packed positions at
+once and writes a versioned weights file that evaluator.load_weights reads
+(point EVAL_WEIGHTS at it). A report then compares how deep the default and
+tuned evaluators have to search to pick moves as good as a deep reference
+search.
+
+    python -m engine.tuning --games 500 --depth 4 --out-dir weights
+"""
+import os
+import re
+import time
+import random
+import logging
+import argparse
+import numpy as np
+from engine.game_state import GameState, NUM_POSITIONS, unpack_position
+from engine.movegen import get_all_possible_moves
+from engine.search import get_best_move, root_move_values
+from engine.evaluator import (DEFAULT_WEIGHTS, FEATURES, build_weighted_table, get_eval_table,
+                              set_eval_table, save_weights)
+from engine.batch_evaluator import feature_batch, weight_vector
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Games that last longer than this are scored as draws
+MAX_PLIES = 200
+
+
+def legal_moves(game_state):
+    """Moves from movegen that the rules accept (no repeated positions)."""
+    moves = []
+    for move in get_all_possible_moves(game_state):
+        if game_state.clone().apply_move(move)[0]:
+            moves.append(move)
+    return moves
+
+
+def play_self_play_game(depth, epsilon, rng):
+    """
+    Play one engine-vs-engine game.
+    Returns (positions, result) where positions lists the packed positions in
+    order and result is 1.0 if P1 won, 0.0 if P2 won and 0.5 for a draw.
+    """
+    game = GameState()
+    positions = []
+    while not game.is_terminal and len(positions) < MAX_PLIES:
+        moves = legal_moves(game)
+        if not moves:
+            # Every move would repeat a position: the game is drawn
+            break
+        positions.append(game.pack())
+        if rng.random() < epsilon:
+            move = rng.choice(moves)
+        else:
+            move, _ = get_best_move(game, depth)
+        game.apply_move(move)
+
+    if game.get_winner() == "P1":
+        return positions, 1.0
+    if game.get_winner() == "P2":
+        return positions, 0.0
+    return positions, 0.5
+
+
+def collect_samples(games, depth, epsilon, seed):
+    """
+    Play games and aggregate outcomes per packed position.
+    Returns (counts, scores): how often each position was seen and the summed
+    result from the point of view of the side to move there.
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    counts = np.zeros(NUM_POSITIONS)
+    scores = np.zeros(NUM_POSITIONS)
+    for game_number in range(games):
+        positions, result = play_self_play_game(depth, epsilon, rng)
+        for packed in positions:
+            counts[packed] += 1
+            # Packed positions end with the side to move
+            scores[packed] += result if packed % 2 == 0 else 1 - result
+        if (game_number + 1) % 100 == 0:
+            logger.info("Played %d/%d self-play games", game_number + 1, games)
+    return counts, scores
+
+
+def texel_loss(features, targets, counts, weights, scale):
+    """Count-weighted mean squared error between targets and sigmoid(score / scale)."""
+    predicted = 1 / (1 + np.exp(-np.clip(features @ weights, -100, 100) / scale))
+    return float(np.sum(counts * (predicted - targets) ** 2) / np.sum(counts))
+
+
+def fit_scale(features, targets, counts, weights):
+    """Find the sigmoid scale that best fits the given weights (golden section search)."""
+    low, high = 1.0, 200.0
+    ratio = (5 ** 0.5 - 1) / 2
+    for _ in range(60):
+        a = high - ratio * (high - low)
+        b = low + ratio * (high - low)
+        if texel_loss(features, targets, counts, weights, a) < texel_loss(features, targets, counts, weights, b):
+            high = b
+        else:
+            low = a
+    return (low + high) / 2
+
+
+def fit_weights(counts, scores, iterations=5000, learning_rate=0.05, l2=1e-4):
+    """
+    Fit the heuristic weights to the observed outcomes.
+    Every non-terminal packed position seen in self-play is one sample,
+    weighted by how often it occurred. The sigmoid scale is fitted to the
+    default weights first and then kept fixed, as in Texel tuning; the
+    weights are optimized with Adam and a small pull towards the defaults.
+    Returns (weights dict, stats dict).
+    """
+    features, terminal_scores = feature_batch(np.arange(NUM_POSITIONS))
+    mask = (counts > 0) & (terminal_scores == 0)
+    features = features[mask].astype(np.float64)
+    counts = counts[mask]
+    targets = scores[mask] / counts
+
+    default = weight_vector()
+    scale = fit_scale(features, targets, counts, default)
+    start_loss = texel_loss(features, targets, counts, default, scale)
+
+    weights = default.copy()
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    total = np.sum(counts)
+    for step in range(1, iterations + 1):
+        raw = features @ weights
+        predicted = 1 / (1 + np.exp(-np.clip(raw, -100, 100) / scale))
+        # The clip to +-100 has no gradient outside the range
+        inside = (raw > -100) & (raw < 100)
+        error = counts * 2 * (predicted - targets) * predicted * (1 - predicted) / scale * inside
+        gradient = features.T @ error / total + 2 * l2 * (weights - default)
+
+        first_moment = 0.9 * first_moment + 0.1 * gradient
+        second_moment = 0.999 * second_moment + 0.001 * gradient ** 2
+        corrected_first = first_moment / (1 - 0.9 ** step)
+        corrected_second = second_moment / (1 - 0.999 ** step)
+        weights -= learning_rate * corrected_first / (np.sqrt(corrected_second) + 1e-8)
+
+    stats = {
+        'positions': int(mask.sum()),
+        'samples': int(total),
+        'scale': scale,
+        'loss_before': start_loss,
+        'loss_after': texel_loss(features, targets, counts, weights, scale),
+    }
+    return {name: round(float(value), 3) for name, value in zip(FEATURES, weights)}, stats
+
+
+def next_weights_path(out_dir):
+    """Pick the next free eval_weights_vN.json in out_dir. Returns (path, version)."""
+    os.makedirs(out_dir, exist_ok=True)
+    versions = [int(match.group(1)) for name in os.listdir(out_dir)
+                for match in [re.fullmatch(r"eval_weights_v(\d+)\.json", name)] if match]
+    version = max(versions, default=0) + 1
+    return os.path.join(out_dir, f"eval_weights_v{version}.json"), version
+
+
+def depth_report(weights, positions, reference_depth=8, depths=range(1, 7), baseline_depth=6, seed=0):
+    """
+    Measure move quality against a deep reference search with the default weights.
+    For every position the loss of a move is how much worse it is than the
+    best move according to the reference search. Returns a dict with the mean
+    loss per depth for both evaluators and the shallowest tuned depth that is
+    at least as good as the default evaluator at baseline_depth.
+    """
+    original_table = get_eval_table()
+    tables = {'default': build_weighted_table(DEFAULT_WEIGHTS), 'tuned': build_weighted_table(weights)}
+
+    try:
+        set_eval_table(tables['default'])
+        references = []
+        for packed in positions:
+            game_state = GameState(*unpack_position(packed))
+            values = root_move_values(game_state, reference_depth)
+            if values:
+                references.append((game_state, dict((move.get_notation(), value) for move, value in values)))
+
+        losses = {name: {} for name in tables}
+        for name, table in tables.items():
+            set_eval_table(table)
+            for depth in depths:
+                total_loss = 0.0
+                for game_state, reference in references:
+                    random.seed(seed)
+                    move, _ = get_best_move(game_state.clone(), depth)
+                    total_loss += max(reference.values()) - reference[move.get_notation()]
+                losses[name][depth] = total_loss / len(references)
+    finally:
+        set_eval_table(original_table)
+
+    target = losses['default'][baseline_depth]
+    matching = [depth for depth in depths if losses['tuned'][depth] <= target]
+    return {
+        'positions': len(references),
+        'reference_depth': reference_depth,
+        'baseline_depth': baseline_depth,
+        'mean_loss': losses,
+        'tuned_depth_for_baseline_quality': min(matching) if matching else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluator weights from self-play")
+    parser.add_argument('--games', type=int, default=500, help="number of self-play games")
+    parser.add_argument('--depth', type=int, default=4, help="search depth used in self-play")
+    parser.add_argument('--epsilon', type=float, default=0.15, help="probability of a random move")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--out-dir', default="weights", help="directory for eval_weights_vN.json")
+    parser.add_argument('--report-positions', type=int, default=60,
+                        help="positions used for the depth report (0 to skip)")
+    parser.add_argument('--reference-depth', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    counts, scores = collect_samples(args.games, args.depth, args.epsilon, args.seed)
+    print(f"Self-play: {args.games} games, {int(counts.sum())} positions in {time.perf_counter() - start:.1f}s")
+
+    weights, stats = fit_weights(counts, scores, args.iterations)
+    print(f"Fitted on {stats['positions']} distinct positions, scale {stats['scale']:.1f}, "
+          f"loss {stats['loss_before']:.5f} -> {stats['loss_after']:.5f}")
+    for name in FEATURES:
+        print(f"  {name:<24} {DEFAULT_WEIGHTS[name]:>8} -> {weights[name]:>8}")
+
+    path, version = next_weights_path(args.out_dir)
+    save_weights(weights, path, version, source='self-play', games=args.games, depth=args.depth,
+                 epsilon=args.epsilon, seed=args.seed, **stats)
+    print(f"Wrote {path}")
+
+    if args.report_positions:
+        rng = random.Random(args.seed)
+        seen = [packed for packed in range(NUM_POSITIONS) if counts[packed] > 0]
+        sample = rng.sample(seen, min(args.report_positions, len(seen)))
+        report = depth_report(weights, sample, args.reference_depth)
+        print(f"\nMean move loss vs depth-{report['reference_depth']} reference "
+              f"over {report['positions']} positions:")
+        print(f"{'depth':>5} {'default':>9} {'tuned':>9}")
+        for depth in report['mean_loss']['default']:
+            print(f"{depth:>5} {report['mean_loss']['default'][depth]:>9.2f} {report['mean_loss']['tuned'][depth]:>9.2f}")
+        tuned_depth = report['tuned_depth_for_baseline_quality']
+        if tuned_depth is None:
+            print(f"Tuned weights do not reach default depth-{report['baseline_depth']} quality at these depths")
+        else:
+            print(f"Tuned weights reach default depth-{report['baseline_depth']} quality at depth {tuned_depth}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Gunicorn settings, read automatically from the working directory.
+
+The master creates the engine's shared caches before it forks the workers
+(see engine.shared_cache), so results computed by one worker are hits for
+all of them. Set SHARED_CACHE_SLOTS=0 to keep the caches per worker.
+
+Set PRELOAD=1 to import the app in the master instead of in every worker:
+the master loads the move database and builds the engine tables once, then
+freezes its heap before forking (see engine.preload), so the workers share
+those pages and add little memory each. Code changes then need a restart,
+so leave it off with --reload.
+"""
+import os
+from engine import shared_cache
+
+PRELOAD = os.environ.get("PRELOAD", "") == "1"
+
+preload_app = PRELOAD
+
+if PRELOAD:
+    # The app is imported before on_starting, and the engine picks up the
+    # shared caches when its modules are imported
+    shared_cache.create_shared_caches(tablebase_path=os.environ.get("EVAL_TABLEBASE"))
+
+
+def on_starting(server):
+    shared_cache.create_shared_caches(tablebase_path=os.environ.get("EVAL_TABLEBASE"))
+
+
+def when_ready(server):
+    if PRELOAD:
+        # Imported here: the engine modules look up the shared caches when
+        # they are imported, which must come after on_starting
+        from engine import preload
+        preload.preload_engine()
+        preload.freeze_heap()
+
+
+def on_exit(server):
+    shared_cache.close_shared_caches(unlink=True)
@@ -83,7 +83,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     move: data.ai_move,
                     notation: getMoveNotation(data.ai_move),
                     evaluation: data.evaluation,
-                    perfect: data.perfect
+                    perfect: data.perfect,
+                    forcedWinIn: data.forced_win_in
                 });
             }
 
@@ -124,7 +125,8 @@ document.addEventListener('DOMContentLoaded', function() {
                                 move: data.ai_move,
                                 notation: getMoveNotation(data.ai_move),
                                 evaluation: data.evaluation,
-                                perfect: data.perfect
+                                perfect: data.perfect,
+                                forcedWinIn: data.forced_win_in
                             });
                         }
 
@@ -335,7 +337,8 @@ document.addEventListener('DOMContentLoaded', function() {
                         move: data.ai_move,
                         notation: getMoveNotation(data.ai_move),
                         evaluation: data.evaluation,
-                        perfect: data.perfect
+                        perfect: data.perfect,
+                        forcedWinIn: data.forced_win_in
                     });
                 }
 
@@ -524,6 +527,9 @@ document.addEventListener('DOMContentLoaded', function() {
         if (moveData.perfect) {
             moveText += ` <span class="badge bg-success">Perfect</span>`;
         }
+        if (moveData.forcedWinIn) {
+            moveText += ` <span class="badge bg-danger">Forced win in ${moveData.forcedWinIn}</span>`;
+        }
 
         moveElement.innerHTML = moveText;
         moveListElement.appendChild(moveElement);
@@ -0,0 +1,97 @@
+"""
+Move selection: the search backend must be one get_ai_move knows, and a
+pondered reply is answered from the caches.
+"""
+import threading
+import pytest
+from engine import ai, book, database_lookup, policy
+from engine.ai import get_ai_move
+from engine.game_state import GameState
+from engine.mcts import forget_game, mcts_search
+from engine.ponder import likely_replies, ponder
+from engine.response_cache import response_cache
+from engine.tables import MOVES
+
+
+def test_unknown_backend_rejected():
+    game = GameState((1, 1), (1, 2), 0)
+    with pytest.raises(ValueError):
+        get_ai_move(game, 'novice', backend='x')
+
+
+def test_pondered_reply_served_without_searching(monkeypatch):
+    monkeypatch.setattr(book, '_book', {})
+    response_cache.clear()
+    policy.value_cache.clear()
+    game = GameState()
+    assert ponder(game, 'master', 'alphabeta', threading.Event(), time_limit_ms=60000, max_replies=1) == 1
+    _, predicted = likely_replies(game)[0]
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("searched a pondered position")
+
+    monkeypatch.setattr(ai, 'prove_win', no_search)
+    monkeypatch.setattr(ai, 'solve_position', no_search)
+    monkeypatch.setattr(policy, 'root_move_values', no_search)
+    info = {}
+    move, _, _ = get_ai_move(predicted, 'master', info=info)
+    assert move is not None
+    assert info['cached']
+
+
+def test_mcts_ponder_keeps_the_game_tree():
+    response_cache.clear()
+    start = GameState()
+    move, _, _ = mcts_search(start, iterations=3000, game_id='ponder-test')
+    game = start.clone()
+    game.apply_move(move)
+    replies = likely_replies(game)
+    assert ponder(game, 'novice', 'mcts', threading.Event(), max_replies=2, game_id='ponder-test') == 2
+
+    # A reply that wasn't pondered still finds its subtree
+    _, unpondered = replies[2]
+    _, _, stats = mcts_search(unpondered, iterations=10, game_id='ponder-test')
+    forget_game('ponder-test')
+    assert stats['reused_visits'] > 0
+
+
+def test_difficulties_share_one_search(monkeypatch):
+    monkeypatch.setattr(book, '_book', {})
+    response_cache.clear()
+    policy.value_cache.clear()
+    calls = []
+
+    def counted(function):
+        def wrapper(*args, **kwargs):
+            calls.append(function.__name__)
+            return function(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(ai, 'prove_win', counted(ai.prove_win))
+    monkeypatch.setattr(policy, 'root_move_values', counted(policy.root_move_values))
+    # P2 can force a win in 5 plies
+    game = GameState((0, 1), (0, 2), 1)
+    for difficulty in ('master', 'intermediate', 'novice'):
+        info = {}
+        move, evaluation, perfect = get_ai_move(game, difficulty, info=info)
+        if difficulty == 'master':
+            assert (info['source'], info['forced_win'], evaluation, perfect) == ('proof', 5, 100, True)
+    assert sorted(calls) == ['prove_win', 'root_move_values']
+
+
+
+def test_book_before_database(monkeypatch):
+    game = GameState()
+    # The minimal database's fixed first move, and a book that plays another
+    monkeypatch.setattr(database_lookup, 'move_database',
+                        {database_lookup.state_to_key(game): {'moves': [MOVES[game.pack()][0][0]], 'scores': [10]}})
+    monkeypatch.setattr(book, '_book', {book.book_key(game): ((1, 1000),)})
+    info = {}
+    move, _, _ = get_ai_move(game, 'novice', info=info)
+    assert info['source'] == 'book'
+    assert move is MOVES[game.pack()][1][0]
+
+    # Without the book the database answers
+    info = {}
+    move, _, perfect = get_ai_move(game, 'novice', info=info, use_cache=False)
+    assert (info['source'], move, perfect) == ('database', MOVES[game.pack()][0][0], True)
@@ -0,0 +1,98 @@
+"""
+The game archive round trip: generator TSV -> archive -> TSV -> archive
+keeps every game, and a move code is the move's index in tables.MOVES.
+"""
+import csv
+import random
+import pytest
+from engine.archive import (TSV_FIELDS, ArchiveWriter, convert_tsv, decode_game, encode_game, export_tsv,
+                            read_games)
+from engine.game_state import GameState
+from engine.movegen import get_all_possible_moves
+from engine.tables import MOVES
+
+
+def random_games(count, seed, max_plies=40):
+    """Random games played with GameState and movegen, as lists of GameMoves."""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = GameState()
+        moves = []
+        while not game.is_terminal and len(moves) < max_plies:
+            legal = [move for move in get_all_possible_moves(game) if game.clone().apply_move(move)[0]]
+            if not legal:
+                break
+            move = rng.choice(legal)
+            game.apply_move(move)
+            moves.append(move)
+        games.append(moves)
+    return games
+
+
+def write_generator_tsv(path, games):
+    """Write games the way the generator script does."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=TSV_FIELDS, delimiter='\t')
+        writer.writeheader()
+        for number, moves in enumerate(games, 1):
+            game = GameState()
+            for turn, move in enumerate(moves, 1):
+                state = game.get_state_str()
+                game.apply_move(move)
+                writer.writerow({
+                    "GameID": f"G{number:04d}",
+                    "Turn": turn,
+                    "State": state,
+                    "Move": move.get_notation(),
+                    "NextState": game.get_state_str(),
+                    "Error": "",
+                    "Winner": game.get_winner() if turn == len(moves) and game.is_terminal else "",
+                })
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_round_trip(tmp_path, codec):
+    games = random_games(300, seed=1)
+    write_generator_tsv(tmp_path / "games.tsv", games)
+    assert convert_tsv(tmp_path / "games.tsv", tmp_path / "games.cga", codec, block_games=64) == len(games)
+
+    archived = list(read_games(tmp_path / "games.cga"))
+    assert len(archived) == len(games)
+    for moves, (start, codes) in zip(games, archived):
+        assert start == GameState().pack()
+        assert codes == encode_game(moves)
+        # A code is the index of the move in the move tables
+        assert [move.get_notation() for _, move, _ in decode_game(start, codes)] == \
+            [move.get_notation() for move in moves]
+
+    assert export_tsv(tmp_path / "games.cga", tmp_path / "export.tsv") == len(games)
+    assert (tmp_path / "export.tsv").read_text(encoding='utf-8') == \
+        (tmp_path / "games.tsv").read_text(encoding='utf-8')
+    convert_tsv(tmp_path / "export.tsv", tmp_path / "again.cga", codec, block_games=64)
+    assert list(read_games(tmp_path / "again.cga")) == archived
+
+
+def test_codes_are_move_table_indices():
+    game = GameState()
+    for move in random_games(1, seed=2)[0]:
+        packed = game.pack()
+        code = encode_game([move], packed)[0]
+        assert MOVES[packed][code][0].get_notation() == move.get_notation()
+        game.apply_move(move)
+        assert MOVES[packed][code][1] == game.pack()
+
+
+def test_unknown_codec(tmp_path):
+    with pytest.raises(ValueError):
+        ArchiveWriter(tmp_path / "games.cga", codec='bz2')
+
+
+def test_unknown_codec_byte(tmp_path):
+    with ArchiveWriter(tmp_path / "games.cga", codec='zlib') as writer:
+        writer.write_game([])
+    data = bytearray((tmp_path / "games.cga").read_bytes())
+    data[5] = 9
+    (tmp_path / "games.cga").write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        list(read_games(tmp_path / "games.cga"))
@@ -0,0 +1,139 @@
+"""
+Merging games into the move database in batches must give the same
+statistics as rebuilding it from all of them, and a database whose scores
+don't come from outcome counts must be rebuilt before a merge.
+"""
+import csv
+import copy
+import pickle
+import random
+import pytest
+from engine import database_lookup
+from engine.archive import TSV_FIELDS, game_rows
+from engine.game_state import GameState
+from engine.tables import MOVES, TERMINAL, hand_bit
+
+
+def random_games(count, seed):
+    """Random games as (start, codes), played to the end or until no move is left."""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        packed = GameState().pack()
+        mask = hand_bit(packed)
+        codes = bytearray()
+        while not TERMINAL[packed]:
+            legal = [code for code, (_, child) in enumerate(MOVES[packed]) if not mask & hand_bit(child)]
+            if not legal:
+                break
+            code = rng.choice(legal)
+            codes.append(code)
+            packed = MOVES[packed][code][1]
+            mask |= hand_bit(packed)
+        games.append((GameState().pack(), bytes(codes)))
+    return games
+
+
+def write_tsv(path, games):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=TSV_FIELDS, delimiter='\t')
+        writer.writeheader()
+        for number, (start, codes) in enumerate(games, 1):
+            writer.writerows(game_rows(number, start, codes))
+
+
+def database():
+    return copy.deepcopy(database_lookup.move_database), copy.deepcopy(database_lookup.outcome_counts)
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_lookup, 'DATABASE_FILE', str(tmp_path / "database.pkl"))
+    monkeypatch.setattr(database_lookup, 'DATABASE_JOURNAL', str(tmp_path / "database.journal"))
+    monkeypatch.setattr(database_lookup, 'RAW_GAMES_FILE', str(tmp_path / "games.tsv"))
+    monkeypatch.setattr(database_lookup, 'move_database', {})
+    monkeypatch.setattr(database_lookup, 'outcome_counts', {})
+    return tmp_path
+
+
+def test_two_batches_match_a_rebuild(files):
+    games = random_games(60, seed=1)
+    write_tsv(files / "games.tsv", games)
+    database_lookup.process_raw_games()
+    rebuilt = database()
+
+    write_tsv(files / "games.tsv", games[:25])
+    database_lookup.process_raw_games()
+    write_tsv(files / "batch.tsv", games[25:])
+    assert database_lookup.merge_tsv(str(files / "batch.tsv")) > 0
+    assert database() == rebuilt
+
+    # The journal replayed over the snapshot gives the same database
+    database_lookup.load_or_generate_database()
+    assert database() == rebuilt
+
+
+def test_legacy_snapshot_rebuilt_before_merge(files):
+    games = random_games(30, seed=2)
+    write_tsv(files / "games.tsv", games)
+    database_lookup.process_raw_games()
+    rebuilt = database()
+
+    # A legacy snapshot: the bare move_database of the first games only
+    write_tsv(files / "games.tsv", games[:10])
+    database_lookup.process_raw_games()
+    with open(database_lookup.DATABASE_FILE, 'wb') as f:
+        pickle.dump(database_lookup.move_database, f)
+    write_tsv(files / "games.tsv", games[:20])
+    database_lookup.load_or_generate_database()
+    assert database_lookup.outcome_counts is None
+
+    write_tsv(files / "batch.tsv", games[20:])
+    database_lookup.merge_tsv(str(files / "batch.tsv"))
+    assert database() == rebuilt
+
+
+def test_merge_without_counts_or_raw_games_fails(files):
+    database_lookup.create_minimal_database()
+    write_tsv(files / "batch.tsv", random_games(5, seed=3))
+    with pytest.raises(RuntimeError):
+        database_lookup.merge_tsv(str(files / "batch.tsv"))
+
+
+def test_truncated_journal(files):
+    games = random_games(30, seed=4)
+    write_tsv(files / "games.tsv", games[:10])
+    database_lookup.process_raw_games()
+    write_tsv(files / "first.tsv", games[10:20])
+    database_lookup.merge_tsv(str(files / "first.tsv"))
+    merged = database()
+    complete = (files / "database.journal").stat().st_size
+
+    # The process died while appending the second batch
+    write_tsv(files / "second.tsv", games[20:])
+    database_lookup.merge_tsv(str(files / "second.tsv"))
+    with open(files / "database.journal", 'r+b') as f:
+        f.truncate(complete + 40)
+
+    database_lookup.load_or_generate_database()
+    assert database() == merged
+    assert (files / "database.journal").stat().st_size == complete
+
+    # Later merges are read back after the complete batches
+    database_lookup.merge_tsv(str(files / "second.tsv"))
+    expected = database()
+    database_lookup.load_or_generate_database()
+    assert database() == expected
+
+
+def test_journal_next_to_legacy_snapshot(files):
+    games = random_games(20, seed=5)
+    write_tsv(files / "games.tsv", games[:10])
+    database_lookup.process_raw_games()
+    write_tsv(files / "batch.tsv", games[10:])
+    database_lookup.merge_tsv(str(files / "batch.tsv"))
+    with open(database_lookup.DATABASE_FILE, 'wb') as f:
+        pickle.dump({}, f)
+    database_lookup.load_or_generate_database()
+    assert database_lookup.outcome_counts is None
+    assert database_lookup.move_database == {}
@@ -0,0 +1,85 @@
+"""
+The position index must answer "games through X" like a scan of every
+game in the archive, and load exactly the games it names.
+"""
+import random
+import pytest
+from engine.archive import ArchiveWriter, decode_game, read_games
+from engine.game_index import build_index, load_index, save_index
+from engine.game_state import GameState, NUM_POSITIONS
+from engine.tables import MOVES, TERMINAL, WINNER, hand_bit
+
+
+def random_codes(count, seed, max_plies=40):
+    """Random games as move codes, played to the end, until no move is left or max_plies."""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        packed = GameState().pack()
+        mask = hand_bit(packed)
+        codes = bytearray()
+        while not TERMINAL[packed] and len(codes) < max_plies:
+            legal = [code for code, (_, child) in enumerate(MOVES[packed]) if not mask & hand_bit(child)]
+            if not legal:
+                break
+            code = rng.choice(legal)
+            codes.append(code)
+            packed = MOVES[packed][code][1]
+            mask |= hand_bit(packed)
+        games.append(bytes(codes))
+    return games
+
+
+def scan(archive_path, packed, winner=None, within=None):
+    """games_through by reading every game of the archive."""
+    found = []
+    for game, (start, codes) in enumerate(read_games(archive_path)):
+        positions = [start] + [next_packed for _, _, next_packed in decode_game(start, codes)]
+        game_winner = WINNER[positions[-1]] if TERMINAL[positions[-1]] else None
+        if winner is not None and game_winner != winner:
+            continue
+        found.extend((game, ply) for ply, position in enumerate(positions)
+                     if position == packed and (within is None or ply <= within))
+    return found
+
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    path = tmp_path_factory.mktemp("archive") / "games.cga"
+    with ArchiveWriter(path, codec='zlib', block_games=50) as writer:
+        for codes in random_codes(400, seed=1):
+            writer.write_codes(codes)
+    return path
+
+
+def test_games_through_matches_scan(archive):
+    game_index = build_index(archive)
+    assert len(game_index) == 400
+    positions = {packed for packed in range(NUM_POSITIONS) if game_index.starts[packed + 1] > game_index.starts[packed]}
+    rng = random.Random(2)
+    for packed in rng.sample(sorted(positions), 40) + [GameState().pack()]:
+        assert game_index.games_through(packed) == scan(archive, packed)
+        assert game_index.games_through(packed, winner="P1") == scan(archive, packed, winner="P1")
+        assert game_index.games_through(packed, winner="P2", within=8) == scan(archive, packed, winner="P2", within=8)
+
+
+def test_load_games(archive):
+    game_index = build_index(archive)
+    games = list(read_games(archive))
+    wanted = [0, 49, 50, 123, 399, 200]
+    loaded = game_index.load_games(archive, wanted)
+    assert sorted(loaded) == sorted(wanted)
+    for game in wanted:
+        assert loaded[game] == games[game]
+        assert game_index.lengths[game] == len(games[game][1])
+
+
+def test_saved_index(archive, tmp_path):
+    game_index = build_index(archive)
+    save_index(game_index, tmp_path / "games.idx")
+    loaded = load_index(tmp_path / "games.idx")
+    loaded.check(archive)
+    packed = GameState().pack()
+    assert loaded.games_through(packed, winner="P1") == game_index.games_through(packed, winner="P1")
+    assert loaded.winners == game_index.winners
+    assert loaded.block_offsets == game_index.block_offsets
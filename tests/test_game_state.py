@@ -0,0 +1,70 @@
+"""
+Games of rule variants: move notation with more than two hands, pickled
+moves staying out of the move registry, and the code built on the standard
+game's tables refusing variant positions.
+"""
+import pickle
+import pytest
+from engine.evaluator import evaluate_position
+from engine.game_state import _MOVE_REGISTRY, GameMove, GameState, find_move
+from engine.movegen import get_all_possible_moves
+from engine.perft import perft
+from engine.rules import Rules
+from engine.search import get_best_move, root_move_values
+
+# Three fingers keep the variant's move tables small
+THREE_HANDS = Rules(fingers=3, hands=3)
+
+
+def test_standard_notation():
+    assert GameMove("tap", 0, (0, 1)).get_notation() == "P1L>P2R"
+    assert GameMove("split", 1, (1, 3, 2, 2)).get_notation() == "Sp(P2:1|3 → 2|2)"
+    assert GameMove("split", 0, [[1, 3], [2, 2]]).get_notation() == "Sp(P1:1|3 → 2|2)"
+
+
+def test_three_hand_notation():
+    assert GameMove("tap", 1, (2, 0)).get_notation() == "P2H3>P1L"
+    assert GameMove("split", 0, (2, 3, 0, 0, 1, 4)).get_notation() == "Sp(P1:2|3|0 → 0|1|4)"
+    assert GameMove("split", 0, [[2, 3, 0], [0, 1, 4]]).get_notation() == "Sp(P1:2|3|0 → 0|1|4)"
+
+
+def test_three_hand_moves_have_notation():
+    state = GameState((2, 1, 0), (1, 1, 1), 0, rules=THREE_HANDS)
+    moves = get_all_possible_moves(state)
+    assert any(move.move_type == "split" for move in moves)
+    notations = [move.get_notation() for move in moves]
+    assert len(set(notations)) == len(notations)
+
+
+def test_standard_tables_reject_variants():
+    state = GameState(rules=Rules(fingers=6))
+    with pytest.raises(ValueError):
+        evaluate_position(state)
+    with pytest.raises(ValueError):
+        get_best_move(state, 2)
+    with pytest.raises(ValueError):
+        root_move_values(state, 2)
+
+
+def test_standard_tables_accept_equal_rules():
+    assert evaluate_position(GameState(rules=Rules())) == evaluate_position(GameState())
+
+
+def test_perft_counts_variant_moves():
+    state = GameState(rules=THREE_HANDS)
+    assert perft(state, 1) == len(get_all_possible_moves(state))
+
+
+def test_pickled_moves_keep_registry():
+    standard = get_all_possible_moves(GameState())[0]
+    assert pickle.loads(pickle.dumps(standard)) is standard
+
+    # Splits to five fingers only exist with six fingers per hand
+    variant_moves = [move for move in get_all_possible_moves(GameState((3, 3), (1, 1), 0, rules=Rules(fingers=6)))
+                     if 5 in move.details[2:]]
+    assert variant_moves
+    registered = len(_MOVE_REGISTRY)
+    copies = pickle.loads(pickle.dumps(variant_moves))
+    assert len(_MOVE_REGISTRY) == registered
+    assert [move.get_notation() for move in copies] == [move.get_notation() for move in variant_moves]
+    assert find_move('split', 0, (3, 3, 5, 1)) is not find_move('split', 0, (3, 3, 5, 1))
@@ -0,0 +1,82 @@
+"""
+Proof-number search against the exact solver: a proven win must be a
+forced win through the move it returns, "no_win" must mean the solver
+finds none, and a win proven straight from the cache still has a move.
+"""
+import random
+import pytest
+from engine import pns, solver
+from engine.game_state import GameState, unpack_position
+from engine.pns import prove_win
+from engine.solver import WIN, count_reachable, solve_position
+from engine.tables import TERMINAL, hand_bit
+
+# Number of hand positions (positions without the side to move)
+HAND_POSITIONS = 625
+
+
+def game_state(packed, mask):
+    """The game at packed with the hand positions of mask visited."""
+    p1_hands, p2_hands, player = unpack_position(packed)
+    visited = {unpack_position(index << 1)[:2] for index in range(HAND_POSITIONS) if mask >> index & 1}
+    return GameState(p1_hands, p2_hands, player, visited_states=visited)
+
+
+def small_games(count, seed, max_reachable=16):
+    """Random unfinished games with a history that leaves fewer than max_reachable positions to play."""
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        packed = rng.randrange(2 * HAND_POSITIONS)
+        if TERMINAL[packed]:
+            continue
+        mask = (1 << HAND_POSITIONS) - 1
+        for index in rng.sample(range(HAND_POSITIONS), HAND_POSITIONS):
+            freed = mask & ~(1 << index) | hand_bit(packed)
+            if count_reachable(packed, freed, max_reachable) < max_reachable:
+                mask = freed
+        games.append(game_state(packed, mask))
+    return games
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    pns._win_cache.clear()
+    pns._loss_cache.clear()
+    solver.clear_memo()
+    yield
+    pns._win_cache.clear()
+    pns._loss_cache.clear()
+
+
+def test_agrees_with_solver():
+    results = set()
+    for game in small_games(120, seed=1):
+        proof = prove_win(game, max_nodes=10 ** 6)
+        solution = solve_position(game, max_nodes=10 ** 6)
+        results.add(proof['result'])
+        if proof['result'] == "win":
+            assert solution['result'] == "win"
+            # The proven move keeps the win
+            assert (proof['move'], WIN) in solution['moves']
+        else:
+            assert proof['result'] == "no_win"
+            assert solution['result'] != "win"
+    assert results == {"win", "no_win"}
+
+
+def test_win_from_cache():
+    games = [game for game in small_games(60, seed=2) if prove_win(game, max_nodes=10 ** 6)['result'] == "win"]
+    assert games
+    for game in games:
+        proof = prove_win(game, max_nodes=10 ** 6)
+        # Nothing was expanded: the root was proven by the cache
+        assert proof['nodes'] == 1
+        assert proof['result'] == "win"
+        assert (proof['move'], WIN) in solve_position(game, max_nodes=10 ** 6)['moves']
+
+
+def test_budget_runs_out():
+    proof = prove_win(GameState(), max_nodes=10)
+    assert proof['result'] == "unknown"
+    assert proof['move'] is None
@@ -0,0 +1,25 @@
+"""
+The vectorized retrograde solver must give the same tablebase as the
+position-by-position solver over RuleTables.
+"""
+import pytest
+from engine.retrograde import solve_vectorized
+from engine.rules import Rules, RuleTables
+from engine.tablebase import solve
+
+
+@pytest.mark.parametrize("rules", [
+    Rules(),
+    Rules(fingers=4),
+    Rules(hands=3, fingers=3),
+    Rules(hands=3),
+    Rules(overflow='cutoff'),
+    Rules(splits=False),
+    Rules(split_to_dead=False),
+], ids=repr)
+def test_matches_tablebase(rules):
+    expected = solve(RuleTables(rules))
+    tablebase = solve_vectorized(rules)
+    assert tablebase.rules == rules
+    assert tablebase.outcome == expected.outcome
+    assert tablebase.distance == expected.distance
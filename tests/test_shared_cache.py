@@ -0,0 +1,77 @@
+"""
+The shared-memory table: get/put within one process, a full bucket
+overwriting a slot, values too big for a slot, clear, and a put in one
+process being a hit in another.
+"""
+import multiprocessing
+import pytest
+from engine.shared_cache import SLOT_SIZE, WAYS, SharedTable
+
+
+@pytest.fixture
+def table():
+    table = SharedTable(64)
+    yield table
+    table.close(unlink=True)
+
+
+def test_get_put(table):
+    assert table.get((1, 2, 'master')) is None
+    assert table.put((1, 2, 'master'), ('move', 10, False, {'source': 'search6'}))
+    assert table.get((1, 2, 'master')) == ('move', 10, False, {'source': 'search6'})
+    assert (1, 2, 'master') in table
+    assert (1, 3, 'master') not in table
+
+    # A second put replaces the value in the same slot
+    assert table.put((1, 2, 'master'), [1, 2, 3])
+    assert table.get((1, 2, 'master')) == [1, 2, 3]
+    assert len(table) == 1
+    assert (table.hits, table.misses) == (2, 1)
+
+
+def test_full_bucket_overwrites_a_slot():
+    # A table of one bucket
+    table = SharedTable(WAYS)
+    try:
+        keys = [('key', number) for number in range(WAYS + 1)]
+        for number, key in enumerate(keys):
+            assert table.put(key, number)
+        assert len(table) == WAYS
+        found = [table.get(key) for key in keys]
+        # One of the earlier keys made room for the last one
+        assert found.count(None) == 1
+        assert found[-1] == WAYS
+        assert all(value in (None, number) for number, value in enumerate(found))
+    finally:
+        table.close(unlink=True)
+
+
+def test_oversized_value_rejected(table):
+    assert not table.put('big', b"x" * SLOT_SIZE)
+    assert table.get('big') is None
+    assert 'big' not in table
+    assert table.put('small', b"x" * 100)
+
+
+def test_clear(table):
+    for number in range(20):
+        table.put(number, number * 2)
+    table.get(3)
+    table.clear()
+    assert len(table) == 0
+    assert table.get(3) is None
+    assert (table.hits, table.misses) == (0, 1)
+
+
+def _put_in_child(table, key, value):
+    table.put(key, value)
+
+
+def test_put_is_a_hit_in_another_process(table):
+    context = multiprocessing.get_context('fork')
+    process = context.Process(target=_put_in_child, args=(table, ('shared', 7), {'values': [1, 2]}))
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    assert table.get(('shared', 7)) == {'values': [1, 2]}
+    assert table.hits == 1
@@ -0,0 +1,132 @@
+"""
+The history-aware solver against a brute-force minimax over (position,
+visited mask), with mirrored positions and histories, and its node budget.
+"""
+import random
+from functools import lru_cache
+import pytest
+from engine import solver
+from engine.game_state import GameState, unpack_position
+from engine.solver import DRAW, LOSS, WIN, MIRRORS, count_reachable, mirrored_masks, solve_position
+from engine.tables import CHILD_START, CHILDREN, MOVES, TERMINAL, hand_bit, visited_mask
+
+NAMES = {WIN: "win", DRAW: "draw", LOSS: "loss"}
+
+# Number of hand positions (positions without the side to move)
+HAND_POSITIONS = 625
+
+
+@lru_cache(maxsize=None)
+def brute_force(packed, mask):
+    """Outcome for the side to move of packed, none of mask's positions may be played."""
+    children = [child for child in CHILDREN[CHILD_START[packed]:CHILD_START[packed + 1]] if not mask & hand_bit(child)]
+    if not children:
+        return DRAW
+    if any(TERMINAL[child] for child in children):
+        return WIN
+    return max(-brute_force(child, mask | hand_bit(child)) for child in children)
+
+
+def brute_force_moves(packed, mask):
+    return [(move, WIN if TERMINAL[child] else -brute_force(child, mask | hand_bit(child)))
+            for move, child in MOVES[packed] if not mask & hand_bit(child)]
+
+
+def game_state(packed, mask):
+    """The game at packed with the hand positions of mask visited."""
+    p1_hands, p2_hands, player = unpack_position(packed)
+    visited = {unpack_position(index << 1)[:2] for index in range(HAND_POSITIONS) if mask >> index & 1}
+    return GameState(p1_hands, p2_hands, player, visited_states=visited)
+
+
+def small_positions(count, seed, max_reachable=12):
+    """
+    Random unfinished positions with a random history that leaves fewer than
+    max_reachable positions to play: starting with every position visited,
+    positions are freed in random order while that still holds.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        packed = rng.randrange(2 * HAND_POSITIONS)
+        if TERMINAL[packed]:
+            continue
+        mask = (1 << HAND_POSITIONS) - 1
+        for index in rng.sample(range(HAND_POSITIONS), HAND_POSITIONS):
+            freed = mask & ~(1 << index) | hand_bit(packed)
+            if count_reachable(packed, freed, max_reachable) < max_reachable:
+                mask = freed
+        positions.append((packed, mask))
+    return positions
+
+
+def check_solution(packed, mask):
+    solution = solve_position(game_state(packed, mask), max_nodes=10 ** 6)
+    moves = brute_force_moves(packed, mask)
+    assert solution['moves'] == moves
+    assert solution['result'] == (NAMES[max(outcome for _, outcome in moves)] if moves else "draw")
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo():
+    solver.clear_memo()
+    yield
+    solver.clear_memo()
+
+
+def test_matches_brute_force():
+    for packed, mask in small_positions(150, seed=1):
+        check_solution(packed, mask)
+
+
+def test_mirrored_positions_share_the_memo():
+    for packed, mask in small_positions(60, seed=2):
+        masks = mirrored_masks(mask)
+        # Solved one after the other, the mirror images are answered from
+        # the memo entries of the first
+        for symmetry in range(4):
+            check_solution(MIRRORS[symmetry][packed], masks[symmetry])
+
+
+def test_mirrored_masks():
+    rng = random.Random(3)
+    for _ in range(50):
+        mask = rng.getrandbits(HAND_POSITIONS)
+        masks = mirrored_masks(mask)
+        assert masks[0] == mask
+        for symmetry in range(4):
+            expected = 0
+            for index in range(HAND_POSITIONS):
+                if mask >> index & 1:
+                    expected |= hand_bit(MIRRORS[symmetry][index << 1])
+            assert masks[symmetry] == expected
+            assert mirrored_masks(masks[symmetry])[symmetry] == mask
+
+
+def test_repeat_rule_changes_the_value():
+    # A position whose value changes when one more position has been visited
+    for packed, mask in small_positions(100, seed=4):
+        for index in range(HAND_POSITIONS):
+            larger = mask | 1 << index
+            if larger != mask and brute_force(packed, larger) != brute_force(packed, mask):
+                check_solution(packed, mask)
+                check_solution(packed, larger)
+                return
+    pytest.fail("no position whose value depends on the history")
+
+
+def test_node_budget():
+    game = GameState((1, 2), (2, 1), 0)
+    solution = solve_position(game, max_nodes=5)
+    assert solution['result'] == "unknown"
+    assert solution['moves'] == []
+
+    # The bounds stored before the budget ran out keep later solves exact
+    for packed, mask in small_positions(40, seed=5, max_reachable=20):
+        solve_position(game_state(packed, mask), max_nodes=3)
+        check_solution(packed, mask)
+
+
+def test_visited_mask_of_game_state():
+    packed, mask = small_positions(1, seed=6)[0]
+    assert visited_mask(game_state(packed, mask)) == mask